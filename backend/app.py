@@ -1,24 +1,38 @@
 from __future__ import annotations
 
+import hmac
 import os
 import shutil
 import subprocess
 import tempfile
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
 from pathlib import Path
-from time import time
-from typing import Any, Dict, Optional, Union
+from time import perf_counter_ns, time
+from typing import Any, Dict, Optional
 
-from flask import Flask, request, jsonify, abort, send_from_directory, send_file
+from flask import Flask, Response, g, request, jsonify, abort
 from flask_cors import CORS
-import speech_recognition as sr
-try:
-    from gtts import gTTS  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
-    gTTS = None  # type: ignore
-
-from nlp_processor import classify_text
-from emergency_bot import BotEngine
+from werkzeug.routing import PathConverter
+
+import lazy_deps
+from nlp_processor import classification_cache_stats, classify_many, classify_text
+from audio_pipeline import STT_SAMPLE_RATE, decode_upload
+from audio_pool import AudioWorkPool, PoolSaturated
+from call_dispatch import CallDispatcher, CallQueueFull, create_call_provider
+from content_store import ContentStore
+from guide_engine import GuideEngine
+from json_provider import FastJSONProvider
+from latency import LatencyRegistry, render_counters
 from metrics import Metrics
+from offline_bundle import OfflineBundle
+from profiling import RequestProfiler
+from session_store import create_session_backend
+from static_assets import StaticBundle
+from stt_backends import create_stt_backend
+from tts_cache import (
+    SYNTHESIZERS, TTSCache, TTSUnavailable, cache_key, normalize_lang, protocol_step_texts, supported_lang,
+)
 
 BASE_DIR = Path(__file__).resolve().parent
 FRONTEND_DIR = BASE_DIR.parent / "frontend"
@@ -36,10 +50,38 @@ ALLOWED_CORS_ORIGINS = [
     "null",
 ]
 MAX_HISTORY_ITEMS = 20
-MAX_SESSIONS = 1000
-STT_SAMPLE_RATE = 16000
+MAX_SESSIONS = int(os.getenv("CONRUMBO_MAX_SESSIONS", "1000"))
+# Segundos de inactividad tras los que caduca una sesion
+SESSION_TTL = float(os.getenv("CONRUMBO_SESSION_TTL", "3600"))
+SESSION_MAX_BYTES = int(os.getenv("CONRUMBO_SESSION_MAX_BYTES", "0")) or None
+MAX_BATCH_ITEMS = 20000
+# Por encima de este tamaño /api/understand_batch responde en NDJSON por trozos
+BATCH_STREAM_THRESHOLD = 1000
+BATCH_CHUNK_SIZE = 500
+# El audio TTS se indexa por contenido, así que puede cachearse un año
+TTS_MAX_AGE = 365 * 24 * 3600
+STATIC_MAX_AGE = 365 * 24 * 3600
+# Segundos máximos que una petición espera al pool de audio
+AUDIO_TIMEOUT = float(os.getenv("CONRUMBO_AUDIO_TIMEOUT", "30"))
+# Sin token, los endpoints /api/admin/* están desactivados (tras un proxy local todo llega desde 127.0.0.1)
+ADMIN_TOKEN = os.getenv("CONRUMBO_ADMIN_TOKEN") or None
+# Modo compacto: /api/understand y /api/next_step no devuelven el historial salvo con include_history
+COMPACT_RESPONSES = os.getenv("CONRUMBO_COMPACT_RESPONSES", "0") == "1"
+# Rol del worker: all (todo), text (sin STT ni síntesis TTS) o audio (dependencias de audio cargadas al arrancar)
+ROLE = os.getenv("CONRUMBO_ROLE", "all")
+if ROLE not in ("all", "text", "audio"):
+    raise ValueError(f"unknown_role: {ROLE}")
+# Lo pone gunicorn.conf.py: la app se importa en el máster y los hilos se arrancan en cada worker tras el fork
+PRELOADED = os.getenv("CONRUMBO_PRELOAD") == "1"
+# speech_recognition, gTTS y numpy se importan en el primer uso. Con preload (salvo rol text) se importan
+# ya en el máster: así quedan compartidas entre workers en vez de cargarse en cada uno
+_LAZY_DEFAULT = "0" if PRELOADED and ROLE != "text" else "1"
+LAZY_IMPORTS = ROLE != "audio" and os.getenv("CONRUMBO_LAZY_IMPORTS", _LAZY_DEFAULT) == "1"
+
+sr = lazy_deps.lazy_module("speech_recognition")
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(
     app,
     resources={
@@ -51,34 +93,168 @@ CORS(
     methods=["GET", "POST", "OPTIONS"],
 )
 
-bot = BotEngine(protocols_path=BASE_DIR / "protocols.json")
-metrics = Metrics(csv_path=BASE_DIR / "metrics_log.csv")
+metrics_sink = None
+if os.getenv("CONRUMBO_METRICS_SINK", "csv") == "columnar":
+    from metrics_columnar import ColumnarSink
+
+    metrics_sink = ColumnarSink(BASE_DIR / "metrics_columnar")
+metrics = Metrics(
+    csv_path=os.getenv("CONRUMBO_METRICS_PATH") or BASE_DIR / "metrics_log.csv",
+    sink=metrics_sink,
+    on_full=os.getenv("CONRUMBO_METRICS_ON_FULL", "drop"),
+    rotate_bytes=int(os.getenv("CONRUMBO_METRICS_ROTATE_BYTES", str(50 * 1024 * 1024))) or None,
+    rotate_daily=os.getenv("CONRUMBO_METRICS_ROTATE_DAILY", "0") == "1",
+)
+
+latency = LatencyRegistry()
+latency.describe("conrumbo_request_duration_seconds", "Latencia total por endpoint.")
+latency.describe("conrumbo_stage_duration_seconds", "Latencia por etapa dentro de cada endpoint.")
+
+latency.describe("conrumbo_content_reload_seconds", "Duración de las recargas de protocolos/sinónimos.")
+# Protocolos y sinónimos versionados; se recargan sin reiniciar (fichero vigilado o /api/admin/reload)
+content = ContentStore(
+    BASE_DIR / "protocols.json",
+    synonyms_path=os.getenv("CONRUMBO_SYNONYMS_PATH") or BASE_DIR / "synonyms.json",
+    latency=latency,
+)
+
+latency.describe("conrumbo_audio_queue_wait_seconds", "Espera en cola del pool de audio (stt/tts).")
+audio_pool = AudioWorkPool(
+    max_workers=int(os.getenv("CONRUMBO_AUDIO_WORKERS", "2")),
+    max_queue=int(os.getenv("CONRUMBO_AUDIO_QUEUE", "8")),
+    retry_after=int(os.getenv("CONRUMBO_AUDIO_RETRY_AFTER", "2")),
+    latency=latency,
+)
+
+latency.describe("conrumbo_stt_backend_seconds", "Latencia de reconocimiento por backend STT.")
+stt_backend = create_stt_backend(os.getenv("CONRUMBO_STT_BACKEND", "google"), latency=latency)
+
+latency.describe("conrumbo_call_dispatch_seconds", "Duración de cada intento de llamada saliente por proveedor.")
+call_dispatcher = CallDispatcher(
+    create_call_provider(),
+    workers=int(os.getenv("CONRUMBO_CALL_WORKERS", "2")),
+    max_attempts=int(os.getenv("CONRUMBO_CALL_MAX_ATTEMPTS", "4")),
+    backoff=float(os.getenv("CONRUMBO_CALL_BACKOFF", "1")),
+    latency=latency,
+    # Estado compartido entre workers: GET /call/<id> puede caer en cualquiera
+    state_dir=os.getenv("CONRUMBO_CALL_STATE_DIR") or BASE_DIR / "call_jobs",
+)
+
+# Frontend leído, con huella y comprimido una sola vez al arrancar
+static_bundle = StaticBundle(
+    FRONTEND_DIR,
+    compress=os.getenv("CONRUMBO_STATIC_PRECOMPRESS", "1") == "1",
+)
+
+tts_cache = TTSCache(
+    os.getenv("CONRUMBO_TTS_CACHE_DIR") or BASE_DIR / "tts_cache",
+    synthesizer=SYNTHESIZERS[os.getenv("CONRUMBO_TTS_SYNTH", "gtts")],
+)
+
+offline_bundle = OfflineBundle(
+    content,
+    tts_cache,
+    pool=audio_pool,
+    fill_audio=os.getenv("CONRUMBO_BUNDLE_AUDIO", "1") == "1" and ROLE != "text",
+)
 
 # Memoria en caliente para el contexto de cada sesion
-_session_state: Dict[str, Dict[str, Any]] = {}
+_session_state = create_session_backend(
+    os.getenv("CONRUMBO_SESSION_BACKEND", "memory"),
+    path=os.getenv("CONRUMBO_SESSION_DB") or BASE_DIR / "sessions.sqlite3",
+    max_items=MAX_SESSIONS,
+    ttl=SESSION_TTL,
+    max_bytes=SESSION_MAX_BYTES,
+)
 _runtime_config: Dict[str, Optional[str]] = {
     "backend_url": None,
     "voice_lang": "es-ES",
 }
 
 
-def _serve_frontend_file(relative: Union[str, Path]):
-    """Serve a file from the frontend bundle safely."""
-    normalized = Path(relative)
-    candidate = (FRONTEND_DIR / normalized).resolve()
-    try:
-        candidate.relative_to(FRONTEND_DIR)
-    except ValueError:
-        abort(404)
-    if not candidate.is_file():
+class FrontendFileConverter(PathConverter):
+    """Como `path`, pero nunca casa con `api/...`: un POST a una ruta de API desconocida da 404, no 405."""
+
+    regex = r"(?!api/)[^/].*?"
+
+
+app.url_map.converters["frontend_file"] = FrontendFileConverter
+
+
+def _serve_frontend_file(relative: str):
+    """Sirve un fichero del frontend precomprimido, con ETag fuerte y caché según tenga huella o no."""
+    entry = static_bundle.lookup(relative)
+    if entry is None:
         abort(404)
-    return send_from_directory(
-        FRONTEND_DIR,
-        normalized.as_posix(),
-        max_age=0,
+    encoding, body = entry.select(key for key, _ in request.accept_encodings)
+    etag = entry.etag_for(encoding)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, content_type=entry.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    if entry.immutable and relative == entry.url_name:
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # index.html, sw.js y los nombres sin huella se revalidan siempre (304 si no cambiaron)
+        response.cache_control.no_cache = True
+    return response
+
+
+def _stage(name: str, endpoint: Optional[str] = None):
+    """Cronometra una etapa del handler actual en el histograma de etapas."""
+    return latency.timer(
+        "conrumbo_stage_duration_seconds",
+        endpoint=endpoint or request.endpoint or "unknown",
+        stage=name,
     )
 
 
+# Perfilado por petición: apagado salvo CONRUMBO_PROFILE_RATE o POST /api/admin/profile
+profiler = RequestProfiler(
+    rate=float(os.getenv("CONRUMBO_PROFILE_RATE", "0")),
+    allow_header=os.getenv("CONRUMBO_PROFILE_HEADER", "0") == "1",
+)
+
+# Único camino clasificar → protocolo → paso → sesión para guide/assistant/understand/next_step
+guide_engine = GuideEngine(content, _session_state, classify_text, max_history=MAX_HISTORY_ITEMS, stage=_stage)
+
+
+@app.before_request
+def _start_request_timer() -> None:
+    g.t0_ns = perf_counter_ns()
+    if profiler.armed:
+        trace = profiler.start(request.endpoint or "unknown", request.headers)
+        if trace is not None:
+            g.profile = trace
+
+
+@app.after_request
+def _observe_request_latency(response):
+    t0 = g.pop("t0_ns", None)
+    if t0 is not None:
+        latency.observe(
+            "conrumbo_request_duration_seconds",
+            perf_counter_ns() - t0,
+            endpoint=request.endpoint or "unknown",
+        )
+    return response
+
+
+@app.teardown_request
+def _stop_profile(exc=None) -> None:
+    # teardown corre también si el handler lanza: nunca se queda el trazador puesto
+    if profiler.tracing:
+        trace = g.pop("profile", None)
+        if trace is not None:
+            profiler.stop(trace)
+
+
 def _resolve_session(data: Dict[str, Any]) -> str:
     session_id = data.get("session_id") or data.get("sessionId")
     if not session_id:
@@ -86,12 +262,6 @@ def _resolve_session(data: Dict[str, Any]) -> str:
     return str(session_id)
 
 
-def _prune_sessions() -> None:
-    if len(_session_state) <= MAX_SESSIONS:
-        return
-    _session_state.clear()
-
-
 def _safe_suffix(filename: str) -> str:
     ext = Path(filename or "").suffix.lower()
     if ext in {".wav", ".wave", ".webm", ".ogg", ".m4a", ".mp3"}:
@@ -151,6 +321,17 @@ def _prepare_audio_file(upload) -> tuple[str, list[str]]:
     return final_path, cleanup
 
 
+def _decode_via_tempfile(upload) -> sr.AudioData:
+    """Ruta con ficheros temporales; solo como respaldo si ffmpeg no puede leer desde pipe."""
+    upload.stream.seek(0)
+    audio_path, cleanup = _prepare_audio_file(upload)
+    try:
+        with sr.AudioFile(audio_path) as source:
+            return sr.Recognizer().record(source)
+    finally:
+        cleanup_paths(cleanup)
+
+
 def cleanup_paths(paths: list[str]) -> None:
     for path in paths:
         try:
@@ -159,77 +340,15 @@ def cleanup_paths(paths: list[str]) -> None:
             continue
 
 
-def place_call(number: str) -> Dict[str, Any]:
-    """Encapsula la integracion con el carrier o usa un mock en su defecto."""
-    sanitized = str(number or "").strip()
-    if not sanitized:
-        raise ValueError("number_required")
-
-    account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-    from_number = os.getenv("TWILIO_FROM_NUMBER")
-    twiml_url = (
-        os.getenv("TWILIO_TWIML_URL")
-        or os.getenv("TWILIO_CALL_URL")
-        or "http://demo.twilio.com/docs/voice.xml"
-    )
-
-    if account_sid and auth_token and from_number:
-        try:
-            from twilio.rest import Client  # type: ignore
-        except ImportError as exc:  # pragma: no cover - depende de entorno
-            app.logger.warning("Twilio no disponible: %s", exc)
-        else:
-            try:
-                client = Client(account_sid, auth_token)
-                call = client.calls.create(
-                    to=sanitized,
-                    from_=from_number,
-                    url=twiml_url,
-                )
-                app.logger.info("Llamada enviada vía Twilio a %s", sanitized)
-                return {"ok": True, "provider": "twilio", "sid": call.sid}
-            except Exception as exc:  # pragma: no cover - depende del carrier
-                app.logger.exception("Falló la llamada saliente a %s", sanitized)
-                return {"ok": False, "error": str(exc)}
-
-    app.logger.info("Simulando llamada (mock) a %s", sanitized)
-    return {"ok": True, "provider": "mock"}
-
-
 @app.get("/")
 def frontend_index():
     return _serve_frontend_file("index.html")
 
 
-@app.get("/index.html")
-def frontend_index_alias():
-    return _serve_frontend_file("index.html")
-
-
-@app.get("/script.js")
-def frontend_script():
-    return _serve_frontend_file("script.js")
-
-
-@app.get("/style.css")
-def frontend_styles():
-    return _serve_frontend_file("style.css")
-
-
-@app.get("/manifest.webmanifest")
-def frontend_manifest():
-    return _serve_frontend_file("manifest.webmanifest")
-
-
-@app.get("/sw.js")
-def frontend_service_worker():
-    return _serve_frontend_file("sw.js")
-
-
-@app.get("/assets/<path:filename>")
-def frontend_assets(filename: str):
-    return _serve_frontend_file(Path("assets") / filename)
+@app.get("/<frontend_file:filename>")
+def frontend_file(filename: str):
+    # Nombres lógicos (script.js, assets/...) y con huella (script.<hash>.js); las rutas de la API tienen prioridad
+    return _serve_frontend_file(filename)
 
 
 @app.get("/health")
@@ -242,23 +361,186 @@ def api_health():
     return jsonify({"ok": True})
 
 
+@app.get("/api/metrics")
+def prometheus_metrics():
+    """Histogramas de latencia y contadores internos en formato de texto de Prometheus."""
+    body = "".join([
+        latency.render_prometheus(),
+        render_counters(
+            "conrumbo_classify_cache",
+            "Caché LRU de clasificaciones (hits, misses, evictions, size).",
+            classification_cache_stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_metrics_writer",
+            "Escritor de metrics_log en segundo plano (filas en cola, escritas, descartadas, errores de escritura, rotaciones).",
+            metrics.stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_sessions",
+            "Backend de sesiones (activas, expulsiones, caducadas por TTL y contadores propios del backend).",
+            _session_state.stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_tts_cache",
+            "Caché TTS (aciertos en memoria/disco, fallos, expulsiones, bytes).",
+            tts_cache.stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_audio_pool",
+            "Pool de audio (capacidad, tareas en curso, admitidas y rechazadas con 503).",
+            audio_pool.stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_content",
+            "Protocolos/sinónimos activos (versión, recargas, fallos, duración de la última recarga).",
+            {key: value for key, value in content.stats().items() if key != "digest"},
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_content_info",
+            "Digest del contenido activo (igual en todos los workers con el mismo contenido).",
+            {content.current.digest: 1},
+            kind="gauge",
+            label="digest",
+        ),
+        render_counters(
+            f"conrumbo_stt_{stt_backend.name}",
+            "Backend STT activo (llamadas y fallos).",
+            stt_backend.stats(),
+        ),
+        render_counters(
+            "conrumbo_calls",
+            "Cola de llamadas salientes (pendientes, en curso, completadas, fallidas, reintentos, rechazadas).",
+            call_dispatcher.stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_static",
+            "Frontend precomprimido en memoria (ficheros, bytes por codificación, reconstrucciones).",
+            static_bundle.stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_offline_bundle",
+            "Paquete offline /api/bundle (construcciones, aciertos, audios sintetizados en segundo plano).",
+            offline_bundle.stats(),
+            kind="gauge",
+        ),
+        render_counters(
+            "conrumbo_lazy_import_ms",
+            "Milisegundos que costó importar cada dependencia pesada (-1: aún sin usar).",
+            lazy_deps.stats(),
+            kind="gauge",
+            label="module",
+        ),
+        render_counters(
+            "conrumbo_profiler",
+            "Perfilado por petición (activo, fracción muestreada, peticiones perfiladas, pilas distintas).",
+            profiler.stats(),
+            kind="gauge",
+        ),
+    ])
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+def _admin_denied():
+    """403 si la petición no trae CONRUMBO_ADMIN_TOKEN (o no hay token configurado); None si puede pasar."""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "admin_disabled"}), 403
+    auth = request.headers.get("Authorization", "")
+    supplied = auth[7:] if auth.startswith("Bearer ") else request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "forbidden"}), 403
+    return None
+
+
+@app.post("/api/admin/reload")
+def admin_reload():
+    """Recarga protocols.json y los sinónimos en este worker (con `force` aunque no hayan cambiado)."""
+    denied = _admin_denied()
+    if denied is not None:
+        return denied
+    data = request.get_json(silent=True) or {}
+    try:
+        _, changed = content.reload(force=bool(data.get("force")), raise_errors=True)
+    except (OSError, ValueError, TypeError) as exc:
+        return jsonify({"ok": False, "error": "reload_failed", "detail": str(exc)}), 422
+    return jsonify({"ok": True, "changed": changed, **content.stats()})
+
+
+@app.route("/api/admin/profile", methods=["GET", "POST", "DELETE"])
+def admin_profile():
+    """
+    GET: pilas colapsadas (texto para flamegraph.pl/speedscope, `?endpoint=guide`
+    para uno solo) o, con `?format=json`, el resumen por endpoint.
+    POST `{ "rate": 0.05, "header": true }`: activa/desactiva en este worker.
+    DELETE: vacía lo acumulado.
+    """
+    denied = _admin_denied()
+    if denied is not None:
+        return denied
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        try:
+            profiler.configure(
+                rate=data.get("rate"),
+                allow_header=data.get("header") if "header" in data else None,
+            )
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": "invalid_rate"}), 400
+        return jsonify({"ok": True, **profiler.summary(top=0)})
+    if request.method == "DELETE":
+        profiler.clear()
+        return jsonify({"ok": True})
+    if request.args.get("format") == "json":
+        return jsonify(profiler.summary())
+    return Response(profiler.collapsed(request.args.get("endpoint")), mimetype="text/plain")
+
+
 @app.post("/call")
 def call_endpoint():
+    """Encola la llamada y responde 202 al momento; el estado se consulta en /call/<job_id>."""
     data = request.get_json(silent=True) or {}
     number = (data.get("to") or "").strip()
     if not number:
         return jsonify({"ok": False, "error": "missing_number"}), 400
 
     try:
-        result = place_call(number)
+        job = call_dispatcher.submit(number)
     except ValueError as exc:
         return jsonify({"ok": False, "error": str(exc)}), 400
+    except CallQueueFull as busy:
+        response = jsonify({"ok": False, "error": "call_queue_full", "retry_after": busy.retry_after})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(busy.retry_after)
+        return response
+
+    mode = call_dispatcher.provider.name
+    app.logger.info("Llamada encolada para %s (%s, job %s)", number, mode, job.id)
+    response = jsonify({
+        "ok": True,
+        "mode": mode,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/call/{job.id}",
+    })
+    response.status_code = 202
+    response.headers["Location"] = f"/call/{job.id}"
+    return response
 
-    if not result.get("ok"):
-        return jsonify({"ok": False, "error": result.get("error", "call_failed")}), 502
 
-    app.logger.info("Llamada preparada para %s (%s)", number, result.get("provider", "mock"))
-    return jsonify({"ok": True, "mode": result.get("provider", "mock")})
+@app.get("/call/<job_id>")
+def call_status(job_id: str):
+    job = call_dispatcher.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown_call"}), 404
+    return jsonify({"ok": job["status"] != "failed", "mode": call_dispatcher.provider.name, **job})
 
 
 @app.post("/save-config")
@@ -282,58 +564,124 @@ def save_config():
 
 @app.post("/api/stt")
 def stt():
+    if ROLE == "text":
+        return _audio_disabled()
     upload = request.files.get("audio")
     if not upload:
         return jsonify({"error": "no-audio"}), 400
 
-    cleanup: list[str] = []
+    with _stage("upload_read"):
+        data = upload.read()
+
     try:
-        audio_path, cleanup = _prepare_audio_file(upload)
+        text = audio_pool.run("stt", _transcribe, upload, data, _stt_language(), timeout=AUDIO_TIMEOUT)
+    except PoolSaturated as busy:
+        return _audio_busy(busy)
+    except FutureTimeout:
+        return jsonify({"error": "audio_timeout"}), 504
     except RuntimeError as error:
         status_code = 503 if str(error) == "ffmpeg_not_available" else 500
         return jsonify({"error": str(error)}), status_code
 
-    recognizer = sr.Recognizer()
-    try:
-        with sr.AudioFile(audio_path) as source:
-            audio = recognizer.record(source)
+    return jsonify({"text": text})
+
+
+def _stt_language() -> str:
+    """Idioma del reconocimiento: el de la petición o, si no viene, el voice_lang configurado."""
+    return (
+        request.form.get("lang")
+        or request.form.get("language")
+        or request.args.get("lang")
+        or _runtime_config.get("voice_lang")
+        or "es-ES"
+    )
+
+
+def _transcribe(upload, data: bytes, language: str) -> str:
+    """Decodifica y reconoce; se ejecuta en el pool de audio, fuera del hilo de la petición."""
+    with _stage("decode", endpoint="stt"):
         try:
-            text = recognizer.recognize_google(audio, language="es-ES")
-        except (sr.UnknownValueError, sr.RequestError):
-            text = ""
-    finally:
-        cleanup_paths(cleanup)
+            audio, _ = decode_upload(data)
+        except RuntimeError as error:
+            if str(error) not in ("ffmpeg_conversion_failed", "ffmpeg_not_available"):
+                raise
+            # Algunos contenedores (p. ej. m4a con el índice al final) necesitan un fichero con seek, y
+            # sin ffmpeg sr.AudioFile aún puede leer WAV/AIFF/FLAC (si no, vuelve a dar ffmpeg_not_available)
+            audio = _decode_via_tempfile(upload)
 
-    return jsonify({"text": text})
+    with _stage("recognize", endpoint="stt"):
+        return stt_backend.transcribe(audio, language)
+
+
+def _audio_disabled():
+    # Los workers de texto no cargan STT/TTS: el proxy debe mandar el audio a los workers de audio
+    return jsonify({"error": "audio_disabled", "role": ROLE}), 503
+
+
+def _audio_busy(busy: PoolSaturated):
+    response = jsonify({"error": "audio_busy", "retry_after": busy.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(busy.retry_after)
+    return response
 
 
 @app.get("/api/tts")
 def tts():
-    """TTS sencillo: usa gTTS si está disponible.
+    """TTS con caché por contenido: usa gTTS (o el sintetizador configurado) solo en fallos de caché.
     Devuelve audio/mpeg. Parámetros: text, lang (opcional, por defecto es-ES).
     """
     text = (request.args.get("text") or "").strip()
-    lang = (request.args.get("lang") or _runtime_config.get("voice_lang") or "es-ES").split("-")[0]
+    lang = normalize_lang(request.args.get("lang") or _runtime_config.get("voice_lang") or "es-ES")
     if not text:
         return jsonify({"error": "missing_text"}), 400
-    if gTTS is None:
-        return jsonify({"error": "tts_unavailable"}), 501
-    tmp_mp3 = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-    try:
+
+    # La clave depende solo de (texto, lang): si el cliente ya la tiene no hace falta sintetizar
+    etag = cache_key(text, lang)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
         try:
-            tts_obj = gTTS(text=text, lang=lang)
-            tts_obj.save(tmp_mp3.name)
+            # Los aciertos de caché se sirven en el hilo de la petición; solo la síntesis va al pool
+            cached = tts_cache.peek(text, lang)
+            if cached is None and ROLE == "text":
+                return _audio_disabled()
+            etag, audio = cached or audio_pool.run("tts", tts_cache.get, text, lang, timeout=AUDIO_TIMEOUT)
+        except PoolSaturated as busy:
+            return _audio_busy(busy)
+        except FutureTimeout:
+            return jsonify({"error": "audio_timeout"}), 504
+        except TTSUnavailable:
+            return jsonify({"error": "tts_unavailable"}), 501
         except Exception as exc:  # pragma: no cover - depende del entorno
-            os.unlink(tmp_mp3.name)
             return jsonify({"error": "tts_failed", "detail": str(exc)}), 500
-        return send_file(tmp_mp3.name, mimetype="audio/mpeg", as_attachment=False, download_name="tts.mp3")
-    finally:
-        # Dejar que Werkzeug haga streaming del archivo; programar limpieza posterior
-        # En entornos de desarrollo, no hace falta una cola; borramos al terminar la petición
-        try:
-            os.unlink(tmp_mp3.name)
-        except OSError:
-            pass
+        response = Response(audio, mimetype="audio/mpeg")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = TTS_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+@app.get("/api/bundle")
+def bundle():
+    """Paquete offline (protocolos, mapa de intenciones, sinónimos y audio de los pasos) para el service worker."""
+    # Idioma sin autenticar: fuera de SUPPORTED_LANGS se usa el voice_lang configurado
+    lang = supported_lang(request.args.get("lang"), _runtime_config.get("voice_lang"))
+    build = offline_bundle.get(lang)
+    gzipped = request.accept_encodings["gzip"] > 0
+    etag = f"{build.etag}-gzip" if gzipped else build.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(build.gzip if gzipped else build.body, mimetype="application/json")
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    # Se revalida en cada visita: si no ha cambiado, 304 sin cuerpo
+    response.cache_control.no_cache = True
+    response.headers["X-Bundle-Audio"] = f"{build.audio_count}/{build.audio_total}"
+    return response
 
 
 @app.post("/api/guide")
@@ -352,85 +700,22 @@ def guide():
             "session_id": session_id,
         })
 
-    intent, conf = classify_text(query)
-    confidence_value = round(conf, 3) if conf is not None else None
-    protocol_id = bot.intent_to_protocol(intent)
-    protocol = bot.get_protocol(protocol_id)
-    if not protocol:
+    turn = guide_engine.guide(session_id, query)
+    if turn is None:
         return jsonify({"error": "protocol_not_found"}), 404
+    _log_turn("guide", session_id, query, turn, t0)
 
-    previous = _session_state.get(session_id, {})
-    history = list(previous.get("history", []))
-    history.append({"user_text": query, "intent": intent})
-    if len(history) > MAX_HISTORY_ITEMS:
-        history = history[-MAX_HISTORY_ITEMS:]
-
-    previous_protocol = previous.get("protocol_id")
-    previous_index = int(previous.get("step_index", -1))
-
-    if previous_protocol != protocol_id:
-        step_index = 0
-    else:
-        step_index = previous_index + 1
-
-    steps = protocol.get("steps", [])
-    total_steps = len(steps)
-
-    if not steps:
-        step_number = 0
-        step_text = "No hay instrucciones disponibles en este momento."
-        has_next = False
-    else:
-        if step_index >= total_steps:
-            step_text = (
-                "Has completado las instrucciones. Permanece con la persona y espera ayuda profesional."
-            )
-            step_number = total_steps
-            step_index = total_steps - 1
-            has_next = False
-        else:
-            step_text = steps[step_index]
-            step_number = step_index + 1
-            has_next = step_index < (total_steps - 1)
-
-    context = {
-        "protocol_id": protocol_id,
-        "step_index": step_index,
-        "history": history,
-        "total_steps": total_steps,
-    }
-    _session_state[session_id] = context
-    _prune_sessions()
-
-    metrics.log(
-        event="guide",
-        session_id=session_id,
-        user_text=query,
-        intent=intent,
-        confidence=confidence_value,
-        protocol_id=protocol_id,
-        step_index=step_index,
-        latency_ms=int((time() - t0) * 1000),
-    )
-
-    return jsonify({
-        "step": step_number,
-        "text": step_text,
-        "say": step_text,
-        "next": has_next,
-        "title": protocol.get("title", "Protocolo"),
-        "session_id": session_id,
-        "protocol_id": protocol_id,
-        "confidence": confidence_value,
-        "total_steps": total_steps,
-    })
+    with _stage("serialize"):
+        return _spliced(
+            turn.payload.fragments["guide"],
+            confidence=_round_confidence(turn.confidence),
+            session_id=session_id,
+        )
 
 
 @app.post("/api/assistant")
 def assistant():
-    """Alias de /api/guide para compatibilidad con frontends alternativos."""
-    # Reusar la lógica de guide() leyendo directamente request.data
-    # Flask no facilita llamar otra vista con el mismo contexto, así que copiamos la esencia mínima
+    """Alias de /api/guide para compatibilidad con frontends alternativos (usa `step_text`)."""
     t0 = time()
     data = request.get_json(force=True) or {}
     query = (data.get("text") or data.get("query") or "").strip()
@@ -445,76 +730,17 @@ def assistant():
             "session_id": session_id,
         })
 
-    intent, conf = classify_text(query)
-    protocol_id = bot.intent_to_protocol(intent)
-    protocol = bot.get_protocol(protocol_id)
-    if not protocol:
+    turn = guide_engine.guide(session_id, query)
+    if turn is None:
         return jsonify({"error": "protocol_not_found"}), 404
+    _log_turn("assistant", session_id, query, turn, t0)
 
-    previous = _session_state.get(session_id, {})
-    history = list(previous.get("history", []))
-    history.append({"user_text": query, "intent": intent})
-    if len(history) > MAX_HISTORY_ITEMS:
-        history = history[-MAX_HISTORY_ITEMS:]
-
-    previous_protocol = previous.get("protocol_id")
-    previous_index = int(previous.get("step_index", -1))
-
-    if previous_protocol != protocol_id:
-        step_index = 0
-    else:
-        step_index = previous_index + 1
-
-    steps = protocol.get("steps", [])
-    total_steps = len(steps)
-    if not steps:
-        step_number = 0
-        step_text = "No hay instrucciones disponibles en este momento."
-        has_next = False
-    else:
-        if step_index >= total_steps:
-            step_text = (
-                "Has completado las instrucciones. Permanece con la persona y espera ayuda profesional."
-            )
-            step_number = total_steps
-            step_index = total_steps - 1
-            has_next = False
-        else:
-            step_text = steps[step_index]
-            step_number = step_index + 1
-            has_next = step_index < (total_steps - 1)
-
-    context = {
-        "protocol_id": protocol_id,
-        "step_index": step_index,
-        "history": history,
-        "total_steps": total_steps,
-    }
-    _session_state[session_id] = context
-    _prune_sessions()
-
-    metrics.log(
-        event="assistant",
-        session_id=session_id,
-        user_text=query,
-        intent=intent,
-        confidence=conf,
-        protocol_id=protocol_id,
-        step_index=step_index,
-        latency_ms=int((time() - t0) * 1000),
-    )
-
-    return jsonify({
-        "step": step_number,
-        "step_text": step_text,
-        "say": step_text,
-        "next": has_next,
-        "title": protocol.get("title", "Protocolo"),
-        "session_id": session_id,
-        "protocol_id": protocol_id,
-        "confidence": round(conf, 3) if conf is not None else None,
-        "total_steps": total_steps,
-    })
+    with _stage("serialize"):
+        return _spliced(
+            turn.payload.fragments["assistant"],
+            confidence=_round_confidence(turn.confidence),
+            session_id=session_id,
+        )
 
 
 @app.post("/api/understand")
@@ -524,39 +750,109 @@ def understand():
     utter = data.get("text") or data.get("utterance") or ""
     session_id = _resolve_session(data)
 
-    intent, conf = classify_text(utter)
-    protocol_id = bot.intent_to_protocol(intent)
+    turn = guide_engine.understand(session_id, utter)
+    with _stage("metrics_write"):
+        metrics.log(
+            event="understand",
+            session_id=session_id,
+            user_text=utter,
+            intent=turn.intent,
+            confidence=turn.confidence,
+            latency_ms=int((time() - t0) * 1000),
+        )
 
-    previous = _session_state.get(session_id, {})
-    history = list(previous.get("history", []))
-    if utter:
-        history.append({"user_text": utter, "intent": intent})
-        if len(history) > MAX_HISTORY_ITEMS:
-            history = history[-MAX_HISTORY_ITEMS:]
+    with _stage("serialize"):
+        return jsonify({
+            "intent": turn.intent,
+            "confidence": _round_confidence(turn.confidence),
+            "context": _echo_context(turn.context, data),
+            "session_id": session_id,
+        })
 
-    context = {
-        "protocol_id": protocol_id,
-        "step_index": -1,
-        "history": history,
-    }
-    _session_state[session_id] = context
-    _prune_sessions()
 
-    metrics.log(
-        event="understand",
-        session_id=session_id,
-        user_text=utter,
-        intent=intent,
-        confidence=conf,
-        latency_ms=int((time() - t0) * 1000),
+def _spliced(fragment: str, **fields: Any) -> Response:
+    """JSON de respuesta: trozo precalculado del paso (ProtocolRecord) más los campos de la sesión."""
+    parts = [b"{", fragment.encode("utf-8")]
+    for key, value in fields.items():
+        parts.append(b',"%s":' % key.encode("ascii"))
+        parts.append(app.json.dumpb(value))
+    parts.append(b"}\n")
+    return app.response_class(b"".join(parts), mimetype="application/json")
+
+
+def _echo_context(context: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Contexto que se devuelve al cliente; en modo compacto, sin historial salvo que lo pida."""
+    if not COMPACT_RESPONSES or "history" not in context or data.get("include_history") \
+            or request.args.get("include_history") == "1":
+        return context
+    return {key: value for key, value in context.items() if key != "history"}
+
+
+def _round_confidence(conf: Optional[float]) -> Optional[float]:
+    return round(conf, 3) if conf is not None else None
+
+
+def _log_turn(event: str, session_id: str, query: str, turn, t0: float) -> None:
+    with _stage("metrics_write"):
+        metrics.log(
+            event=event,
+            session_id=session_id,
+            user_text=query,
+            intent=turn.intent,
+            confidence=_round_confidence(turn.confidence),
+            protocol_id=turn.protocol_id,
+            step_index=turn.step_index,
+            latency_ms=int((time() - t0) * 1000),
+        )
+
+
+@app.post("/api/understand_batch")
+def understand_batch():
+    """Clasifica un lote de textos: JSON para lotes pequeños, NDJSON en streaming para grandes."""
+    t0 = time()
+    data = request.get_json(force=True) or {}
+    texts = data.get("texts") or data.get("utterances") or []
+    if not isinstance(texts, list):
+        return jsonify({"error": "invalid_texts"}), 400
+    if len(texts) > MAX_BATCH_ITEMS:
+        return jsonify({"error": "batch_too_large", "max_items": MAX_BATCH_ITEMS}), 413
+    texts = [str(t) if t is not None else "" for t in texts]
+
+    stream = (
+        len(texts) > BATCH_STREAM_THRESHOLD
+        or data.get("stream")
+        or "application/x-ndjson" in (request.headers.get("Accept") or "")
     )
 
-    return jsonify({
-        "intent": intent,
-        "confidence": round(conf, 3),
-        "context": context,
-        "session_id": session_id,
-    })
+    session_id = _resolve_session(data)
+
+    def log_batch() -> None:
+        # Tras clasificar todo el lote: la latencia incluye la clasificación
+        metrics.log(
+            event="understand_batch",
+            session_id=session_id,
+            latency_ms=int((time() - t0) * 1000),
+        )
+
+    if not stream:
+        results = [
+            {"intent": intent, "confidence": round(conf, 3)}
+            for intent, conf in classify_many(texts)
+        ]
+        log_batch()
+        return jsonify({"count": len(texts), "results": results})
+
+    def generate():
+        for start in range(0, len(texts), BATCH_CHUNK_SIZE):
+            chunk = classify_many(texts[start:start + BATCH_CHUNK_SIZE])
+            yield b"".join(
+                app.json.dumpb({"index": start + offset, "intent": intent, "confidence": round(conf, 3)}) + b"\n"
+                for offset, (intent, conf) in enumerate(chunk)
+            )
+        # Solo cuando el generador se ha consumido entero (no si el cliente corta)
+        log_batch()
+
+    return Response(generate(), mimetype="application/x-ndjson")
 
 
 @app.post("/api/next_step")
@@ -564,58 +860,35 @@ def next_step():
     t0 = time()
     data = request.get_json(force=True) or {}
     session_id = _resolve_session(data)
-    context = data.get("context") or _session_state.get(session_id) or {}
 
-    protocol_id = context.get("protocol_id") or bot.intent_to_protocol(data.get("intent"))
-    protocol = bot.get_protocol(protocol_id)
-    if not protocol:
+    turn = guide_engine.next_step(session_id, context=data.get("context"), intent=data.get("intent"))
+    if turn is None:
         return jsonify({"error": "protocol_not_found"}), 404
 
-    steps = protocol.get("steps", [])
-    total_steps = len(steps)
-
-    current_index = int(context.get("step_index", -1)) + 1
-    done = False
-    if current_index >= total_steps:
-        current_index = total_steps
-        step_text = (
-            "Has completado el protocolo. Permanece con la víctima y espera instrucciones profesionales."
+    with _stage("metrics_write"):
+        metrics.log(
+            event="next_step",
+            session_id=session_id,
+            protocol_id=turn.protocol_id,
+            step_index=turn.step_index,
+            latency_ms=int((time() - t0) * 1000),
         )
-        done = True
-    else:
-        step_text = steps[current_index]
-        done = current_index == (total_steps - 1)
 
-    context.update({
-        "protocol_id": protocol_id,
-        "step_index": current_index,
-    })
-    _session_state[session_id] = context
-
-    metrics.log(
-        event="next_step",
-        session_id=session_id,
-        protocol_id=protocol_id,
-        step_index=current_index,
-        latency_ms=int((time() - t0) * 1000),
-    )
-
-    return jsonify({
-        "step_text": step_text,
-        "done": done,
-        "total_steps": total_steps,
-        "context": context,
-        "title": protocol.get("title", "Protocolo"),
-        "session_id": session_id,
-    })
+    with _stage("serialize"):
+        return _spliced(
+            turn.payload.fragments["next_step"],
+            context=_echo_context(turn.context, data),
+            session_id=session_id,
+        )
 
 
 @app.post("/api/protocol")
 def get_protocol():
     data = request.get_json(force=True) or {}
-    proto = data.get("protocol_id")
-    payload = bot.get_protocol(proto)
-    return jsonify(payload), (200 if payload else 404)
+    record = content.current.bot.get_record(data.get("protocol_id"))
+    if record is None:
+        return jsonify(None), 404
+    return app.response_class(record.json + "\n", mimetype="application/json")
 
 
 @app.post("/api/feedback")
@@ -634,6 +907,55 @@ def feedback():
     return jsonify({"ok": True})
 
 
+def _prewarm_tts() -> None:
+    """Sintetiza en segundo plano los pasos de todos los protocolos (CONRUMBO_TTS_PREWARM=1)."""
+    lang = normalize_lang(_runtime_config.get("voice_lang"))
+
+    def _run() -> None:
+        try:
+            created = tts_cache.prewarm((text, lang) for text in protocol_step_texts(content.current.bot.protocols))
+            app.logger.info("TTS precalentado: %s audios nuevos", created)
+        except Exception as exc:  # pragma: no cover - depende del entorno
+            app.logger.warning("No se pudo precalentar TTS: %s", exc)
+
+    threading.Thread(target=_run, name="tts-prewarm", daemon=True).start()
+
+
+def _warm_stt() -> None:
+    """Carga el modelo STT local en segundo plano para que la primera petición no lo pague."""
+
+    def _run() -> None:
+        try:
+            stt_backend.warm()
+        except Exception as exc:  # pragma: no cover - depende del entorno
+            app.logger.warning("No se pudo cargar el backend STT %s: %s", stt_backend.name, exc)
+
+    threading.Thread(target=_run, name="stt-warm", daemon=True).start()
+
+
+def start_worker_threads() -> None:
+    """Hilos de fondo de este proceso. Con gunicorn --preload se llama en cada worker tras el fork
+    (los hilos no sobreviven al fork y un cerrojo tomado en el máster bloquearía al worker)."""
+    metrics.ensure_writer()
+    content.start_watcher(float(os.getenv("CONRUMBO_CONTENT_WATCH", "5")))
+    # Solo desarrollo: en producción el frontend no cambia sin desplegar
+    static_bundle.start_watcher(float(os.getenv("CONRUMBO_STATIC_WATCH", "0")))
+    _session_state.start_sweeper()
+    if ROLE == "text":
+        return
+    if os.getenv("CONRUMBO_TTS_PREWARM") == "1":
+        _prewarm_tts()
+    if not LAZY_IMPORTS or stt_backend.has_model:
+        _warm_stt()
+
+
+if not LAZY_IMPORTS:
+    # Antes del fork (con preload) los módulos quedan compartidos copy-on-write entre workers
+    lazy_deps.load_all()
+if not PRELOADED:
+    start_worker_threads()
+
+
 def _log_startup() -> None:
     if getattr(app, "_startup_logged", False):
         return
@@ -0,0 +1,181 @@
+"""
+Entrada ASGI de producción (el bloque __main__ de app.py es solo para desarrollo).
+
+    uvicorn asgi:application --app-dir backend --host 0.0.0.0 --port 8000
+    python backend/asgi.py            # lo mismo, si uvicorn está instalado
+
+Adapta la app Flask (WSGI) a ASGI repartiendo el trabajo según la ruta:
+
+- Texto (/api/guide, /api/next_step, ...): a un executor pequeño dedicado
+  solo al texto. Nunca corre en el propio bucle: el clasificador difuso, la
+  espera del lock de una sesión o el agregado de /api/metrics pueden tardar,
+  y en el bucle frenarían todas las conexiones abiertas.
+- E/S lenta (/api/stt, /api/tts, lotes, estáticos): a otro executor,
+  así una espera de Google o gTTS nunca ocupa el bucle ni los hilos del
+  texto. /call solo encola (la marcación va en los hilos de call_dispatch)
+  y cuenta como texto.
+
+Un solo proceso mantiene así miles de conexiones abiertas mientras las
+peticiones de audio esperan a la red.
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+import app as flask_app
+
+# Rutas rápidas y sin red: van al executor del texto
+TEXT_PATHS = frozenset({
+    "/api/guide",
+    "/api/assistant",
+    "/api/understand",
+    "/api/next_step",
+    "/api/protocol",
+    "/api/feedback",
+    "/api/metrics",
+    "/api/health",
+    "/health",
+    "/save-config",
+    "/call",
+})
+TEXT_PREFIXES = ("/call/",)
+
+_END = object()
+
+
+class WSGIBridge:
+    """Adaptador ASGI → WSGI que despacha cada petición a un executor según la ruta."""
+
+    def __init__(self, wsgi_app: Callable, text_threads: int = 4, io_threads: int = 32):
+        self.wsgi_app = wsgi_app
+        self.text_executor = ThreadPoolExecutor(text_threads, thread_name_prefix="asgi-text")
+        self.io_executor = ThreadPoolExecutor(io_threads, thread_name_prefix="asgi-io")
+        self.on_shutdown: List[Callable[[], None]] = []
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for hook in self.on_shutdown:
+                    hook()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        environ = self._environ(scope, b"".join(chunks))
+
+        executor = self._executor_for(scope["path"])
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(executor, self._call, environ)
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        iterator = iter(body)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(executor, next, iterator, _END)
+                if chunk is _END:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    def _executor_for(self, path: str) -> ThreadPoolExecutor:
+        if path in TEXT_PATHS or path.startswith(TEXT_PREFIXES):
+            return self.text_executor
+        return self.io_executor
+
+    def _call(self, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], Iterable[bytes]]:
+        response: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+            return lambda data: None
+
+        body = self.wsgi_app(environ, start_response)
+        return response["status"], response["headers"], body
+
+    @staticmethod
+    def _environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for raw_name, raw_value in scope.get("headers", []):
+            name = raw_name.decode("latin-1").upper().replace("-", "_")
+            value = raw_value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+                continue
+            if name == "CONTENT_LENGTH":
+                continue
+            key = f"HTTP_{name}"
+            if key in environ:
+                value = environ[key] + ("; " if key == "HTTP_COOKIE" else ",") + value
+            environ[key] = value
+        return environ
+
+
+application = WSGIBridge(
+    flask_app.app,
+    text_threads=int(os.getenv("CONRUMBO_ASGI_TEXT_THREADS", "4")),
+    io_threads=int(os.getenv("CONRUMBO_ASGI_IO_THREADS", "32")),
+)
+application.on_shutdown.append(lambda: flask_app.metrics.flush(timeout=5))
+
+
+def main() -> None:
+    try:
+        import uvicorn  # type: ignore
+    except ImportError:  # pragma: no cover - depende del entorno
+        sys.exit("uvicorn no está instalado: pip install uvicorn (o usa hypercorn asgi:application)")
+    uvicorn.run(
+        application,
+        host=os.getenv("CONRUMBO_HOST", "0.0.0.0"),
+        port=int(os.getenv("CONRUMBO_PORT", "8000")),
+        log_level="info",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Conversión de audio para /api/stt sin ficheros temporales.
+
+- WAV/PCM mono: se lee directamente de memoria con `wave`. Otros WAV
+  (estéreo, 8 bits...) van por `sr.AudioFile` sobre el buffer, que mezcla a
+  mono, sin necesitar ffmpeg.
+- Resto de contenedores (webm, ogg, m4a, mp3): los bytes entran por stdin de
+  ffmpeg y el PCM 16 kHz mono s16le sale por stdout a un buffer.
+
+speech_recognition solo se importa al decodificar el primer audio.
+"""
+from __future__ import annotations
+
+import io
+import shutil
+import subprocess
+import wave
+from typing import Optional, Tuple
+
+from lazy_deps import lazy_module
+
+sr = lazy_module("speech_recognition")
+
+STT_SAMPLE_RATE = 16000
+
+
+def is_pcm_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def decode_wav(data: bytes) -> Optional[sr.AudioData]:
+    """AudioData a partir de un WAV PCM en memoria (None si no es PCM legible)."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            if wav.getcomptype() != "NONE" or wav.getnchannels() != 1:
+                return None
+            frames = wav.readframes(wav.getnframes())
+            return sr.AudioData(frames, wav.getframerate(), wav.getsampwidth())
+    except (wave.Error, EOFError):
+        return None
+
+
+def decode_audiofile(data: bytes) -> Optional[sr.AudioData]:
+    """AudioData vía sr.AudioFile en memoria (WAV estéreo, AIFF, FLAC); None si no lo reconoce."""
+    try:
+        with sr.AudioFile(io.BytesIO(data)) as source:
+            return sr.Recognizer().record(source)
+    except (ValueError, EOFError, wave.Error):
+        return None
+
+
+def ffmpeg_to_pcm(data: bytes, sample_rate: int = STT_SAMPLE_RATE) -> bytes:
+    """Convierte cualquier contenedor soportado por ffmpeg a PCM s16le mono vía pipes."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg_not_available")
+    process = subprocess.run(
+        [
+            ffmpeg,
+            "-hide_banner",
+            "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "s16le",
+            "-acodec", "pcm_s16le",
+            "-ar", str(sample_rate),
+            "-ac", "1",
+            "pipe:1",
+        ],
+        input=data,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    if process.returncode != 0 or not process.stdout:
+        raise RuntimeError("ffmpeg_conversion_failed")
+    return process.stdout
+
+
+def decode_upload(data: bytes) -> Tuple[sr.AudioData, str]:
+    """
+    Devuelve (AudioData, ruta usada). La ruta es "wav" si no hizo falta
+    ffmpeg, "audiofile" si era un WAV que hubo que mezclar/convertir con
+    speech_recognition o "ffmpeg_pipe" si se convirtió por pipes.
+    """
+    if is_pcm_wav(data):
+        audio = decode_wav(data)
+        if audio is not None:
+            return audio, "wav"
+        audio = decode_audiofile(data)
+        if audio is not None:
+            return audio, "audiofile"
+    pcm = ffmpeg_to_pcm(data)
+    return sr.AudioData(pcm, STT_SAMPLE_RATE, 2), "ffmpeg_pipe"
@@ -0,0 +1,81 @@
+"""
+Pool acotado para el trabajo de audio (ffmpeg, reconocimiento, síntesis).
+
+Admite como mucho `max_workers` tareas en ejecución más `max_queue` en
+espera; a partir de ahí `run()` rechaza al instante con PoolSaturated para
+que el endpoint responda 503 + Retry-After. Así una ráfaga de audios nunca
+ocupa todos los hilos del servidor y /api/guide y /api/next_step siguen
+teniendo hilos libres.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, Optional
+
+from latency import LatencyRegistry
+
+
+class PoolSaturated(RuntimeError):
+    def __init__(self, retry_after: int):
+        super().__init__("audio_busy")
+        self.retry_after = retry_after
+
+
+class AudioWorkPool:
+    def __init__(self, max_workers: int = 2, max_queue: int = 8, retry_after: int = 2,
+                 latency: Optional[LatencyRegistry] = None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.latency = latency
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def run(self, kind: str, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None,
+            **kwargs: Any) -> Any:
+        """Ejecuta `fn` en el pool y espera el resultado; PoolSaturated si no hay hueco."""
+        return self.submit(kind, fn, *args, **kwargs).result(timeout)
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Como run() pero sin esperar: devuelve el Future (trabajo de fondo con la misma admisión)."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolSaturated(self.retry_after)
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+        enqueued = perf_counter_ns()
+
+        def _task() -> Any:
+            if self.latency is not None:
+                self.latency.observe("conrumbo_audio_queue_wait_seconds", perf_counter_ns() - enqueued, kind=kind)
+            return fn(*args, **kwargs)
+
+        try:
+            future = self._executor.submit(_task)
+        except BaseException:
+            self._release()
+            raise
+        # El hueco se libera cuando termina la tarea, no cuando deja de esperar quien la pidió
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
@@ -0,0 +1,348 @@
+"""
+Cola de llamadas de emergencia salientes.
+
+POST /call solo encola un `CallJob` y responde 202 con su id; unos pocos
+hilos lo marcan contra el proveedor (Twilio con un único cliente reutilizado
+o el mock local) con reintentos y backoff exponencial, y GET /call/<id>
+devuelve el estado. Con `state_dir` cada cambio de estado se escribe además
+en `<state_dir>/<job_id>.json`, así que cualquier worker de gunicorn puede
+contestar GET /call/<id> aunque el trabajo lo tenga otro proceso.
+"""
+import heapq
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from time import monotonic, perf_counter_ns, sleep, time
+from typing import Any, Dict, List, Optional, Tuple
+
+from latency import LatencyRegistry
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+DIALING = "dialing"
+RETRYING = "retrying"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class CallError(RuntimeError):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class CallQueueFull(RuntimeError):
+    def __init__(self, retry_after: int):
+        super().__init__("call_queue_full")
+        self.retry_after = retry_after
+
+
+class CallProvider:
+    name = "base"
+
+    def place(self, to: str) -> str:
+        """Marca `to` y devuelve el identificador del proveedor; CallError si falla."""
+        raise NotImplementedError
+
+
+class MockProvider(CallProvider):
+    """Sustituto local: espera `latency` segundos y falla con probabilidad `failure_rate`."""
+
+    name = "mock"
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def place(self, to: str) -> str:
+        if self.latency > 0:
+            sleep(self.latency)
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+        if failed:
+            raise CallError("mock_failure")
+        logger.info("Simulando llamada (mock) a %s", to)
+        return f"mock-{uuid.uuid4().hex[:12]}"
+
+
+class TwilioProvider(CallProvider):
+    """Un solo cliente Twilio (con su sesión HTTP y conexiones) para todas las llamadas.
+
+    La librería se importa y el cliente se crea en la primera llamada, no al
+    arrancar el worker.
+    """
+
+    name = "twilio"
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, twiml_url: str):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.twiml_url = twiml_url
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from twilio.http.http_client import TwilioHttpClient  # type: ignore
+                    from twilio.rest import Client  # type: ignore
+
+                    self._client = Client(
+                        self.account_sid, self.auth_token, http_client=TwilioHttpClient(pool_connections=True)
+                    )
+        return self._client
+
+    def place(self, to: str) -> str:
+        client = self.client
+        try:
+            call = client.calls.create(to=to, from_=self.from_number, url=self.twiml_url)
+        except Exception as exc:
+            status = getattr(exc, "status", None)
+            # Errores 4xx (número inválido, credenciales) no se arreglan reintentando
+            retryable = not isinstance(status, int) or status >= 500 or status == 429
+            raise CallError(str(exc), retryable=retryable) from exc
+        logger.info("Llamada enviada vía Twilio a %s", to)
+        return call.sid
+
+
+def create_call_provider() -> CallProvider:
+    """Twilio si hay credenciales y librería; si no, el mock (CONRUMBO_CALL_MOCK_*)."""
+    account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+    from_number = os.getenv("TWILIO_FROM_NUMBER")
+    twiml_url = (
+        os.getenv("TWILIO_TWIML_URL")
+        or os.getenv("TWILIO_CALL_URL")
+        or "http://demo.twilio.com/docs/voice.xml"
+    )
+    if account_sid and auth_token and from_number:
+        # find_spec comprueba que está instalada sin importarla
+        if importlib.util.find_spec("twilio") is not None:
+            return TwilioProvider(account_sid, auth_token, from_number, twiml_url)
+        logger.warning("Twilio no disponible: falta la librería twilio")
+    return MockProvider(
+        latency=float(os.getenv("CONRUMBO_CALL_MOCK_LATENCY", "0")),
+        failure_rate=float(os.getenv("CONRUMBO_CALL_MOCK_FAILURE_RATE", "0")),
+    )
+
+
+class CallJob:
+    __slots__ = ("id", "to", "status", "attempts", "sid", "error", "created_at", "updated_at", "next_attempt_at")
+
+    def __init__(self, to: str):
+        self.id = uuid.uuid4().hex
+        self.to = to
+        self.status = QUEUED
+        self.attempts = 0
+        self.sid: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = self.updated_at = time()
+        self.next_attempt_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "to": self.to,
+            "status": self.status,
+            "attempts": self.attempts,
+            "sid": self.sid,
+            "error": self.error,
+            "created_at": round(self.created_at, 3),
+            "updated_at": round(self.updated_at, 3),
+            "next_attempt_at": round(self.next_attempt_at, 3) if self.next_attempt_at else None,
+        }
+
+
+class CallDispatcher:
+    def __init__(self, provider: CallProvider, workers: int = 2, max_attempts: int = 4,
+                 backoff: float = 1.0, backoff_max: float = 30.0, max_pending: int = 1000,
+                 max_jobs: int = 5000, retry_after: int = 2, latency: Optional[LatencyRegistry] = None,
+                 state_dir: Optional[os.PathLike] = None):
+        self.provider = provider
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.retry_after = retry_after
+        self.latency = latency
+        self.state_dir = Path(state_dir) if state_dir is not None else None
+        if self.state_dir is not None:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._cond = threading.Condition()
+        # (momento en que toca, orden de llegada, id): los reintentos esperan aquí su backoff
+        self._due: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._jobs: "OrderedDict[str, CallJob]" = OrderedDict()
+        self._threads: List[threading.Thread] = []
+        self._pid: Optional[int] = None
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def submit(self, to: str) -> CallJob:
+        number = str(to or "").strip()
+        if not number:
+            raise ValueError("number_required")
+        self._ensure_workers()
+        job = CallJob(number)
+        with self._cond:
+            if len(self._due) >= self.max_pending:
+                self.rejected += 1
+                raise CallQueueFull(self.retry_after)
+            self._jobs[job.id] = job
+            self._save(job)
+            self._trim_jobs()
+            heapq.heappush(self._due, (monotonic(), next(self._seq), job.id))
+            self.submitted += 1
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        # Trabajo de otro worker: su último estado está en disco
+        if self.state_dir is None or not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self.state_dir / f"{job_id}.json", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "pending": len(self._due),
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "retries": self.retries,
+                "rejected": self.rejected,
+            }
+
+    def _ensure_workers(self) -> None:
+        # Los hilos no sobreviven a un fork (gunicorn --preload): se arrancan en el proceso que los usa
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f"call-dispatch-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._due:
+                        due, _, job_id = self._due[0]
+                        wait = due - monotonic()
+                        if wait <= 0:
+                            heapq.heappop(self._due)
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job.status = DIALING
+                job.attempts += 1
+                job.next_attempt_at = None
+                job.updated_at = time()
+                self._save(job)
+                self.in_flight += 1
+            self._attempt(job)
+
+    def _attempt(self, job: CallJob) -> None:
+        t0 = perf_counter_ns()
+        sid = error = None
+        retryable = False
+        try:
+            sid = self.provider.place(job.to)
+        except CallError as exc:
+            error, retryable = str(exc), exc.retryable
+        except Exception as exc:  # pragma: no cover - fallo inesperado del proveedor
+            logger.exception("Falló la llamada saliente a %s", job.to)
+            error, retryable = str(exc), True
+        outcome = "ok" if error is None else "error"
+        if self.latency is not None:
+            self.latency.observe("conrumbo_call_dispatch_seconds", perf_counter_ns() - t0,
+                                 provider=self.provider.name, outcome=outcome)
+
+        with self._cond:
+            self.in_flight -= 1
+            job.updated_at = time()
+            if error is None:
+                job.status, job.sid, job.error = COMPLETED, sid, None
+                self.completed += 1
+            elif retryable and job.attempts < self.max_attempts:
+                delay = min(self.backoff_max, self.backoff * 2 ** (job.attempts - 1))
+                delay *= 0.5 + random.random() / 2
+                job.status, job.error = RETRYING, error
+                job.next_attempt_at = time() + delay
+                heapq.heappush(self._due, (monotonic() + delay, next(self._seq), job.id))
+                self.retries += 1
+                self._cond.notify()
+            else:
+                job.status, job.error = FAILED, error
+                self.failed += 1
+                logger.error("Llamada a %s fallida tras %s intentos: %s", job.to, job.attempts, error)
+            self._save(job)
+
+    def _save(self, job: CallJob) -> None:
+        """Publica el estado de `job` para los demás procesos (llamar con `_cond` tomado)."""
+        if self.state_dir is None:
+            return
+        path = self.state_dir / f"{job.id}.json"
+        tmp = path.with_name(f".{job.id}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(job.to_dict(), f)
+            os.replace(tmp, path)
+        except OSError:
+            logger.exception("No se pudo guardar el estado de la llamada %s", job.id)
+
+    def _trim_jobs(self) -> None:
+        """Olvida los trabajos terminados más antiguos por encima de `max_jobs`."""
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].status in (COMPLETED, FAILED):
+                del self._jobs[job_id]
+                if self.state_dir is not None:
+                    try:
+                        (self.state_dir / f"{job_id}.json").unlink()
+                    except OSError:
+                        pass
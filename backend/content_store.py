@@ -0,0 +1,187 @@
+"""
+Recarga en caliente de protocols.json y de los sinónimos del clasificador.
+
+Cada recarga construye un BotEngine y un índice de sinónimos nuevos fuera del
+camino de las peticiones y los publica de una vez como una `ContentVersion`
+numerada. Las sesiones guardan el digest de la versión con la que empezaron
+su protocolo y siguen resolviendo pasos contra ella mientras se conserve (las
+últimas `keep` versiones). El digest depende solo del contenido, así que es
+el mismo en todos los workers aunque cada uno recargue por su cuenta.
+
+Los sinónimos salen de `synonyms_path` (JSON intención → lista de frases) si
+existe; si no, de nlp_processor.INTENT_SYNONYMS.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter_ns, time
+from typing import Any, Dict, List, Optional, Tuple
+
+import nlp_processor
+from emergency_bot import BotEngine
+from latency import LatencyRegistry
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "protocols_version"
+
+
+class ContentVersion:
+    __slots__ = ("version", "digest", "bot", "synonyms", "loaded_at", "fingerprint")
+
+    def __init__(self, version: int, bot: BotEngine, synonyms: Dict[str, List[str]],
+                 fingerprint: Tuple[Optional[int], ...]):
+        self.version = version
+        self.digest = hashlib.sha256(
+            json.dumps([bot.protocols, synonyms], sort_keys=True, separators=(",", ":")).encode("utf-8")
+        ).hexdigest()[:12]
+        self.bot = bot
+        self.synonyms = synonyms
+        self.loaded_at = time()
+        self.fingerprint = fingerprint
+
+
+class ContentStore:
+    def __init__(self, protocols_path, synonyms_path=None, keep: int = 8,
+                 latency: Optional[LatencyRegistry] = None):
+        self.protocols_path = Path(protocols_path)
+        self.synonyms_path = Path(synonyms_path) if synonyms_path else None
+        self.keep = keep
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._versions: "OrderedDict[str, ContentVersion]" = OrderedDict()
+        self._current: Optional[ContentVersion] = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload_ms = 0.0
+        self._failed_fingerprint: Optional[Tuple[Optional[int], ...]] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # La primera carga falla en voz alta: sin contenido válido no se arranca
+        self.reload(force=True, raise_errors=True)
+
+    @property
+    def current(self) -> ContentVersion:
+        return self._current
+
+    def get(self, digest: Optional[str]) -> ContentVersion:
+        """La versión con ese digest si aún se conserva; si no (o si es None), la actual."""
+        found = self._versions.get(digest) if isinstance(digest, str) else None
+        return found if found is not None else self._current
+
+    def reload(self, force: bool = False, raise_errors: bool = False) -> Tuple[ContentVersion, bool]:
+        """
+        Relee los ficheros y publica una versión nueva si han cambiado (o si
+        `force`). Devuelve (versión activa, si ha cambiado). Si el contenido
+        nuevo no es válido se conserva el anterior.
+        """
+        with self._reload_lock:
+            previous = self._current
+            fingerprint = self._fingerprint()
+            if not force and previous is not None and fingerprint in (
+                previous.fingerprint, self._failed_fingerprint
+            ):
+                return previous, False
+
+            t0 = perf_counter_ns()
+            try:
+                synonyms = self._load_synonyms()
+                bot = BotEngine(self.protocols_path, previous=previous.bot if previous else None)
+                bot.validate_intents(synonyms)
+                classifier = None
+                if previous is None:
+                    # Al arrancar, nlp_processor ya tiene construido el índice de INTENT_SYNONYMS
+                    if synonyms is not nlp_processor.INTENT_SYNONYMS:
+                        classifier = nlp_processor.build_classifier(synonyms)
+                elif synonyms != previous.synonyms:
+                    classifier = nlp_processor.build_classifier(synonyms)
+            except (OSError, ValueError, TypeError) as exc:
+                self.failures += 1
+                self._failed_fingerprint = fingerprint
+                if raise_errors:
+                    raise
+                logger.error("Recarga de protocolos/sinónimos descartada: %s", exc)
+                return previous, False
+
+            version = ContentVersion((previous.version + 1) if previous else 1, bot, synonyms, fingerprint)
+            if previous is not None and version.digest == previous.digest:
+                # Ficheros tocados pero con el mismo contenido: no hay versión nueva
+                previous.fingerprint = fingerprint
+                return previous, False
+            # Publicación: primero el índice del clasificador y después la tabla de protocolos
+            if classifier is not None:
+                nlp_processor.install_classifier(classifier)
+            with self._lock:
+                self._versions.pop(version.digest, None)
+                self._versions[version.digest] = version
+                while len(self._versions) > self.keep:
+                    self._versions.popitem(last=False)
+                self._current = version
+
+            elapsed = perf_counter_ns() - t0
+            self.reloads += previous is not None
+            self.last_reload_ms = elapsed / 1e6
+            if self.latency is not None:
+                self.latency.observe("conrumbo_content_reload_seconds", elapsed)
+            if previous is not None:
+                logger.info("Protocolos/sinónimos recargados: versión %s en %.1f ms",
+                            version.version, self.last_reload_ms)
+            return version, True
+
+    def start_watcher(self, interval: float = 5.0) -> None:
+        """Comprueba las fechas de modificación cada `interval` segundos y recarga si cambian."""
+        # Tras un fork el hilo del padre ya no existe (is_alive() es False) y se vuelve a arrancar
+        if (self._watcher is not None and self._watcher.is_alive()) or interval <= 0:
+            return
+
+        def _loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception:  # pragma: no cover - nunca tumbar el watcher
+                    logger.exception("Fallo vigilando protocolos/sinónimos")
+
+        self._watcher = threading.Thread(target=_loop, name="content-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self._current.version,
+                "digest": self._current.digest,
+                "loaded_at": round(self._current.loaded_at, 3),
+                "retained_versions": len(self._versions),
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_reload_ms": round(self.last_reload_ms, 3),
+            }
+
+    def _fingerprint(self) -> Tuple[Optional[int], ...]:
+        stamps: List[Optional[int]] = []
+        for path in (self.protocols_path, self.synonyms_path):
+            try:
+                stamps.append(os.stat(path).st_mtime_ns if path is not None else None)
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def _load_synonyms(self) -> Dict[str, List[str]]:
+        if self.synonyms_path is None or not self.synonyms_path.exists():
+            return nlp_processor.INTENT_SYNONYMS
+        with open(self.synonyms_path, "r", encoding="utf-8") as f:
+            synonyms = json.load(f)
+        if not isinstance(synonyms, dict) or not all(
+            isinstance(phrases, list) and all(isinstance(p, str) for p in phrases)
+            for phrases in synonyms.values()
+        ):
+            raise ValueError(f"invalid_synonyms: {self.synonyms_path}")
+        return synonyms
@@ -1,11 +1,113 @@
 import json
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NO_STEPS_TEXT = "No hay instrucciones disponibles en este momento."
+GUIDE_DONE_TEXT = "Has completado las instrucciones. Permanece con la persona y espera ayuda profesional."
+NEXT_DONE_TEXT = "Has completado el protocolo. Permanece con la víctima y espera instrucciones profesionales."
+FALLBACK_PROTOCOL = "pa_inconsciente_v1"
+
+
+def _fragment(payload: Dict) -> str:
+    """Objeto JSON sin llaves, para empalmar después los campos de la sesión."""
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True)[1:-1]
+
+
+class StepPayload:
+    """Un paso ya resuelto: lo que se guarda en sesión y los trozos de JSON de cada vista."""
+
+    __slots__ = ("step_index", "step_number", "text", "has_next", "fragments")
+
+    def __init__(self, step_index: int, step_number: int, text: str, has_next: bool,
+                 fragments: Dict[str, str]):
+        self.step_index = step_index
+        self.step_number = step_number
+        self.text = text
+        self.has_next = has_next
+        self.fragments = fragments
+
+
+class ProtocolRecord:
+    """
+    Protocolo compilado e inmutable. `guide[i]` es la respuesta de
+    /api/guide para el paso i (y `guide[total]` el cierre); `next[i]` lo
+    mismo para /api/next_step.
+    """
+
+    __slots__ = ("protocol_id", "title", "steps", "total_steps", "guide", "next", "json")
+
+    def __init__(self, protocol_id: str, raw: Dict):
+        title = raw.get("title", "Protocolo")
+        steps = raw.get("steps", [])
+        if not isinstance(steps, list) or not all(isinstance(step, str) for step in steps):
+            raise ValueError(f"invalid_protocol_steps: {protocol_id}")
+        self.protocol_id = protocol_id
+        self.title = title
+        self.steps: Tuple[str, ...] = tuple(steps)
+        self.total_steps = total = len(self.steps)
+        self.json = json.dumps(raw, separators=(",", ":"), sort_keys=True)
+
+        guide: List[StepPayload] = []
+        nexts: List[StepPayload] = []
+        for index, text in enumerate(self.steps):
+            has_next = index < total - 1
+            guide.append(self._guide_payload(index, index + 1, text, has_next))
+            nexts.append(self._next_payload(index, index + 1, text, has_next))
+        if total:
+            # Repetir al terminar deja el índice en el último paso y vuelve a dar el cierre
+            guide.append(self._guide_payload(total - 1, total, GUIDE_DONE_TEXT, False))
+        else:
+            guide.append(self._guide_payload(0, 0, NO_STEPS_TEXT, False))
+        nexts.append(self._next_payload(total, total, NEXT_DONE_TEXT, False))
+        self.guide: Tuple[StepPayload, ...] = tuple(guide)
+        self.next: Tuple[StepPayload, ...] = tuple(nexts)
+
+    def guide_step(self, index: int) -> StepPayload:
+        # Índices negativos empiezan por el primer paso; pasado el final, el cierre
+        return self.guide[max(index, 0)] if index < self.total_steps else self.guide[-1]
+
+    def next_step(self, index: int) -> StepPayload:
+        return self.next[index] if 0 <= index < self.total_steps else self.next[-1]
+
+    def _guide_payload(self, index: int, number: int, text: str, has_next: bool) -> StepPayload:
+        common = {
+            "next": has_next,
+            "protocol_id": self.protocol_id,
+            "say": text,
+            "step": number,
+            "title": self.title,
+            "total_steps": self.total_steps,
+        }
+        return StepPayload(index, number, text, has_next, {
+            "guide": _fragment(dict(common, text=text)),
+            "assistant": _fragment(dict(common, step_text=text)),
+        })
+
+    def _next_payload(self, index: int, number: int, text: str, has_next: bool) -> StepPayload:
+        return StepPayload(index, number, text, has_next, {
+            "next_step": _fragment({
+                "done": not has_next,
+                "step_text": text,
+                "title": self.title,
+                "total_steps": self.total_steps,
+            }),
+        })
+
 
 class BotEngine:
-    def __init__(self, protocols_path: str):
+    def __init__(self, protocols_path: str, previous: Optional["BotEngine"] = None):
         with open(protocols_path, "r", encoding="utf-8") as f:
             self.protocols: Dict[str, Dict] = json.load(f)
 
+        # Tabla compilada al cargar: el camino caliente no vuelve a tocar los dicts anidados.
+        # En una recarga, los protocolos que no han cambiado reutilizan el registro anterior.
+        self.records: Dict[str, ProtocolRecord] = {}
+        for protocol_id, raw in self.protocols.items():
+            old = previous.records.get(protocol_id) if previous is not None else None
+            if old is not None and old.json == json.dumps(raw, separators=(",", ":"), sort_keys=True):
+                self.records[protocol_id] = old
+            else:
+                self.records[protocol_id] = ProtocolRecord(protocol_id, raw)
+
         # Mapa de intención → protocolo
         self.intent_protocol_map = {
             "parada_respiratoria": "pa_no_respira_v1",
@@ -15,24 +117,44 @@ class BotEngine:
             "convulsiones": "pa_convulsiones_v1",
             "quemadura": "pa_quemadura_v1"
         }
+        missing = sorted(
+            {pid for pid in self.intent_protocol_map.values() if pid not in self.records}
+            | ({FALLBACK_PROTOCOL} - set(self.records))
+        )
+        if missing:
+            raise ValueError(f"unknown_protocols_in_intent_map: {', '.join(missing)}")
+
+    def validate_intents(self, intents: Iterable[str]) -> None:
+        """Falla al arrancar si el clasificador puede devolver una intención sin protocolo."""
+        unmapped = sorted(set(intents) - set(self.intent_protocol_map))
+        if unmapped:
+            raise ValueError(f"intents_without_protocol: {', '.join(unmapped)}")
 
     def intent_to_protocol(self, intent: str) -> str:
-        return self.intent_protocol_map.get(intent, "pa_inconsciente_v1")
+        return self.intent_protocol_map.get(intent, FALLBACK_PROTOCOL)
 
     def get_protocol(self, protocol_id: str):
         return self.protocols.get(protocol_id)
 
+    def get_record(self, protocol_id: str) -> Optional[ProtocolRecord]:
+        return self.records.get(protocol_id)
+
+    def step_at(self, protocol_id: str, index: int) -> Tuple[Optional[Dict], Optional[str], int]:
+        """(protocolo, texto del paso `index` o None si ya no quedan pasos, total de pasos)."""
+        record = self.records.get(protocol_id)
+        if record is None:
+            return None, None, 0
+        total = record.total_steps
+        return self.protocols[protocol_id], (record.steps[index] if 0 <= index < total else None), total
+
     def next_step(self, protocol_id: str, current_step: int):
-        proto = self.get_protocol(protocol_id)
+        proto, step, total = self.step_at(protocol_id, current_step)
         if not proto:
             return {"done": True, "error": "protocol_not_found"}
 
-        steps: List[str] = proto["steps"]
-        total = len(steps)
-        if current_step >= total:
+        if step is None:
             return {"done": True, "step": "Protocolo finalizado.", "step_index": total, "total_steps": total}
 
-        step = steps[current_step]
         return {
             "done": (current_step + 1) >= total,
             "step": step,
@@ -0,0 +1,160 @@
+"""
+Motor único de guiado: clasificar → protocolo → avanzar paso → actualizar sesión.
+
+/api/guide, /api/assistant, /api/understand y /api/next_step solo dan forma
+a la respuesta a partir de un `Turn`; el avance se resuelve sobre la tabla
+compilada de BotEngine (ProtocolRecord), que ya trae el JSON de cada paso.
+Cada sesión queda fijada a la versión de contenido (ContentStore) con la que
+empezó su protocolo, así que una recarga no le cambia los pasos a mitad. Esa
+versión se guarda solo en la sesión: `Turn.context` (lo que se devuelve al
+cliente) no la lleva y la que mande el cliente en su contexto se ignora.
+El historial de la sesión se modifica en sitio bajo el lock de la sesión en
+lugar de copiarse en cada turno.
+"""
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+from content_store import VERSION_KEY, ContentStore
+from emergency_bot import ProtocolRecord, StepPayload
+from session_store import SessionBackend
+
+Classifier = Callable[[str], Tuple[str, float]]
+StageTimer = Callable[[str], ContextManager[Any]]
+
+
+class Turn:
+    """Resultado de un turno; `payload` es None en /api/understand (no avanza)."""
+
+    __slots__ = ("protocol_id", "context", "intent", "confidence", "record", "payload")
+
+    def __init__(self, protocol_id: str, context: Dict[str, Any], intent: Optional[str] = None,
+                 confidence: Optional[float] = None, record: Optional[ProtocolRecord] = None,
+                 payload: Optional[StepPayload] = None):
+        self.protocol_id = protocol_id
+        self.context = context
+        self.intent = intent
+        self.confidence = confidence
+        self.record = record
+        self.payload = payload
+
+    @property
+    def step_index(self) -> int:
+        return self.payload.step_index if self.payload is not None else -1
+
+
+_NULL_STAGE = nullcontext()
+
+
+def _public(context: Dict[str, Any]) -> Dict[str, Any]:
+    """El contexto sin la versión fijada, que es interna del servidor."""
+    return {key: value for key, value in context.items() if key != VERSION_KEY}
+
+
+def _no_stage(name: str) -> ContextManager[Any]:
+    return _NULL_STAGE
+
+
+class GuideEngine:
+    def __init__(self, content: ContentStore, sessions: SessionBackend, classify: Classifier,
+                 max_history: int = 20, stage: StageTimer = _no_stage):
+        self.content = content
+        self.sessions = sessions
+        self.classify = classify
+        self.max_history = max_history
+        self.stage = stage
+
+    def guide(self, session_id: str, query: str) -> Optional[Turn]:
+        """Clasifica `query` y avanza un paso (o reinicia si cambia el protocolo). None si no hay protocolo."""
+        with self.stage("classify"):
+            intent, conf = self.classify(query)
+        with self.stage("protocol_lookup"):
+            version = self.content.current
+            protocol_id = version.bot.intent_to_protocol(intent)
+            record = version.bot.get_record(protocol_id)
+        if record is None:
+            return None
+
+        with self.stage("session_update"), self.sessions.lock(session_id):
+            context = self._context(session_id)
+            self._remember(context, query, intent)
+            if context.get("protocol_id") != protocol_id:
+                payload = record.guide_step(0)
+            else:
+                # Mismo protocolo: seguir con la versión con la que empezó la sesión
+                pinned = self.content.get(context.get(VERSION_KEY))
+                pinned_record = pinned.bot.get_record(protocol_id)
+                if pinned_record is not None:
+                    version, record = pinned, pinned_record
+                payload = record.guide_step(int(context.get("step_index", -1)) + 1)
+            context["protocol_id"] = protocol_id
+            context["step_index"] = payload.step_index
+            context[VERSION_KEY] = version.digest
+            context["total_steps"] = record.total_steps
+            self.sessions[session_id] = context
+
+        return Turn(protocol_id, _public(context), intent, conf, record, payload)
+
+    def understand(self, session_id: str, text: str) -> Turn:
+        """Clasifica sin avanzar: deja la sesión apuntando al protocolo, antes del primer paso."""
+        with self.stage("classify"):
+            intent, conf = self.classify(text)
+        with self.stage("protocol_lookup"):
+            version = self.content.current
+            protocol_id = version.bot.intent_to_protocol(intent)
+
+        with self.stage("session_update"), self.sessions.lock(session_id):
+            context = self._context(session_id)
+            if text:
+                self._remember(context, text, intent)
+            elif not isinstance(context.get("history"), list):
+                context["history"] = []
+            context["protocol_id"] = protocol_id
+            context["step_index"] = -1
+            context[VERSION_KEY] = version.digest
+            context.pop("total_steps", None)
+            self.sessions[session_id] = context
+
+        return Turn(protocol_id, _public(context), intent, conf)
+
+    def next_step(self, session_id: str, context: Optional[Dict[str, Any]] = None,
+                  intent: Optional[str] = None) -> Optional[Turn]:
+        """
+        Avanza un paso sobre `context` (el que manda el cliente) o el de la
+        sesión. Al terminar, step_index queda en total_steps.
+        """
+        with self.sessions.lock(session_id):
+            stored = self._context(session_id)
+            # La versión fijada sale siempre de la sesión, nunca del contexto del cliente
+            pinned = stored.get(VERSION_KEY)
+            context = _public(context) if isinstance(context, dict) and context else stored
+            with self.stage("protocol_lookup"):
+                version = self.content.get(pinned)
+                protocol_id = context.get("protocol_id") or version.bot.intent_to_protocol(intent)
+                record = version.bot.get_record(protocol_id)
+                if record is None and version is not self.content.current:
+                    version = self.content.current
+                    record = version.bot.get_record(protocol_id)
+            if record is None:
+                return None
+
+            payload = record.next_step(int(context.get("step_index", -1)) + 1)
+            with self.stage("session_update"):
+                context["protocol_id"] = protocol_id
+                context["step_index"] = payload.step_index
+                context[VERSION_KEY] = version.digest
+                self.sessions[session_id] = context
+
+        return Turn(protocol_id, _public(context), intent, None, record, payload)
+
+    def _context(self, session_id: str) -> Dict[str, Any]:
+        context = self.sessions.get(session_id)
+        return context if isinstance(context, dict) else {}
+
+    def _remember(self, context: Dict[str, Any], text: str, intent: str) -> None:
+        history: List[Dict[str, str]] = context.get("history")
+        if not isinstance(history, list):
+            history = context["history"] = []
+        history.append({"user_text": text, "intent": intent})
+        overflow = len(history) - self.max_history
+        if overflow > 0:
+            del history[:overflow]
@@ -0,0 +1,39 @@
+"""
+Configuración de gunicorn con la app precargada en el máster.
+
+    gunicorn -c backend/gunicorn.conf.py app:app
+    CONRUMBO_ROLE=text  gunicorn -c backend/gunicorn.conf.py app:app   # solo guía de texto
+    CONRUMBO_ROLE=audio gunicorn -c backend/gunicorn.conf.py -b 0.0.0.0:8001 app:app
+
+Con preload_app el máster importa app.py una vez: protocolos compilados
+(ContentStore/BotEngine), el índice del clasificador y el frontend
+precomprimido quedan en páginas compartidas copy-on-write por todos los
+workers, y un worker nuevo arranca en lo que tarda un fork. gc.freeze()
+saca esos objetos del recolector para que sus pasadas no toquen (y copien)
+las páginas compartidas. Los hilos de fondo se arrancan en cada worker en
+post_fork (app.start_worker_threads).
+"""
+import gc
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# app.py no arranca hilos al importarse en el máster: los arranca post_fork
+os.environ["CONRUMBO_PRELOAD"] = "1"
+
+bind = f"{os.getenv('CONRUMBO_HOST', '0.0.0.0')}:{os.getenv('CONRUMBO_PORT', '8000')}"
+workers = int(os.getenv("CONRUMBO_WORKERS", "2"))
+threads = int(os.getenv("CONRUMBO_THREADS", "8"))
+worker_class = "gthread"
+preload_app = True
+
+
+def when_ready(server):
+    # App ya importada en el máster, antes del primer fork
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import app
+
+    app.start_worker_threads()
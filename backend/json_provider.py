@@ -0,0 +1,74 @@
+"""
+Proveedor JSON de Flask con codificador rápido opcional.
+
+Usa orjson o msgspec si están instalados (CONRUMBO_JSON=auto|orjson|msgspec|stdlib)
+y si no, el `json` de la stdlib como hasta ahora. Las respuestas salen en
+UTF-8 compacto directamente como bytes, sin pasar por str.
+"""
+import os
+from typing import Any, Callable, Optional, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+try:
+    import msgspec  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    msgspec = None  # type: ignore
+
+Encoder = Callable[[Any], bytes]
+
+# Lo que el codificador rápido no sabe representar (p. ej. enteros enormes) pasa a la stdlib
+_ENCODE_ERRORS = (TypeError, ValueError, OverflowError)
+
+
+def select_encoder(name: str, default: Callable[[Any], Any]) -> Tuple[str, Optional[Encoder]]:
+    """(backend elegido, codificador); el codificador es None para la stdlib."""
+    if name in ("auto", "orjson") and orjson is not None:
+        def encode(obj: Any) -> bytes:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+        return "orjson", encode
+    if name in ("auto", "msgspec") and msgspec is not None:
+        return "msgspec", msgspec.json.Encoder(enc_hook=default).encode
+    return "stdlib", None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        self.backend, self._encode = select_encoder(os.getenv("CONRUMBO_JSON", "auto"), self.default)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # Con opciones de formato (indent, separators...) se respeta la stdlib
+        if self._encode is not None and not kwargs:
+            try:
+                return self._encode(obj).decode("utf-8")
+            except _ENCODE_ERRORS:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def dumpb(self, obj: Any) -> bytes:
+        """Como dumps() pero en bytes UTF-8 compactos, sin la conversión intermedia a str."""
+        if self._encode is not None:
+            try:
+                return self._encode(obj)
+            except _ENCODE_ERRORS:
+                pass
+        return super().dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if self.backend == "orjson" and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # En debug (salida indentada) se deja la respuesta de Flask tal cual
+        if self._encode is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,140 @@
+"""
+Histogramas de latencia en memoria con buckets logarítmicos fijos.
+
+Cada hilo acumula en su propio shard (sin locks en el camino caliente); el
+lock solo se toma al registrar un hilo nuevo y al exportar. Los shards de
+hilos ya terminados (el servidor de desarrollo usa un hilo por petición) se
+suman a un total retirado y se descartan, así que su número no crece sin
+límite.
+"""
+import threading
+import weakref
+from bisect import bisect_left
+from time import perf_counter_ns
+from typing import Dict, List, Tuple
+
+# Con tantos shards registrados se buscan los de hilos terminados (y luego el doble de los que queden)
+REAP_MIN_SHARDS = 64
+
+# Límites superiores en ns: 10 µs · 2^k hasta ~10 s
+BUCKET_BOUNDS_NS: Tuple[int, ...] = tuple(10_000 * 2 ** k for k in range(21))
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class LatencyRegistry:
+    def __init__(self, bounds_ns: Tuple[int, ...] = BUCKET_BOUNDS_NS):
+        self.bounds_ns = bounds_ns
+        self._local = threading.local()
+        self._shards: List[Tuple["weakref.ref[threading.Thread]", Dict[SeriesKey, List[int]]]] = []
+        # Cuentas de los hilos que ya terminaron
+        self._retired: Dict[SeriesKey, List[int]] = {}
+        self._reap_at = REAP_MIN_SHARDS
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def observe(self, name: str, elapsed_ns: int, **labels: str) -> None:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+                if len(self._shards) >= self._reap_at:
+                    self._reap()
+        key = (name, tuple(sorted(labels.items())))
+        series = shard.get(key)
+        if series is None:
+            # [cuenta por bucket..., +Inf, suma_ns]
+            series = shard[key] = [0] * (len(self.bounds_ns) + 2)
+        series[bisect_left(self.bounds_ns, elapsed_ns)] += 1
+        series[-1] += elapsed_ns
+
+    def timer(self, name: str, **labels: str) -> "_Timer":
+        return _Timer(self, name, labels)
+
+    def snapshot(self) -> Dict[SeriesKey, List[int]]:
+        with self._lock:
+            self._reap()
+            shards = [shard for _, shard in self._shards]
+            merged = {key: list(series) for key, series in self._retired.items()}
+        for shard in shards:
+            _merge_into(merged, shard)
+        return merged
+
+    def _reap(self) -> None:
+        """Pasa a `_retired` los shards de hilos terminados (con el lock tomado)."""
+        alive = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                alive.append((ref, shard))
+            else:
+                # El hilo ya no puede escribir en su shard
+                _merge_into(self._retired, shard)
+        self._shards = alive
+        self._reap_at = max(REAP_MIN_SHARDS, 2 * len(alive))
+
+    def render_prometheus(self) -> str:
+        """Exporta los histogramas en formato de texto de Prometheus (segundos)."""
+        lines: List[str] = []
+        by_name: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], List[int]]]] = {}
+        for (name, labels), series in sorted(self.snapshot().items()):
+            by_name.setdefault(name, []).append((labels, series))
+
+        for name, entries in by_name.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, series in entries:
+                base = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                prefix = base + "," if base else ""
+                cumulative = 0
+                for bound, count in zip(self.bounds_ns, series):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound / 1e9:g}"}} {cumulative}')
+                cumulative += series[len(self.bounds_ns)]
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+                suffix = "{" + base + "}" if base else ""
+                lines.append(f"{name}_sum{suffix} {series[-1] / 1e9:.9f}")
+                lines.append(f"{name}_count{suffix} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge_into(total: Dict[SeriesKey, List[int]], shard: Dict[SeriesKey, List[int]]) -> None:
+    for key, series in list(shard.items()):
+        current = total.get(key)
+        if current is None:
+            total[key] = list(series)
+        else:
+            for i, value in enumerate(series):
+                current[i] += value
+
+
+class _Timer:
+    __slots__ = ("_registry", "_name", "_labels", "_t0")
+
+    def __init__(self, registry: LatencyRegistry, name: str, labels: Dict[str, str]):
+        self._registry, self._name, self._labels = registry, name, labels
+
+    def __enter__(self) -> "_Timer":
+        self._t0 = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._registry.observe(self._name, perf_counter_ns() - self._t0, **self._labels)
+
+
+def render_counters(name: str, help_text: str, values: Dict[str, float], kind: str = "counter",
+                    label: str = "kind") -> str:
+    """Serie simple (counter/gauge) con una etiqueta por clave de `values`."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for key, value in values.items():
+        lines.append(f'{name}{{{label}="{_escape(str(key))}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,93 @@
+"""
+Dependencias pesadas que se importan en el primer uso.
+
+speech_recognition (que arrastra requests y certifi), gTTS y numpy suman
+unos 200 ms de arranque y varios MB de RSS en cada worker, aunque ese
+worker solo sirva guía de texto. Cada módulo las declara con
+
+    sr = lazy_module("speech_recognition")
+
+y las usa como el módulo real: la importación ocurre en el primer acceso a
+un atributo. Los atributos ya resueltos se guardan en el propio objeto, así
+que después no hay coste extra en caliente. `load_all()` lo importa todo de
+golpe (CONRUMBO_LAZY_IMPORTS=0 o el rol audio).
+"""
+import importlib
+import logging
+import threading
+from time import perf_counter_ns
+from types import ModuleType
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_registry: Dict[str, "LazyModule"] = {}
+_registry_lock = threading.Lock()
+
+
+class LazyModule:
+    def __init__(self, name: str, optional: bool = False):
+        self._name = name
+        self._optional = optional
+        self._module: Optional[ModuleType] = None
+        self._error: Optional[BaseException] = None
+        self._load_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Optional[ModuleType]:
+        if self._module is not None or self._error is not None:
+            return self._module
+        with self._lock:
+            if self._module is None and self._error is None:
+                t0 = perf_counter_ns()
+                try:
+                    self._module = importlib.import_module(self._name)
+                except Exception as exc:
+                    if not self._optional:
+                        raise
+                    self._error = exc
+                self._load_ms = (perf_counter_ns() - t0) / 1e6
+                logger.info("Importado %s en %.1f ms", self._name, self._load_ms)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        # Solo llega aquí lo que aún no está en el objeto
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        module = self._load()
+        if module is None:
+            raise AttributeError(f"{self._name}_not_available")
+        value = getattr(module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "missing" if self._error else "pending"
+        return f"<lazy module {self._name} ({state})>"
+
+
+def lazy_module(name: str, optional: bool = False) -> LazyModule:
+    """El mismo objeto para todos los que piden `name`: se importa una sola vez por proceso."""
+    with _registry_lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name, optional=optional)
+        return module
+
+
+def is_available(module: LazyModule) -> bool:
+    """Importa (si hace falta) una dependencia opcional y dice si está instalada."""
+    return module._load() is not None
+
+
+def load_all() -> None:
+    """Importa ya todas las dependencias declaradas (arranque ansioso / antes del fork)."""
+    for module in list(_registry.values()):
+        module._load()
+
+
+def stats() -> Dict[str, float]:
+    """Milisegundos que costó importar cada dependencia; -1 si aún no se ha usado."""
+    with _registry_lock:
+        modules = list(_registry.values())
+    return {module._name: -1 if module._load_ms is None else round(module._load_ms, 1) for module in modules}
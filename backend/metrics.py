@@ -1,24 +1,477 @@
+import atexit
 import csv
-from datetime import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import shutil
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: sin cerrojo entre procesos
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+HEADER = ["ts_iso","event","session_id","user_text","intent",
+          "confidence","protocol_id","step_index","latency_ms"]
+
+# Centinelas para la cola del escritor
+_FLUSH = object()
+_STOP = object()
+
 
 class Metrics:
-    def __init__(self, csv_path="metrics_log.csv"):
+    """
+    Registro de eventos en CSV. `log()` solo encola la fila; un hilo escritor
+    mantiene el fichero abierto y escribe por lotes (por tamaño o por tiempo).
+
+    on_full: "drop" descarta la fila (y la cuenta en `dropped`) si la cola está
+    llena; "block" espera a que haya hueco.
+
+    Rotación: con `rotate_bytes` y/o `rotate_daily` el fichero activo se cierra
+    al superar el tamaño o al cambiar el día UTC, se renombra a un segmento
+    `<nombre>.<inicio>.csv` (comprimido con gzip en segundo plano si `compress`)
+    y se registra en `<nombre>.manifest.json` con su rango de tiempo.
+
+    Varios procesos (workers de gunicorn) pueden escribir el mismo CSV: cada
+    lote se añade de una sola escritura bajo un flock compartido de
+    `<nombre>.lock`, tras comprobar que el fichero abierto sigue siendo el
+    activo; la rotación y el manifiesto (releído antes de modificarlo) van
+    bajo el flock exclusivo, así que solo un proceso renombra cada segmento.
+
+    sink: destino alternativo al CSV con `write_rows(rows)`, `flush()` y
+    `close()` (p. ej. `metrics_columnar.ColumnarSink`).
+    """
+
+    def __init__(self, csv_path="metrics_log.csv", batch_size=256, flush_interval=1.0,
+                 max_queue=10000, on_full="drop", rotate_bytes=None, rotate_daily=False,
+                 compress=True, sink=None):
+        if on_full not in ("drop", "block"):
+            raise ValueError(f"unknown_on_full_policy: {on_full}")
         self.csv_path = csv_path
-        # Header si no existe
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_full = on_full
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.compress = compress
+        self.sink = sink
+        self.dropped = 0
+        self.write_errors = 0
+        self.written = 0
+        self.rotations = 0
+        if sink is None:
+            self._write_header(self.csv_path)
+
+        path = Path(self.csv_path)
+        self._manifest_path = path.with_name(path.stem + ".manifest.json")
+        self._lock_path = path.with_name(path.stem + ".lock")
+        self._lock_file = None
+        self._lock_file_pid: Optional[int] = None
+        # Serializa dentro del proceso: dos hilos con el mismo descriptor no se excluyen con flock
+        self._file_mutex = threading.Lock()
+        self._compressors: List[threading.Thread] = []
+        # Rango de tiempo del segmento activo
+        self._active_start, self._active_end = self._scan_active_range()
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        _install_signal_flush()
+
+    def log(self, event, session_id="anon", user_text=None, intent=None,
+            confidence=None, protocol_id=None, step_index=None, latency_ms=None):
+        row = [
+            datetime.utcnow().isoformat(timespec="seconds")+"Z",
+            event, session_id, user_text, intent,
+            confidence, protocol_id, step_index, latency_ms
+        ]
+        if self._closed:
+            self._count_drop()
+            return
+        if self.on_full == "block":
+            self._queue.put(row)
+            return
         try:
-            with open(self.csv_path, "x", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["ts_iso","event","session_id","user_text","intent",
-                                 "confidence","protocol_id","step_index","latency_ms"])
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._count_drop()
+
+    def flush(self, timeout=5.0) -> bool:
+        """Bloquea hasta que todo lo encolado antes de la llamada esté en disco."""
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        for worker in list(self._compressors):
+            worker.join(timeout)
+
+    def ensure_writer(self) -> None:
+        """Rearranca el escritor si no está vivo (p. ej. en un worker tras el fork del proceso que lo creó).
+
+        La cola y los cerrojos son nuevos: las filas que quedaran encoladas en
+        el padre las escribe el padre, y un cerrojo copiado a mitad de uso no
+        debe bloquear al hijo.
+        """
+        if self._closed or self._thread.is_alive():
+            return
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._file_mutex = threading.Lock()
+        self._compressors = []
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "rotations": self.rotations,
+        }
+
+    def segments(self) -> List[Dict]:
+        """Segmentos cerrados del manifiesto (path, start, end, rows, compressed), de todos los procesos."""
+        return self._load_manifest()
+
+    def read_rows(self, start: Union[str, datetime, None] = None,
+                  end: Union[str, datetime, None] = None) -> Iterator[Dict[str, str]]:
+        """
+        Itera las filas con ts_iso en [start, end], abriendo solo los segmentos
+        cuyo rango se solapa con la ventana (más el fichero activo).
+        """
+        lo, hi = _as_iso(start), _as_iso(end)
+        base = Path(self.csv_path).parent
+        paths = [
+            base / seg["path"]
+            for seg in self.segments()
+            if _overlaps(seg.get("start"), seg.get("end"), lo, hi)
+        ]
+        if self._active_start is None or _overlaps(self._active_start, self._active_end, lo, hi):
+            paths.append(Path(self.csv_path))
+
+        for path in paths:
+            for row in _iter_csv(path):
+                ts = row.get("ts_iso") or ""
+                if (lo is None or ts >= lo) and (hi is None or ts <= hi):
+                    yield row
+
+    @staticmethod
+    def _write_header(csv_path) -> None:
+        # Header si no existe; con link() el fichero aparece ya con la cabecera (otro proceso no puede colarse antes)
+        if os.path.exists(csv_path):
+            return
+        tmp = f"{csv_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(HEADER)
+        try:
+            os.link(tmp, csv_path)
         except FileExistsError:
             pass
+        except OSError:  # pragma: no cover - sistemas de ficheros sin hard links
+            if not os.path.exists(csv_path):
+                os.replace(tmp, csv_path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
 
-    def log(self, event, session_id="anon", user_text=None, intent=None,
-            confidence=None, protocol_id=None, step_index=None, latency_ms=None):
-        with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                datetime.utcnow().isoformat(timespec="seconds")+"Z",
-                event, session_id, user_text, intent,
-                confidence, protocol_id, step_index, latency_ms
-            ])
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Cerrojo entre hilos y procesos sobre `<nombre>.lock` (compartido para añadir, exclusivo para rotar)."""
+        with self._file_mutex:
+            if fcntl is None:
+                yield
+                return
+            if self._lock_file is None or self._lock_file_pid != os.getpid():
+                # Tras un fork el descriptor heredado comparte el cerrojo con el padre: uno propio
+                self._lock_file = open(self._lock_path, "a+b")
+                self._lock_file_pid = os.getpid()
+            fd = self._lock_file.fileno()
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _is_active(self, f) -> bool:
+        """¿Sigue siendo `f` el fichero activo o ya lo ha rotado otro proceso?"""
+        try:
+            return os.path.samestat(os.stat(self.csv_path), os.fstat(f.fileno()))
+        except OSError:
+            return False
+
+    def _load_manifest(self) -> List[Dict]:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return list(json.load(f).get("segments", []))
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def _save_manifest(self, segments: List[Dict]) -> None:
+        tmp = self._manifest_path.with_name(f"{self._manifest_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": segments}, f, indent=1)
+        os.replace(tmp, self._manifest_path)
+
+    def _scan_active_range(self):
+        """Primer y último ts_iso del fichero activo sin leerlo entero."""
+        try:
+            with open(self.csv_path, "rb") as f:
+                f.readline()
+                first = f.readline()
+                f.seek(max(0, os.fstat(f.fileno()).st_size - 4096))
+                tail = f.read().splitlines()
+        except FileNotFoundError:
+            return None, None
+        if not first.strip():
+            return None, None
+        last = next((line for line in reversed(tail) if line.strip()), first)
+        start = first.decode("utf-8", "replace").split(",", 1)[0]
+        end = last.decode("utf-8", "replace").split(",", 1)[0]
+        return start, max(start, end)
+
+    def _open_active(self):
+        self._write_header(self.csv_path)
+        return open(self.csv_path, "a", newline="", encoding="utf-8")
+
+    def _write_rows(self, f, rows):
+        """Escribe un lote rotando por día UTC antes de cada fila y por tamaño tras el lote."""
+        chunk = []
+        for row in rows:
+            ts = row[0]
+            if (self.rotate_daily and self._active_start is not None
+                    and ts[:10] != self._active_start[:10]):
+                f = self._append(f, chunk)
+                chunk = []
+                f = self._rotate(f)
+            if self._active_start is None:
+                self._active_start = ts
+            chunk.append(row)
+        f = self._append(f, chunk)
+        if self.rotate_bytes and f.tell() >= self.rotate_bytes:
+            f = self._rotate(f)
+        return f
+
+    def _append(self, f, chunk):
+        """Añade `chunk` al fichero activo con una sola escritura (sin filas cortadas entre procesos)."""
+        if not chunk:
+            return f
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        with self._file_lock(exclusive=False):
+            if not self._is_active(f):
+                # Otro proceso lo ha rotado: se sigue en el fichero activo nuevo
+                f.close()
+                f = self._open_active()
+                self._active_start, self._active_end = self._scan_active_range()
+            f.write(buffer.getvalue())
+            f.flush()
+        if self._active_start is None:
+            self._active_start = chunk[0][0]
+        self._active_end = chunk[-1][0]
+        return f
+
+    def _rotate(self, f):
+        target = None
+        with self._file_lock(exclusive=True):
+            # Si otro proceso ya lo rotó, no hay nada que renombrar: solo reabrir
+            if self._is_active(f) and self._active_start is not None:
+                path = Path(self.csv_path)
+                stamp = self._active_start.replace("-", "").replace(":", "")
+                target = path.with_name(f"{path.stem}.{stamp}{path.suffix}")
+                counter = 1
+                while target.exists() or target.with_name(target.name + ".gz").exists():
+                    target = path.with_name(f"{path.stem}.{stamp}-{counter}{path.suffix}")
+                    counter += 1
+                f.close()
+                os.replace(path, target)
+                segments = self._load_manifest()
+                segments.append({
+                    "path": target.name,
+                    "start": self._active_start,
+                    "end": self._active_end,
+                    "rows": None,
+                    "compressed": False,
+                })
+                self._save_manifest(segments)
+                # El activo nuevo existe con cabecera antes de soltar el cerrojo
+                self._write_header(self.csv_path)
+            else:
+                f.close()
+        if target is not None:
+            self.rotations += 1
+            worker = threading.Thread(
+                target=self._finalize_segment, args=(target,), name="metrics-segment", daemon=True
+            )
+            self._compressors = [t for t in self._compressors if t.is_alive()] + [worker]
+            worker.start()
+        self._active_start = self._active_end = None
+        f = self._open_active()
+        self._active_start, self._active_end = self._scan_active_range()
+        return f
+
+    def _finalize_segment(self, path: Path) -> None:
+        """Cuenta las filas del segmento cerrado y, si procede, lo comprime con gzip."""
+        rows = sum(1 for _ in _iter_csv(path))
+        target = path
+        if self.compress:
+            target = path.with_name(path.name + ".gz")
+            with open(path, "rb") as src, gzip.open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        with self._file_lock(exclusive=True):
+            segments = self._load_manifest()
+            for seg in segments:
+                if seg["path"] == path.name:
+                    seg.update(path=target.name, rows=rows, compressed=self.compress)
+            self._save_manifest(segments)
+            if target != path:
+                os.unlink(path)
+
+    def _count_drop(self, rows: int = 1) -> None:
+        with self._lock:
+            self.dropped += rows
+
+    def _run(self) -> None:
+        f = None
+        pending = []
+        last_flush = time.monotonic()
+        try:
+            while True:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    item = self._queue.get(timeout=timeout if pending else None)
+                except queue.Empty:
+                    item = None
+
+                stop, waiters = False, []
+                while item is not None:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, tuple) and item[0] is _FLUSH:
+                        waiters.append(item[1])
+                    else:
+                        pending.append(item)
+                    if len(pending) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+
+                due = time.monotonic() - last_flush >= self.flush_interval
+                if pending and (stop or waiters or due or len(pending) >= self.batch_size):
+                    try:
+                        if self.sink is not None:
+                            self.sink.write_rows(pending)
+                        else:
+                            if f is None:
+                                f = self._open_active()
+                            f = self._write_rows(f, pending)
+                        self.written += len(pending)
+                    except Exception:
+                        # Disco lleno, permisos, fichero movido...: se pierde el lote, no el escritor
+                        logger.exception("No se pudieron escribir %s filas de métricas", len(pending))
+                        self.write_errors += 1
+                        self._count_drop(len(pending))
+                        if f is not None:
+                            try:
+                                f.close()
+                            except OSError:
+                                pass
+                        # Se reabre el fichero activo en el siguiente lote
+                        f = None
+                    pending = []
+                    last_flush = time.monotonic()
+                if waiters and self.sink is not None:
+                    try:
+                        self.sink.flush()
+                    except Exception:
+                        logger.exception("No se pudo volcar el sink de métricas")
+                        self.write_errors += 1
+                for waiter in waiters:
+                    waiter.set()
+                if stop:
+                    return
+        finally:
+            if self.sink is not None:
+                self.sink.close()
+            elif f is not None:
+                f.close()
+
+
+def _as_iso(value: Union[str, datetime, None]) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="seconds") + "Z"
+
+
+def _overlaps(start: Optional[str], end: Optional[str], lo: Optional[str], hi: Optional[str]) -> bool:
+    if start is None or end is None:
+        return True
+    return (hi is None or start <= hi) and (lo is None or end >= lo)
+
+
+def _iter_csv(path: Path) -> Iterator[Dict[str, str]]:
+    """Lee un segmento (plano o .gz); si el compresor acaba de moverlo, usa el .gz."""
+    candidates = [path] if path.suffix == ".gz" else [path, path.with_name(path.name + ".gz")]
+    for candidate in candidates:
+        opener = gzip.open if candidate.suffix == ".gz" else open
+        try:
+            f = opener(candidate, "rt", newline="", encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        with f:
+            yield from csv.DictReader(f)
+        return
+
+
+_signal_installed = False
+
+
+def _install_signal_flush() -> None:
+    """En SIGTERM sale por SystemExit para que atexit vacíe las colas pendientes."""
+    global _signal_installed
+    if _signal_installed or threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    if previous is signal.SIG_IGN:
+        return
+
+    def _handler(signum, frame):
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            raise SystemExit(128 + signum)
+
+    try:
+        signal.signal(signal.SIGTERM, _handler)
+    except ValueError:  # pragma: no cover - no estamos en el hilo principal
+        return
+    _signal_installed = True
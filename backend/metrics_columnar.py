@@ -0,0 +1,216 @@
+"""
+Sink columnar para Metrics y lectura de sus row groups.
+
+Cada row group es un `.npz` con columnas tipadas:
+  ts (int64, epoch s), confidence (float32, NaN = vacío),
+  step_index / latency_ms (int32, -1 = vacío) y las columnas de texto
+  codificadas por diccionario (`<col>` int32 + `<col>__dict`).
+El nombre `rg-<ts_min>-<ts_max>-<writer>-<seq>.npz` permite descartar
+grupos por rango de tiempo sin abrirlos; `<writer>` es un token aleatorio
+de cada proceso escritor, así que varios workers de gunicorn pueden
+escribir en el mismo directorio sin pisarse.
+"""
+import csv
+import gzip
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from metrics import HEADER
+
+STRING_COLUMNS = ("event", "session_id", "user_text", "intent", "protocol_id")
+NULL_INT = -1
+
+
+class ColumnTable:
+    """Columnas de un conjunto de row groups con diccionarios ya unificados."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __len__(self) -> int:
+        return len(self.columns["ts"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def decode(self, name: str) -> np.ndarray:
+        return self.dictionaries[name][self.columns[name]]
+
+    def filter(self, mask: np.ndarray) -> "ColumnTable":
+        return ColumnTable({k: v[mask] for k, v in self.columns.items()}, self.dictionaries)
+
+
+class ColumnarSink:
+    """
+    Acumula filas de Metrics y las escribe como row groups cuando llegan a
+    `row_group_size` filas o pasan `max_group_age` segundos.
+    """
+
+    def __init__(self, directory, row_group_size: int = 65536, max_group_age: float = 60.0,
+                 compress: bool = False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.row_group_size = row_group_size
+        self.max_group_age = max_group_age
+        self.compress = compress
+        self._rows: List[Sequence] = []
+        self._first_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._writer_pid: Optional[int] = None
+        self._writer = ""
+
+    def write_rows(self, rows: Iterable[Sequence]) -> None:
+        with self._lock:
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._rows.extend(rows)
+            if (len(self._rows) >= self.row_group_size
+                    or time.monotonic() - self._first_at >= self.max_group_age):
+                self._write_group()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write_group()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _write_group(self) -> None:
+        if not self._rows:
+            return
+        rows, self._rows, self._first_at = self._rows, [], None
+        if self._writer_pid != os.getpid():
+            # Nuevo token tras un fork: el sink puede haberse creado en el máster precargado
+            self._writer_pid, self._writer, self._seq = os.getpid(), uuid.uuid4().hex[:12], 0
+        write_row_group(self.directory, encode_rows(rows), self._writer, self._seq, self.compress)
+        self._seq += 1
+
+
+def encode_rows(rows: Sequence[Sequence]) -> Dict[str, np.ndarray]:
+    """Filas en el orden de HEADER (valores Python o texto del CSV) → columnas tipadas."""
+    cols = dict(zip(HEADER, zip(*rows))) if rows else {name: () for name in HEADER}
+    ts = np.array([str(t).rstrip("Z") for t in cols["ts_iso"]], dtype="datetime64[s]")
+    out = {
+        "ts": ts.astype(np.int64),
+        "confidence": _numeric(cols["confidence"], np.float32, np.nan),
+        "step_index": _numeric(cols["step_index"], np.int32, NULL_INT),
+        "latency_ms": _numeric(cols["latency_ms"], np.int32, NULL_INT),
+    }
+    for name in STRING_COLUMNS:
+        values = np.array(["" if v is None else str(v) for v in cols[name]], dtype=str)
+        dictionary, codes = np.unique(values, return_inverse=True)
+        out[name] = codes.astype(np.int32).reshape(-1)
+        out[name + "__dict"] = dictionary
+    return out
+
+
+def write_row_group(directory: Path, group: Dict[str, np.ndarray], writer: str, seq: int,
+                    compress: bool = False) -> Path:
+    ts = group["ts"]
+    lo, hi = (int(ts.min()), int(ts.max())) if len(ts) else (0, 0)
+    target = Path(directory) / f"rg-{lo}-{hi}-{writer}-{seq:06d}.npz"
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as f:
+        (np.savez_compressed if compress else np.savez)(f, **group)
+    os.replace(tmp, target)
+    return target
+
+
+def read_table(directory, columns: Optional[Sequence[str]] = None,
+               start: Optional[int] = None, end: Optional[int] = None) -> ColumnTable:
+    """
+    Carga los row groups cuyo rango [ts_min, ts_max] solapa con [start, end]
+    (epoch s) y unifica los diccionarios de las columnas de texto.
+    """
+    wanted = list(columns) if columns else ["ts", "confidence", "step_index", "latency_ms", *STRING_COLUMNS]
+    if "ts" not in wanted:
+        wanted.append("ts")
+    parts: Dict[str, List[np.ndarray]] = {name: [] for name in wanted}
+    dicts: Dict[str, List[np.ndarray]] = {name: [] for name in wanted if name in STRING_COLUMNS}
+
+    for path in sorted(Path(directory).glob("rg-*.npz")):
+        # rg-<lo>-<hi>-<writer>-<seq> (o rg-<lo>-<hi>-<seq> en directorios antiguos)
+        lo, hi = path.stem.split("-")[1:3]
+        if (start is not None and int(hi) < start) or (end is not None and int(lo) > end):
+            continue
+        with np.load(path, allow_pickle=False) as group:
+            for name in wanted:
+                parts[name].append(group[name])
+                if name in dicts:
+                    dicts[name].append(group[name + "__dict"])
+
+    columns_out: Dict[str, np.ndarray] = {}
+    dictionaries: Dict[str, np.ndarray] = {}
+    for name in wanted:
+        if name in dicts:
+            merged = np.unique(np.concatenate(dicts[name])) if dicts[name] else np.array([], dtype=str)
+            remapped = [np.searchsorted(merged, d)[codes] for d, codes in zip(dicts[name], parts[name])]
+            columns_out[name] = np.concatenate(remapped) if remapped else np.array([], dtype=np.int32)
+            dictionaries[name] = merged
+        else:
+            columns_out[name] = np.concatenate(parts[name]) if parts[name] else np.array([])
+
+    table = ColumnTable(columns_out, dictionaries)
+    if start is not None or end is not None:
+        ts = table["ts"]
+        mask = np.ones(len(ts), dtype=bool)
+        if start is not None:
+            mask &= ts >= start
+        if end is not None:
+            mask &= ts <= end
+        table = table.filter(mask)
+    return table
+
+
+def convert_csv(csv_paths: Iterable, directory, row_group_size: int = 65536,
+                compress: bool = False) -> int:
+    """Convierte metrics_log.csv (o segmentos .csv.gz) en row groups. Devuelve las filas escritas."""
+    sink = ColumnarSink(directory, row_group_size=row_group_size,
+                        max_group_age=float("inf"), compress=compress)
+    total = 0
+    for csv_path in csv_paths:
+        path = Path(csv_path)
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            batch = []
+            for row in reader:
+                if len(row) != len(HEADER):
+                    continue
+                batch.append(row)
+                if len(batch) >= row_group_size:
+                    sink.write_rows(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                sink.write_rows(batch)
+                total += len(batch)
+    sink.close()
+    return total
+
+
+def _numeric(values: Sequence, dtype, null) -> np.ndarray:
+    cleaned = ["nan" if v is None or v == "" else v for v in values]
+    try:
+        parsed = np.array(cleaned, dtype=np.float64)
+    except ValueError:
+        parsed = np.array([_safe_float(v) for v in cleaned], dtype=np.float64)
+    if np.issubdtype(dtype, np.integer):
+        return np.where(np.isnan(parsed), null, parsed).astype(dtype)
+    return parsed.astype(dtype)
+
+
+def _safe_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
@@ -0,0 +1,114 @@
+"""
+Consultas agregadas sobre las métricas columnares (ver metrics_columnar).
+
+Uso:
+    python metrics_query.py convert metrics_log.csv [más.csv.gz ...] --out metrics_columnar
+    python metrics_query.py summary metrics_columnar [--by intent|event] [--start ISO] [--end ISO]
+"""
+import argparse
+import json
+from typing import Dict, Sequence
+
+import numpy as np
+
+from metrics_columnar import ColumnTable, convert_csv, read_table
+
+
+def counts(table: ColumnTable, by: str = "intent") -> Dict[str, int]:
+    totals = np.bincount(table[by], minlength=len(table.dictionaries[by]))
+    return {str(key): int(n) for key, n in zip(table.dictionaries[by], totals) if n}
+
+
+def latency_percentiles(table: ColumnTable, by: str = "intent",
+                        q: Sequence[float] = (50, 95, 99)) -> Dict[str, Dict[str, float]]:
+    """Percentiles de latency_ms por grupo (interpolación lineal, como np.percentile)."""
+    latency = table["latency_ms"]
+    valid = latency >= 0
+    keys, values = table[by][valid], latency[valid].astype(np.float64)
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+
+    sizes = np.bincount(keys, minlength=len(table.dictionaries[by]))
+    present = np.flatnonzero(sizes)
+    starts = np.concatenate(([0], np.cumsum(sizes)))[present]
+    sizes = sizes[present]
+
+    result: Dict[str, Dict[str, float]] = {
+        str(table.dictionaries[by][g]): {"count": int(n)} for g, n in zip(present, sizes)
+    }
+    for pct in q:
+        pos = (sizes - 1) * (pct / 100.0)
+        lower = np.floor(pos).astype(np.int64)
+        upper = np.minimum(lower + 1, sizes - 1)
+        frac = pos - lower
+        vals = values[starts + lower] * (1 - frac) + values[starts + upper] * frac
+        for g, v in zip(present, vals):
+            result[str(table.dictionaries[by][g])][f"p{pct:g}"] = float(v)
+    return result
+
+
+def confidence_histogram(table: ColumnTable, by: str = "intent", bins: int = 10) -> Dict:
+    """Histograma de confidence en [0, 1] por grupo, en una sola pasada con bincount."""
+    conf = table["confidence"]
+    valid = ~np.isnan(conf)
+    keys = table[by][valid]
+    idx = np.clip((conf[valid] * bins).astype(np.int64), 0, bins - 1)
+    groups = len(table.dictionaries[by])
+    grid = np.bincount(keys * bins + idx, minlength=groups * bins).reshape(groups, bins)
+    return {
+        "edges": np.linspace(0.0, 1.0, bins + 1).round(6).tolist(),
+        "counts": {
+            str(table.dictionaries[by][g]): grid[g].tolist()
+            for g in range(groups) if grid[g].any()
+        },
+    }
+
+
+def summary(table: ColumnTable, by: str = "intent") -> Dict:
+    return {
+        "rows": len(table),
+        "counts": counts(table, by),
+        "latency_ms": latency_percentiles(table, by),
+        "confidence": confidence_histogram(table, by),
+    }
+
+
+def _epoch(value):
+    if value is None:
+        return None
+    return int(np.datetime64(value.rstrip("Z"), "s").astype(np.int64))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Métricas columnares de ConRumbo")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    conv = sub.add_parser("convert", help="Convierte CSV de Metrics a row groups")
+    conv.add_argument("csv", nargs="+")
+    conv.add_argument("--out", default="metrics_columnar")
+    conv.add_argument("--row-group-size", type=int, default=65536)
+    conv.add_argument("--compress", action="store_true")
+
+    summ = sub.add_parser("summary", help="Conteos, percentiles de latencia e histograma de confianza")
+    summ.add_argument("directory")
+    summ.add_argument("--by", default="intent", choices=["intent", "event", "protocol_id"])
+    summ.add_argument("--start")
+    summ.add_argument("--end")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        rows = convert_csv(args.csv, args.out, args.row_group_size, args.compress)
+        print(f"{rows} filas → {args.out}")
+        return
+
+    table = read_table(
+        args.directory,
+        columns=["ts", "confidence", "latency_ms", args.by],
+        start=_epoch(args.start),
+        end=_epoch(args.end),
+    )
+    print(json.dumps(summary(table, args.by), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
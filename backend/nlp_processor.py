@@ -1,6 +1,17 @@
+import os
 import re
 import difflib
-from typing import Tuple
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from lazy_deps import is_available, lazy_module
+
+# Solo lo usa el scorer de trigramas: no se importa con el scorer por defecto
+np = lazy_module("numpy", optional=True)
+
+logger = logging.getLogger(__name__)
 
 # Mapa de frases → intención
 INTENT_SYNONYMS = {
@@ -28,34 +39,343 @@ INTENT_SYNONYMS = {
 # Intent por defecto si no hay match claro
 FALLBACK_INTENT = "inconsciente"
 
+# Scorer para el fallback fuzzy: "difflib" (referencia) o "trigram" (NumPy)
+FUZZY_SCORER = os.getenv("CONRUMBO_FUZZY_SCORER", "difflib")
+# Entradas de la caché LRU de clasificaciones (0 la desactiva)
+CLASSIFY_CACHE_SIZE = int(os.getenv("CONRUMBO_CLASSIFY_CACHE_SIZE", "4096"))
+
 def normalize(text: str) -> str:
     t = text.lower().strip()
     t = re.sub(r"[^\wáéíóúüñ\s]", " ", t)
     t = re.sub(r"\s+", " ", t)
     return t
 
+
+class _PhraseAutomaton:
+    """Aho-Corasick sobre las frases: encuentra todas las apariciones en una pasada."""
+
+    def __init__(self, phrases: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Menor id de frase que termina en cada nodo (incluyendo sufijos vía fail)
+        self._best: List[Optional[int]] = [None]
+
+        for pid, phrase in enumerate(phrases):
+            node = 0
+            for ch in phrase:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                node = nxt
+            if self._best[node] is None or pid < self._best[node]:
+                self._best[node] = pid
+
+        # BFS para los enlaces de fallo
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+
+    def first_match(self, text: str) -> Optional[int]:
+        """Menor id de frase contenida en `text` (None si ninguna)."""
+        goto, fail, best = self._goto, self._fail, self._best
+        node, found = 0, None
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            pid = best[node]
+            if pid is not None and (found is None or pid < found):
+                found = pid
+                if found == 0:
+                    break
+        return found
+
+
+class DifflibScorer:
+    """Scorer de referencia: SequenceMatcher.ratio(), idéntico al comportamiento original."""
+
+    name = "difflib"
+
+    def __init__(self, phrases: List[str]):
+        # Un SequenceMatcher por frase con seq2 precalculado (b2j cacheado)
+        self._matchers = []
+        for phrase in phrases:
+            matcher = difflib.SequenceMatcher(None)
+            matcher.set_seq2(phrase)
+            self._matchers.append(matcher)
+
+        # Índice invertido de caracteres → [(id_frase, cuenta)] para la cota superior
+        # (equivale a SequenceMatcher.quick_ratio, que nunca es menor que ratio)
+        self._char_index: Dict[str, List[Tuple[int, int]]] = {}
+        for pid, phrase in enumerate(phrases):
+            for ch, count in Counter(phrase).items():
+                self._char_index.setdefault(ch, []).append((pid, count))
+        self._lengths = [len(p) for p in phrases]
+
+    def best(self, txt: str) -> Tuple[Optional[int], float]:
+        overlap = [0] * len(self._lengths)
+        for ch, count in Counter(txt).items():
+            for pid, phrase_count in self._char_index.get(ch, ()):
+                overlap[pid] += count if count < phrase_count else phrase_count
+
+        n = len(txt)
+        bounds = sorted(
+            ((2.0 * overlap[pid] / (n + length), pid) for pid, length in enumerate(self._lengths)),
+            key=lambda item: (-item[0], item[1]),
+        )
+
+        best_pid, best_score = None, 0.0
+        for bound, pid in bounds:
+            # Ninguna frase restante puede superar (ni empatar con menor id) al mejor actual
+            if bound <= 0.0 or bound < best_score:
+                break
+            matcher = self._matchers[pid]
+            matcher.set_seq1(txt)
+            score = matcher.ratio()
+            if score > best_score or (score == best_score and score > 0.0 and pid < best_pid):
+                best_pid, best_score = pid, score
+        return best_pid, best_score
+
+
+class TrigramScorer:
+    """
+    Coeficiente de Dice sobre trigramas de caracteres, calculado con NumPy para
+    todas las frases en una sola llamada vectorizada.
+    """
+
+    name = "trigram"
+
+    def __init__(self, phrases: List[str]):
+        if not is_available(np):
+            raise RuntimeError("numpy_not_available")
+        self._vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        totals = []
+        for pid, phrase in enumerate(phrases):
+            grams = _trigrams(phrase)
+            totals.append(len(grams))
+            for gram, count in Counter(grams).items():
+                gid = self._vocab.setdefault(gram, len(self._vocab))
+                if gid == len(postings):
+                    postings.append([])
+                postings[gid].append((pid, count))
+
+        # Listas de postings en formato CSR por trigrama
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        flat = [item for plist in postings for item in plist]
+        self._offsets = offsets
+        self._ids = np.fromiter((pid for pid, _ in flat), dtype=np.int32, count=len(flat))
+        self._counts = np.fromiter((c for _, c in flat), dtype=np.int32, count=len(flat))
+        self._totals = np.asarray(totals, dtype=np.float64)
+        self._size = len(phrases)
+
+    def best(self, txt: str) -> Tuple[Optional[int], float]:
+        grams = _trigrams(txt)
+        if not grams or not self._size:
+            return None, 0.0
+        query = [(self._vocab[g], c) for g, c in Counter(grams).items() if g in self._vocab]
+        if not query:
+            return None, 0.0
+
+        gids = np.fromiter((gid for gid, _ in query), dtype=np.int64, count=len(query))
+        qcounts = np.fromiter((c for _, c in query), dtype=np.int32, count=len(query))
+        starts, ends = self._offsets[gids], self._offsets[gids + 1]
+        lengths = ends - starts
+        # Índices de todos los postings implicados, sin bucle en Python
+        index = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        shared = np.minimum(self._counts[index], np.repeat(qcounts, lengths))
+        overlap = np.bincount(self._ids[index], weights=shared, minlength=self._size)
+
+        scores = 2.0 * overlap / (self._totals + len(grams))
+        pid = int(np.argmax(scores))
+        score = float(scores[pid])
+        if score <= 0.0:
+            return None, 0.0
+        return pid, score
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f" {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+SCORERS = {
+    DifflibScorer.name: DifflibScorer,
+    TrigramScorer.name: TrigramScorer,
+}
+
+
+class IntentClassifier:
+    """
+    Índice de frases compilado una sola vez. El orden de prioridad es el de
+    INTENT_SYNONYMS, así que el resultado coincide con el recorrido anidado original.
+    """
+
+    def __init__(self, synonyms: Dict[str, List[str]], fallback_intent: str = FALLBACK_INTENT,
+                 scorer: str = "difflib"):
+        if scorer not in SCORERS:
+            raise ValueError(f"unknown_scorer: {scorer}")
+        self.fallback_intent = fallback_intent
+        self._entries: List[Tuple[str, str]] = [
+            (intent, p) for intent, lst in synonyms.items() for p in lst
+        ]
+        phrases = [p for _, p in self._entries]
+        self._automaton = _PhraseAutomaton(phrases)
+        self.scorer = SCORERS[scorer](phrases)
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        return self.classify_normalized(normalize(text))
+
+    def classify_normalized(self, txt: str) -> Tuple[str, float]:
+        if not txt:
+            return (self.fallback_intent, 0.3)
+
+        # Exact/contains first
+        pid = self._automaton.first_match(txt)
+        if pid is not None:
+            return (self._entries[pid][0], 0.95)
+
+        # Fuzzy: mejor coincidencia entre todas las frases
+        pid, best_score = self.scorer.best(txt)
+        best_intent = self._entries[pid][0] if pid is not None else self.fallback_intent
+
+        # Ajuste de confianza
+        conf = 0.6 + (best_score * 0.4)
+        return (best_intent, min(0.98, conf))
+
+
+def _build_classifier(synonyms: Dict[str, List[str]]) -> IntentClassifier:
+    try:
+        return IntentClassifier(synonyms, scorer=FUZZY_SCORER)
+    except RuntimeError as exc:
+        logger.warning("Scorer %s no disponible (%s); usando difflib", FUZZY_SCORER, exc)
+        return IntentClassifier(synonyms)
+
+
+class ClassificationCache:
+    """
+    LRU acotado de resultados de clasificación, indexado por el texto normalizado.
+    Seguro entre hilos; `generation` evita guardar resultados calculados con un
+    índice anterior a un `clear()`.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, int(maxsize))
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Tuple[str, float], generation: int) -> None:
+        if not self.maxsize:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+_classifier = _build_classifier(INTENT_SYNONYMS)
+_cache = ClassificationCache(CLASSIFY_CACHE_SIZE)
+
+
+def build_classifier(synonyms: Dict[str, List[str]]) -> IntentClassifier:
+    """Construye un índice nuevo sin tocar el activo (p. ej. en un hilo de recarga)."""
+    return _build_classifier(synonyms)
+
+
+def install_classifier(classifier: IntentClassifier) -> None:
+    """Sustituye el índice activo de una vez y vacía la caché."""
+    global _classifier
+    _classifier = classifier
+    _cache.clear()
+
+
+def reload_synonyms(synonyms: Optional[Dict[str, List[str]]] = None) -> None:
+    """Reconstruye el índice (p. ej. tras modificar INTENT_SYNONYMS) y vacía la caché."""
+    install_classifier(_build_classifier(INTENT_SYNONYMS if synonyms is None else synonyms))
+
+
+def classification_cache_stats() -> Dict[str, int]:
+    return _cache.stats()
+
+
 def classify_text(text: str) -> Tuple[str, float]:
     """
     Devuelve (intent, confidence). Heurística simple + fuzzy match.
     """
     txt = normalize(text)
-    if not txt:
-        return (FALLBACK_INTENT, 0.3)
-
-    # Exact/contains first
-    for intent, phrases in INTENT_SYNONYMS.items():
-        for p in phrases:
-            if p in txt:
-                return (intent, 0.95)
-
-    # Fuzzy: mejor coincidencia entre todas las frases
-    all_phrases = [(intent, p) for intent, lst in INTENT_SYNONYMS.items() for p in lst]
-    best_intent, best_score = FALLBACK_INTENT, 0.0
-    for intent, phrase in all_phrases:
-        score = difflib.SequenceMatcher(None, txt, phrase).ratio()
-        if score > best_score:
-            best_score, best_intent = score, intent
-
-    # Ajuste de confianza
-    conf = 0.6 + (best_score * 0.4)
-    return (best_intent, min(0.98, conf))
+    cached = _cache.get(txt)
+    if cached is not None:
+        return cached
+    generation = _cache.generation
+    result = _classifier.classify_normalized(txt)
+    _cache.put(txt, result, generation)
+    return result
+
+
+def classify_many(texts: Iterable[str]) -> List[Tuple[str, float]]:
+    """
+    Clasifica un lote. Normaliza cada texto distinto una sola vez y comparte
+    caché e índice entre las repeticiones del lote.
+    """
+    texts = list(texts)
+    normalized: Dict[str, str] = {}
+    for text in texts:
+        if text not in normalized:
+            normalized[text] = normalize(text)
+
+    results: Dict[str, Tuple[str, float]] = {}
+    classifier, generation = _classifier, _cache.generation
+    for txt in set(normalized.values()):
+        cached = _cache.get(txt)
+        if cached is None:
+            cached = classifier.classify_normalized(txt)
+            _cache.put(txt, cached, generation)
+        results[txt] = cached
+    return [results[normalized[text]] for text in texts]
@@ -0,0 +1,180 @@
+"""
+Paquete offline para el service worker: GET /api/bundle.
+
+Un solo JSON con todo lo necesario para guiar sin red: protocolos, el mapa
+intención → protocolo, los sinónimos del clasificador, los textos de cierre
+y el audio ya sintetizado de cada paso (mp3 en base64, sacado de TTSCache).
+Se construye una vez por (versión de contenido, idioma, audios disponibles),
+se guarda comprimido con gzip y su ETag es el sha256 del cuerpo, así que una
+visita repetida solo cuesta un 304.
+
+Los pasos sin audio en caché no bloquean la respuesta: se sintetizan de
+uno en uno en el AudioWorkPool (con su misma admisión, así que ceden ante
+stt/tts y se abandonan si el pool está lleno) y el siguiente paquete (con
+otro ETag) ya los incluye. Solo se sintetizan idiomas de SUPPORTED_LANGS.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from time import monotonic, time
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from audio_pool import AudioWorkPool, PoolSaturated
+from content_store import ContentStore
+from emergency_bot import FALLBACK_PROTOCOL, GUIDE_DONE_TEXT, NEXT_DONE_TEXT, NO_STEPS_TEXT
+from tts_cache import SUPPORTED_LANGS, TTSCache, normalize_lang, protocol_step_texts
+
+logger = logging.getLogger(__name__)
+
+# Tras un fallo de síntesis (sin red, sin gTTS) no se reintenta en este tiempo
+FILL_RETRY_SECONDS = 300.0
+
+
+class BundleBuild:
+    __slots__ = ("etag", "body", "gzip", "audio_count", "audio_total", "built_at")
+
+    def __init__(self, body: bytes, audio_count: int, audio_total: int):
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.body = body
+        self.gzip = gzip.compress(body, compresslevel=6, mtime=0)
+        self.audio_count = audio_count
+        self.audio_total = audio_total
+        self.built_at = time()
+
+    @property
+    def complete(self) -> bool:
+        return self.audio_count == self.audio_total
+
+
+class OfflineBundle:
+    def __init__(self, content: ContentStore, tts_cache: TTSCache, pool: Optional[AudioWorkPool] = None,
+                 keep: int = 4, fill_audio: bool = True):
+        self.content = content
+        self.tts_cache = tts_cache
+        self.pool = pool
+        self.keep = keep
+        # Sin pool no hay dónde sintetizar con admisión: el paquete sale solo con lo que haya en caché
+        self.fill_audio = fill_audio and pool is not None
+        self._lock = threading.Lock()
+        self._builds: "OrderedDict[Tuple[str, str, FrozenSet[str]], BundleBuild]" = OrderedDict()
+        self._filling: Set[str] = set()
+        self._fill_failed: Dict[str, float] = {}
+        self.builds = 0
+        self.hits = 0
+        self.audio_filled = 0
+
+    def get(self, lang: Optional[str]) -> BundleBuild:
+        lang = normalize_lang(lang)
+        version = self.content.current
+        # Textos únicos: varios protocolos pueden compartir frases
+        texts = list(dict.fromkeys(protocol_step_texts(version.bot.protocols)))
+        available = frozenset(text for text in texts if self.tts_cache.contains(text, lang))
+        cache_id = (version.digest, lang, available)
+        with self._lock:
+            build = self._builds.get(cache_id)
+            if build is not None:
+                self._builds.move_to_end(cache_id)
+                self.hits += 1
+                return build
+
+        build = self._build(version, lang, texts, available)
+        with self._lock:
+            self._builds[cache_id] = build
+            while len(self._builds) > self.keep:
+                self._builds.popitem(last=False)
+            self.builds += 1
+        if not build.complete and self.fill_audio and lang in SUPPORTED_LANGS:
+            self._fill_async(lang, [text for text in texts if text not in available])
+        return build
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "hits": self.hits,
+                "cached": len(self._builds),
+                "audio_filled": self.audio_filled,
+                "filling": len(self._filling),
+            }
+
+    def _build(self, version, lang: str, texts: List[str], available: FrozenSet[str]) -> BundleBuild:
+        audio: Dict[str, str] = {}
+        keys: Dict[str, str] = {}
+        for text in texts:
+            found = self.tts_cache.peek(text, lang) if text in available else None
+            if found is not None:
+                key, mp3 = found
+                audio[key] = base64.b64encode(mp3).decode("ascii")
+                keys[text] = key
+
+        protocols = version.bot.protocols
+        payload = {
+            "content_digest": version.digest,
+            "lang": lang,
+            "fallback_protocol": FALLBACK_PROTOCOL,
+            "texts": {
+                "no_steps": NO_STEPS_TEXT,
+                "guide_done": GUIDE_DONE_TEXT,
+                "next_done": NEXT_DONE_TEXT,
+            },
+            "protocols": {
+                pid: {"title": raw.get("title", "Protocolo"), "steps": list(raw.get("steps", []))}
+                for pid, raw in protocols.items()
+            },
+            "intent_protocol_map": version.bot.intent_protocol_map,
+            "synonyms": version.synonyms,
+            "step_audio": {
+                pid: [keys.get(step) for step in raw.get("steps", [])]
+                for pid, raw in protocols.items()
+            },
+            "audio": audio,
+            "audio_complete": len(audio) == len(texts),
+        }
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        return BundleBuild(body, len(audio), len(texts))
+
+    def _fill_async(self, lang: str, missing: List[str]) -> None:
+        with self._lock:
+            if lang in self._filling:
+                return
+            failed_at = self._fill_failed.get(lang)
+            if failed_at is not None and monotonic() - failed_at < FILL_RETRY_SECONDS:
+                return
+            self._filling.add(lang)
+        self._fill_next(lang, missing)
+
+    def _fill_next(self, lang: str, missing: List[str]) -> None:
+        """Encola el siguiente texto pendiente; cada tarea ocupa un hueco del pool solo un audio."""
+        if not missing:
+            self._fill_done(lang)
+            return
+        try:
+            self.pool.submit("bundle", self._fill_one, lang, missing)
+        except PoolSaturated:
+            # El pool está ocupado con peticiones reales: se reintenta en el próximo GET /api/bundle
+            self._fill_done(lang)
+
+    def _fill_one(self, lang: str, missing: List[str]) -> None:
+        text = missing[0]
+        try:
+            if not self.tts_cache.contains(text, lang):
+                self.tts_cache.get(text, lang)
+                with self._lock:
+                    self.audio_filled += 1
+        except Exception as exc:  # pragma: no cover - depende de red/gTTS
+            logger.warning("No se pudo sintetizar el audio del paquete offline (%s): %s", lang, exc)
+            self._fill_done(lang, failed=True)
+            return
+        self._fill_next(lang, missing[1:])
+
+    def _fill_done(self, lang: str, failed: bool = False) -> None:
+        with self._lock:
+            self._filling.discard(lang)
+            if failed:
+                self._fill_failed[lang] = monotonic()
+            else:
+                self._fill_failed.pop(lang, None)
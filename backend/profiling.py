@@ -0,0 +1,145 @@
+"""
+Perfilado opcional por petición con salida en pilas colapsadas (flame graph).
+
+Desactivado no cuesta nada más que comprobar `profiler.armed` y
+`profiler.tracing` en los hooks de la petición. Activado
+(CONRUMBO_PROFILE_RATE o POST /api/admin/profile) perfila una fracción de
+las peticiones, o las que traen la cabecera
+`X-Conrumbo-Profile: 1` si se permite, con un trazador sys.setprofile solo
+en el hilo de esa petición. Cada pila se acumula por endpoint en
+microsegundos de tiempo propio; `collapsed()` devuelve el formato de
+flamegraph.pl / speedscope:
+
+    guide;flask.app:dispatch_request;app:guide;guide_engine:guide 84
+"""
+import random
+import sys
+import threading
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_HEADER = "X-Conrumbo-Profile"
+MAX_DEPTH = 64
+
+
+class _Trace:
+    """Pila de llamadas de una petición perfilada (solo la toca su hilo)."""
+
+    __slots__ = ("endpoint", "stack", "totals", "previous")
+
+    def __init__(self, endpoint: str, previous: Any):
+        self.endpoint = endpoint
+        # [etiqueta, inicio_ns, ns_de_hijos]
+        self.stack: List[List[Any]] = []
+        self.totals: Dict[Tuple[str, ...], int] = {}
+        self.previous = previous
+
+    def __call__(self, frame, event: str, arg: Any) -> None:
+        now = perf_counter_ns()
+        if event == "call" or event == "c_call":
+            if event == "call":
+                code = frame.f_code
+                label = f"{frame.f_globals.get('__name__', '?')}:{code.co_name}"
+            else:
+                label = f"{getattr(arg, '__module__', None) or 'builtins'}:{getattr(arg, '__qualname__', repr(arg))}"
+            self.stack.append([label, now, 0])
+        elif self.stack:
+            # return / c_return / c_exception: cerrar el marco de arriba
+            label, start, children = self.stack.pop()
+            elapsed = now - start
+            key = tuple(entry[0] for entry in self.stack[:MAX_DEPTH - 1]) + (label,)
+            self.totals[key] = self.totals.get(key, 0) + elapsed - children
+            if self.stack:
+                self.stack[-1][2] += elapsed
+
+
+class RequestProfiler:
+    def __init__(self, rate: float = 0.0, allow_header: bool = False, max_stacks: int = 5000):
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._stacks: Dict[str, Dict[Tuple[str, ...], int]] = {}
+        self._requests: Dict[str, int] = {}
+        self.rate = 0.0
+        self.allow_header = False
+        self.armed = False
+        # Peticiones trazándose ahora mismo (aunque entretanto se haya desactivado)
+        self.tracing = 0
+        self.configure(rate=rate, allow_header=allow_header)
+
+    def configure(self, rate: Optional[float] = None, allow_header: Optional[bool] = None) -> None:
+        if rate is not None:
+            self.rate = min(1.0, max(0.0, float(rate)))
+        if allow_header is not None:
+            self.allow_header = bool(allow_header)
+        # Lo único que miran los hooks cuando está apagado
+        self.armed = self.rate > 0 or self.allow_header
+
+    def start(self, endpoint: str, headers) -> Optional[_Trace]:
+        """Empieza a trazar este hilo si la petición entra en la muestra; None si no."""
+        requested = self.allow_header and headers.get(PROFILE_HEADER) == "1"
+        if not requested and not (self.rate and random.random() < self.rate):
+            return None
+        trace = _Trace(endpoint, sys.getprofile())
+        with self._lock:
+            self.tracing += 1
+        sys.setprofile(trace)
+        return trace
+
+    def stop(self, trace: _Trace) -> None:
+        sys.setprofile(trace.previous)
+        with self._lock:
+            stacks = self._stacks.setdefault(trace.endpoint, {})
+            for key, elapsed_ns in trace.totals.items():
+                if key not in stacks and len(stacks) >= self.max_stacks:
+                    key = ("[truncated]",)
+                stacks[key] = stacks.get(key, 0) + elapsed_ns
+            self._requests[trace.endpoint] = self._requests.get(trace.endpoint, 0) + 1
+            self.tracing -= 1
+
+    def collapsed(self, endpoint: Optional[str] = None) -> str:
+        """Pilas colapsadas (`endpoint;marco;...;marco microsegundos`), una por línea."""
+        with self._lock:
+            items = [
+                (name, key, elapsed_ns)
+                for name, stacks in self._stacks.items() if endpoint in (None, name)
+                for key, elapsed_ns in stacks.items()
+            ]
+        lines = [
+            f"{';'.join((name,) + key)} {elapsed_ns // 1000}"
+            for name, key, elapsed_ns in sorted(items)
+            if elapsed_ns >= 1000
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def summary(self, top: int = 15) -> Dict[str, Any]:
+        """Estado y, por endpoint, las funciones con más tiempo propio."""
+        with self._lock:
+            endpoints = {}
+            for name, stacks in self._stacks.items():
+                own: Dict[str, int] = {}
+                for key, elapsed_ns in stacks.items():
+                    own[key[-1]] = own.get(key[-1], 0) + elapsed_ns
+                requests = self._requests.get(name, 0)
+                endpoints[name] = {
+                    "requests": requests,
+                    "stacks": len(stacks),
+                    "top_self_us_per_request": [
+                        [label, round(elapsed_ns / 1000 / max(1, requests), 1)]
+                        for label, elapsed_ns in sorted(own.items(), key=lambda item: -item[1])[:top]
+                    ],
+                }
+        return {"rate": self.rate, "allow_header": self.allow_header, "armed": self.armed, "endpoints": endpoints}
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "armed": int(self.armed),
+                "rate": self.rate,
+                "profiled_requests": sum(self._requests.values()),
+                "stacks": sum(len(stacks) for stacks in self._stacks.values()),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._requests.clear()
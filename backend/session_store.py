@@ -0,0 +1,376 @@
+"""
+Backends de sesiones.
+
+- SessionStore: en memoria, con expulsión LRU O(1), TTL por inactividad y un
+  barrido periódico en segundo plano (estado por proceso).
+- SQLiteSessionBackend: SQLite en modo WAL compartido por todos los workers
+  de la máquina, con bloqueo por sesión y commits agrupados.
+
+Todos exponen get / [] / pop / lock(session_id) / sweep / stats.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import monotonic, time
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# Número de franjas de bloqueo: las sesiones se reparten por crc32(session_id)
+LOCK_STRIPES = 1024
+
+
+class SessionBackend:
+    """Interfaz común de los backends de sesiones."""
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def __setitem__(self, session_id: str, context: Any) -> None:
+        raise NotImplementedError
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def __getitem__(self, session_id: str) -> Any:
+        value = self.get(session_id, _MISSING)
+        if value is _MISSING:
+            raise KeyError(session_id)
+        return value
+
+    def __contains__(self, session_id: object) -> bool:
+        return self.get(session_id, _MISSING) is not _MISSING  # type: ignore[arg-type]
+
+    @contextmanager
+    def lock(self, session_id: str) -> Iterator[None]:
+        """Serializa el ciclo leer-modificar-escribir de una sesión."""
+        stripe = self._stripes[zlib.crc32(session_id.encode("utf-8")) % LOCK_STRIPES]
+        with stripe:
+            yield
+
+    def start_sweeper(self, interval: float = 60.0) -> None:
+        if getattr(self, "_sweeper", None) is not None and self._sweeper.is_alive():
+            return
+        self._stop = threading.Event()
+
+        def _loop() -> None:
+            while not self._stop.wait(interval):
+                self.sweep()
+
+        self._sweeper = threading.Thread(target=_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        if getattr(self, "_sweeper", None) is not None:
+            self._stop.set()
+
+
+class SessionStore(SessionBackend):
+    """
+    Mapa session_id → contexto acotado por número de sesiones (`max_items`)
+    y, opcionalmente, por tamaño estimado en bytes (`max_bytes`).
+
+    El orden del OrderedDict es el de último acceso, así que tanto la
+    expulsión LRU como el barrido de caducadas empiezan por la cabeza.
+    """
+
+    def __init__(self, max_items: int = 1000, ttl: Optional[float] = 3600.0,
+                 max_bytes: Optional[int] = None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # session_id → [contexto, último acceso, bytes estimados]
+        self._data: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._sweeper: Optional[threading.Thread] = None
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return default
+            now = monotonic()
+            if self.ttl is not None and now - entry[1] > self.ttl:
+                self._remove(session_id)
+                self.expirations += 1
+                return default
+            entry[1] = now
+            self._data.move_to_end(session_id)
+            return entry[0]
+
+    def __setitem__(self, session_id: str, context: Any) -> None:
+        size = _estimate_size(context) if self.max_bytes else 0
+        with self._lock:
+            if session_id in self._data:
+                self._remove(session_id)
+            self._data[session_id] = [context, monotonic(), size]
+            self._bytes += size
+            while len(self._data) > self.max_items or (
+                self.max_bytes and self._bytes > self.max_bytes and len(self._data) > 1
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        with self._lock:
+            if session_id not in self._data:
+                return default
+            return self._remove(session_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Elimina las sesiones caducadas; devuelve cuántas."""
+        if self.ttl is None:
+            return 0
+        removed = 0
+        deadline = monotonic() - self.ttl
+        with self._lock:
+            while self._data:
+                session_id, entry = next(iter(self._data.items()))
+                if entry[1] >= deadline:
+                    break
+                self._remove(session_id)
+                removed += 1
+            self.expirations += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._data),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, session_id: str) -> Any:
+        context, _, size = self._data.pop(session_id)
+        self._bytes -= size
+        return context
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Sesiones en una base SQLite (WAL) compartida entre procesos.
+
+    - lock(session_id) combina un lock de hilo por franja con un lock de rango
+      de bytes (fcntl.lockf) sobre `<db>.lock`, de modo que dos workers no
+      intercalan el leer-modificar-escribir de la misma sesión.
+    - Las escrituras se encolan y un hilo las confirma en una sola transacción
+      (commit agrupado); quien escribe espera a su commit antes de responder,
+      así el siguiente worker siempre ve el estado actualizado.
+    - TTL y límite de sesiones se aplican en sweep() (por fecha de escritura).
+    """
+
+    def __init__(self, path, max_items: int = 1000, ttl: Optional[float] = 3600.0,
+                 max_batch: int = 256, write_timeout: float = 30.0):
+        self.path = str(path)
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_batch = max_batch
+        # Lo más que espera __setitem__ a su commit (busy_timeout de sqlite es 30 s)
+        self.write_timeout = write_timeout
+        self.evictions = 0
+        self.expirations = 0
+        self.commits = 0
+        self.batched_writes = 0
+        self._local = threading.local()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._sweeper: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._writer: Optional[threading.Thread] = None
+        self._writer_guard = threading.Lock()
+        self._lock_file = None
+        self._lock_file_pid: Optional[int] = None
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at)")
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return default
+        if self.ttl is not None and time() - row[1] > self.ttl:
+            return default
+        return json.loads(row[0])
+
+    def __setitem__(self, session_id: str, context: Any) -> None:
+        self._ensure_writer()
+        done = threading.Event()
+        outcome: List[Optional[BaseException]] = [None]
+        self._queue.put((session_id, json.dumps(context, ensure_ascii=False), time(), done, outcome))
+        if not done.wait(self.write_timeout):
+            raise TimeoutError("session_write_timeout")
+        if outcome[0] is not None:
+            raise outcome[0]
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        value = self.get(session_id, default)
+        self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return value
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    @contextmanager
+    def lock(self, session_id: str) -> Iterator[None]:
+        stripe = zlib.crc32(session_id.encode("utf-8")) % LOCK_STRIPES
+        with self._stripes[stripe]:
+            fd = self._lock_fd()
+            if fd is None:
+                yield
+                return
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, stripe)
+
+    def sweep(self) -> int:
+        conn = self._connection()
+        removed = 0
+        if self.ttl is not None:
+            cur = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time() - self.ttl,))
+            self.expirations += cur.rowcount
+            removed += cur.rowcount
+        cur = conn.execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            " SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_items,),
+        )
+        self.evictions += cur.rowcount
+        return removed + cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "commits": self.commits,
+            "batched_writes": self.batched_writes,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo y proceso (las conexiones no sobreviven a un fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _lock_fd(self) -> Optional[int]:
+        if fcntl is None:
+            return None
+        if self._lock_file is None or self._lock_file_pid != os.getpid():
+            self._lock_file = open(self.path + ".lock", "a+b")
+            self._lock_file_pid = os.getpid()
+        return self._lock_file.fileno()
+
+    def _ensure_writer(self) -> None:
+        if self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._writer_guard:
+            if self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+            if self._writer_pid != os.getpid():
+                self._queue: "queue.Queue" = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+            self._writer.start()
+            self._writer_pid = os.getpid()
+
+    def _write_loop(self) -> None:
+        conn = self._connection()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            error: Optional[BaseException] = None
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(session_id) DO UPDATE SET"
+                    " data = excluded.data, updated_at = excluded.updated_at",
+                    [item[:3] for item in batch],
+                )
+                conn.execute("COMMIT")
+                self.commits += 1
+                self.batched_writes += len(batch)
+            except Exception as exc:
+                # Cualquier fallo vuelve a quien escribía; el hilo sigue vivo para el siguiente lote
+                error = exc
+                if conn.in_transaction:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        logger.exception("ROLLBACK fallido en el escritor de sesiones")
+            for *_, done, outcome in batch:
+                outcome[0] = error
+                done.set()
+
+
+def create_session_backend(kind: str = "memory", path=None, max_items: int = 1000,
+                           ttl: Optional[float] = 3600.0, max_bytes: Optional[int] = None) -> SessionBackend:
+    if kind == "memory":
+        return SessionStore(max_items=max_items, ttl=ttl, max_bytes=max_bytes)
+    if kind == "sqlite":
+        if path is None:
+            raise ValueError("sqlite_path_required")
+        return SQLiteSessionBackend(path, max_items=max_items, ttl=ttl)
+    raise ValueError(f"unknown_session_backend: {kind}")
+
+
+def _estimate_size(value: Any) -> int:
+    """Tamaño aproximado en bytes de un contexto (dicts, listas y escalares)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(v) for v in value)
+    return size
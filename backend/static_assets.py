@@ -0,0 +1,228 @@
+"""
+Frontend estático precomprimido y con huella de contenido.
+
+Al arrancar se lee `frontend/` una vez y cada fichero se guarda en memoria con
+su sha256, sus variantes gzip/brotli (brotli si el módulo está instalado) y un
+nombre con huella (`script.<hash>.js`). Las referencias `./fichero` de
+index.html, style.css y script.js se reescriben a esos nombres, que se sirven
+con `Cache-Control: immutable` de un año; index.html, sw.js y el manifest
+mantienen su URL y se revalidan en cada carga (ETag → 304). sw.js recibe la
+lista de URLs con huella y un nombre de caché derivado del contenido, así que
+cualquier cambio en el frontend invalida la caché del service worker (solo
+se precachea lo que index.html, style.css o script.js referencian).
+
+En desarrollo, `start_watcher(intervalo)` revisa los mtimes en un hilo
+aparte y reconstruye allí; las peticiones nunca recorren el directorio ni
+comprimen.
+"""
+import logging
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import brotli  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Se sirven siempre con su URL de siempre (los navegadores no aceptan otra para sw/manifest)
+STABLE_NAMES = frozenset({"index.html", "sw.js", "manifest.webmanifest"})
+TEXT_SUFFIXES = frozenset({".html", ".css", ".js", ".json", ".webmanifest", ".svg", ".txt", ".map"})
+REWRITE_SUFFIXES = frozenset({".html", ".css", ".js", ".webmanifest"})
+MIN_COMPRESS_BYTES = 512
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("text/javascript", ".js")
+
+
+class StaticFile:
+    __slots__ = ("name", "url_name", "mimetype", "etag", "variants")
+
+    def __init__(self, name: str, url_name: str, mimetype: str, etag: str, variants: Dict[str, bytes]):
+        self.name = name
+        self.url_name = url_name
+        self.mimetype = mimetype
+        self.etag = etag
+        # codificación ("identity", "gzip", "br") → cuerpo
+        self.variants = variants
+
+    @property
+    def immutable(self) -> bool:
+        return self.url_name != self.name
+
+    def select(self, accepts: Iterable[str]) -> Tuple[str, bytes]:
+        """La variante más pequeña que el cliente acepta (br > gzip > identity)."""
+        accepted = set(accepts)
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return "identity", self.variants["identity"]
+
+    def etag_for(self, encoding: str) -> str:
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+
+def _hashed_name(name: str, digest: str) -> str:
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}"))
+
+
+def _compress(body: bytes) -> Dict[str, bytes]:
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return variants
+    gz = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(gz) < len(body):
+        variants["gzip"] = gz
+    if brotli is not None:
+        br = brotli.compress(body, quality=11)
+        if len(br) < len(gz):
+            variants["br"] = br
+    return variants
+
+
+class StaticBundle:
+    def __init__(self, root: Path, compress: bool = True):
+        self.root = Path(root).resolve()
+        self.compress = compress
+        self._lock = threading.Lock()
+        # Una sola reconstrucción a la vez (gzip-9/brotli-11 de todo el frontend)
+        self._build_lock = threading.Lock()
+        self._files: Dict[str, StaticFile] = {}
+        self._fingerprint: Tuple[Tuple[str, int, int], ...] = ()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.version = ""
+        self.builds = 0
+        self.build()
+
+    def lookup(self, name: str) -> Optional[StaticFile]:
+        """Busca por nombre lógico (`script.js`) o con huella (`script.<hash>.js`)."""
+        return self._files.get(name)
+
+    def url_for(self, name: str) -> str:
+        entry = self._files.get(name)
+        return entry.url_name if entry is not None else name
+
+    def stats(self) -> Dict[str, int]:
+        files = {entry.name: entry for entry in self._files.values()}.values()
+        return {
+            "files": len(files),
+            "identity_bytes": sum(len(entry.variants["identity"]) for entry in files),
+            "gzip_bytes": sum(len(entry.variants.get("gzip", entry.variants["identity"])) for entry in files),
+            "br_bytes": sum(len(entry.variants["br"]) for entry in files if "br" in entry.variants),
+            "builds": self.builds,
+        }
+
+    def build(self) -> None:
+        with self._build_lock:
+            self._build()
+
+    def _build(self) -> None:
+        fingerprint = self._scan()
+        sources = {name: (self.root / name).read_bytes() for name, _, _ in fingerprint}
+        entries: Dict[str, StaticFile] = {}
+        referenced = {"manifest.webmanifest"}
+
+        # Primero lo que no referencia a nadie; cada texto se cierra cuando sus referencias ya tienen huella
+        pending = dict(sources)
+        while pending:
+            progressed = False
+            for name in sorted(pending):
+                body = pending[name]
+                refs = self._references(name, body, sources)
+                referenced.update(refs)
+                if any(ref != name and ref in pending for ref in refs):
+                    continue
+                entries[name] = self._entry(name, self._rewrite(body, refs, entries))
+                del pending[name]
+                progressed = True
+            if not progressed:  # referencias circulares: se sirven sin reescribir
+                for name, body in pending.items():
+                    entries[name] = self._entry(name, body)
+                break
+
+        version = hashlib.sha256("".join(sorted(e.etag for e in entries.values())).encode()).hexdigest()[:12]
+        if "sw.js" in entries:
+            precache = ["./", "./index.html"] + sorted(
+                f"./{entry.url_name}" for name, entry in entries.items() if name in referenced
+            )
+            entries["sw.js"] = self._entry("sw.js", self._service_worker(sources["sw.js"], version, precache))
+
+        files = dict(entries)
+        files.update({entry.url_name: entry for entry in entries.values()})
+        with self._lock:
+            self._files = files
+            self._fingerprint = fingerprint
+            self.version = version
+            self.builds += 1
+
+    def start_watcher(self, interval: float) -> None:
+        """Reconstruye en un hilo aparte si cambian los mtimes de `frontend/` (solo desarrollo; 0 = apagado)."""
+        # Tras un fork el hilo del padre ya no existe (is_alive() es False) y se vuelve a arrancar
+        if (self._watcher is not None and self._watcher.is_alive()) or interval <= 0:
+            return
+
+        def _loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    if self._scan() != self._fingerprint:
+                        self.build()
+                except Exception:  # pragma: no cover - nunca tumbar el watcher
+                    logger.exception("Fallo reconstruyendo el frontend")
+
+        self._watcher = threading.Thread(target=_loop, name="static-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+
+    def _scan(self) -> Tuple[Tuple[str, int, int], ...]:
+        found = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = Path(dirpath) / filename
+                stat = path.stat()
+                found.append((path.relative_to(self.root).as_posix(), stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(found))
+
+    def _entry(self, name: str, body: bytes) -> StaticFile:
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        url_name = name if name in STABLE_NAMES else _hashed_name(name, digest[:10])
+        suffix = PurePosixPath(name).suffix.lower()
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if suffix in TEXT_SUFFIXES and not mimetype.endswith("charset=utf-8"):
+            mimetype = f"{mimetype}; charset=utf-8"
+        variants = _compress(body) if self.compress and suffix in TEXT_SUFFIXES else {"identity": body}
+        return StaticFile(name, url_name, mimetype, digest, variants)
+
+    @staticmethod
+    def _references(name: str, body: bytes, sources: Dict[str, bytes]) -> List[str]:
+        if PurePosixPath(name).suffix.lower() not in REWRITE_SUFFIXES:
+            return []
+        return [ref for ref in sources if ref not in STABLE_NAMES and f"./{ref}".encode() in body]
+
+    @staticmethod
+    def _rewrite(body: bytes, refs: List[str], entries: Dict[str, StaticFile]) -> bytes:
+        for ref in sorted(refs, key=len, reverse=True):
+            if ref in entries:
+                body = body.replace(f"./{ref}".encode(), f"./{entries[ref].url_name}".encode())
+        return body
+
+    @staticmethod
+    def _service_worker(source: bytes, version: str, precache: List[str]) -> bytes:
+        text = source.decode("utf-8")
+        assets = ",\n".join(f'  "{url}"' for url in precache)
+        text = re.sub(r'const CACHE = "[^"]*";', f'const CACHE = "conrumbo-{version}";', text, count=1)
+        text = re.sub(r"const ASSETS = \[[^\]]*\];", f"const ASSETS = [\n{assets}\n];", text, count=1)
+        return text.encode("utf-8")
@@ -0,0 +1,147 @@
+"""
+Backends de reconocimiento de voz para /api/stt.
+
+- google: speech_recognition + Google Web Speech (requiere red).
+- whisper: faster-whisper local/offline; el modelo se carga una vez por
+  worker y se mantiene caliente.
+- stub: determinista, sin red ni modelo (pruebas de carga).
+
+Se elige con CONRUMBO_STT_BACKEND. Cada backend registra su latencia en el
+histograma `conrumbo_stt_backend_seconds{backend=...}`.
+speech_recognition y numpy se importan en el primer uso (o en `warm()`).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from time import perf_counter_ns
+from typing import Dict, Optional
+
+from latency import LatencyRegistry
+from lazy_deps import is_available, lazy_module
+
+sr = lazy_module("speech_recognition")
+np = lazy_module("numpy", optional=True)
+
+logger = logging.getLogger(__name__)
+
+
+class SpeechBackend:
+    name = "base"
+    # Modelo local que conviene cargar al arrancar el worker aunque las importaciones sean perezosas
+    has_model = False
+
+    def __init__(self, latency: Optional[LatencyRegistry] = None):
+        self.latency = latency
+        self.calls = 0
+        self.failures = 0
+        self._counter_lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Carga perezosa de recursos pesados (modelos); por defecto no hace nada."""
+
+    def transcribe(self, audio: sr.AudioData, language: str) -> str:
+        t0 = perf_counter_ns()
+        failed = False
+        try:
+            return self._transcribe(audio, language)
+        except Exception:
+            failed = True
+            logger.exception("Fallo del backend STT %s", self.name)
+            return ""
+        finally:
+            with self._counter_lock:
+                self.calls += 1
+                self.failures += failed
+            if self.latency is not None:
+                self.latency.observe("conrumbo_stt_backend_seconds", perf_counter_ns() - t0, backend=self.name)
+
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            return {"calls": self.calls, "failures": self.failures}
+
+    def _transcribe(self, audio: sr.AudioData, language: str) -> str:
+        raise NotImplementedError
+
+
+class GoogleBackend(SpeechBackend):
+    name = "google"
+
+    def __init__(self, latency: Optional[LatencyRegistry] = None):
+        super().__init__(latency)
+        self._recognizer = None
+
+    def warm(self) -> None:
+        if self._recognizer is None:
+            self._recognizer = sr.Recognizer()
+
+    def _transcribe(self, audio: sr.AudioData, language: str) -> str:
+        self.warm()
+        try:
+            return self._recognizer.recognize_google(audio, language=language)
+        except (sr.UnknownValueError, sr.RequestError):
+            return ""
+
+
+class WhisperBackend(SpeechBackend):
+    """faster-whisper en CPU; `model` es el tamaño (tiny, base, small...) o una ruta local."""
+
+    name = "whisper"
+    has_model = True
+
+    def __init__(self, latency: Optional[LatencyRegistry] = None, model: str = "small",
+                 compute_type: str = "int8"):
+        super().__init__(latency)
+        self.model_name = model
+        self.compute_type = compute_type
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def warm(self) -> None:
+        with self._load_lock:
+            if self._model is not None:
+                return
+            if not is_available(np):
+                raise RuntimeError("numpy_not_available")
+            try:
+                from faster_whisper import WhisperModel  # type: ignore
+            except ImportError as exc:
+                raise RuntimeError("faster_whisper_not_available") from exc
+            self._model = WhisperModel(self.model_name, device="cpu", compute_type=self.compute_type)
+            # Una inferencia corta en silencio deja listos los kernels y buffers
+            list(self._model.transcribe(np.zeros(16000, dtype=np.float32), language="es")[0])
+
+    def _transcribe(self, audio: sr.AudioData, language: str) -> str:
+        self.warm()
+        pcm = audio.get_raw_data(convert_rate=16000, convert_width=2)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self._model.transcribe(samples, language=language.split("-")[0], beam_size=1)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+class StubBackend(SpeechBackend):
+    """Devuelve siempre el mismo texto (CONRUMBO_STT_STUB_TEXT) si hay audio."""
+
+    name = "stub"
+
+    def __init__(self, latency: Optional[LatencyRegistry] = None, text: str = "no respira"):
+        super().__init__(latency)
+        self.text = text
+
+    def _transcribe(self, audio: sr.AudioData, language: str) -> str:
+        return self.text if audio.frame_data else ""
+
+
+def create_stt_backend(kind: str, latency: Optional[LatencyRegistry] = None) -> SpeechBackend:
+    if kind == "google":
+        return GoogleBackend(latency)
+    if kind == "whisper":
+        return WhisperBackend(
+            latency,
+            model=os.getenv("CONRUMBO_WHISPER_MODEL", "small"),
+            compute_type=os.getenv("CONRUMBO_WHISPER_COMPUTE", "int8"),
+        )
+    if kind == "stub":
+        return StubBackend(latency, text=os.getenv("CONRUMBO_STT_STUB_TEXT", "no respira"))
+    raise ValueError(f"unknown_stt_backend: {kind}")
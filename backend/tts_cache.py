@@ -0,0 +1,235 @@
+"""
+Caché de audio TTS direccionada por contenido (memoria + disco).
+
+La clave es sha256(lang + texto), así que sirve también como ETag fuerte.
+Uso como CLI para precalentar los pasos de todos los protocolos:
+    python tts_cache.py prewarm [--lang es] [--synth gtts|stub]
+"""
+import argparse
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from lazy_deps import is_available, lazy_module
+
+# gTTS se importa en el primer fallo de caché, no al arrancar el worker
+gtts = lazy_module("gtts", optional=True)
+
+Synthesizer = Callable[[str, str], bytes]
+
+
+class TTSUnavailable(RuntimeError):
+    pass
+
+
+def gtts_synthesizer(text: str, lang: str) -> bytes:
+    if not is_available(gtts):
+        raise TTSUnavailable("tts_unavailable")
+    buffer = io.BytesIO()
+    gtts.gTTS(text=text, lang=lang).write_to_fp(buffer)
+    return buffer.getvalue()
+
+
+def stub_synthesizer(text: str, lang: str) -> bytes:
+    """Sintetizador local determinista (pruebas y carga, sin red)."""
+    digest = hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).digest()
+    return b"ID3\x04\x00\x00\x00\x00\x00\x00" + digest + text.encode("utf-8")
+
+
+SYNTHESIZERS: Dict[str, Synthesizer] = {
+    "gtts": gtts_synthesizer,
+    "stub": stub_synthesizer,
+}
+
+
+# Idiomas que ofrece el frontend (SUPPORTED_LANGUAGES en script.js)
+SUPPORTED_LANGS = frozenset({"es", "en"})
+
+
+def normalize_lang(lang: Optional[str]) -> str:
+    return (lang or "es").split("-")[0].lower()
+
+
+def supported_lang(lang: Optional[str], default: Optional[str] = None) -> str:
+    """`lang` normalizado si es uno de SUPPORTED_LANGS; si no, `default` (o "es")."""
+    lang = normalize_lang(lang)
+    if lang in SUPPORTED_LANGS:
+        return lang
+    default = normalize_lang(default)
+    return default if default in SUPPORTED_LANGS else "es"
+
+
+def cache_key(text: str, lang: str) -> str:
+    return hashlib.sha256(f"{normalize_lang(lang)}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    LRU en memoria (acotado en bytes) delante de un directorio en disco
+    (también acotado en bytes, expulsando por último uso). Un lock por clave
+    evita sintetizar dos veces el mismo texto en peticiones concurrentes.
+    """
+
+    def __init__(self, directory, synthesizer: Synthesizer = gtts_synthesizer,
+                 max_memory_bytes: int = 32 * 1024 * 1024, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.synthesizer = synthesizer
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Índice del disco en orden de último uso (mtime)
+        files = sorted(self.directory.glob("*.mp3"), key=lambda p: p.stat().st_mtime)
+        self._disk: "OrderedDict[str, int]" = OrderedDict((p.stem, p.stat().st_size) for p in files)
+        self._disk_bytes = sum(self._disk.values())
+
+    def get(self, text: str, lang: str) -> Tuple[str, bytes]:
+        """Devuelve (clave/ETag, audio mp3), sintetizando solo si no está en caché."""
+        key = cache_key(text, lang)
+        audio = self._lookup(key)
+        if audio is not None:
+            return key, audio
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            audio = self._lookup(key)
+            if audio is None:
+                audio = self.synthesizer(text, normalize_lang(lang))
+                with self._lock:
+                    self.misses += 1
+                self._store(key, audio)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return key, audio
+
+    def peek(self, text: str, lang: str) -> Optional[Tuple[str, bytes]]:
+        """Como get() pero sin sintetizar: None si no está en memoria ni en disco."""
+        key = cache_key(text, lang)
+        audio = self._lookup(key)
+        return (key, audio) if audio is not None else None
+
+    def contains(self, text: str, lang: str) -> bool:
+        key = cache_key(text, lang)
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def prewarm(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Sintetiza por adelantado los (texto, lang) que falten; devuelve cuántos eran nuevos."""
+        created = 0
+        for text, lang in items:
+            if not self.contains(text, lang):
+                self.get(text, lang)
+                created += 1
+        return created
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "disk_entries": len(self._disk),
+            }
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return audio
+            on_disk = key in self._disk
+        if not on_disk:
+            return None
+        path = self.directory / f"{key}.mp3"
+        try:
+            audio = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self.hits_disk += 1
+        self._remember(key, audio)
+        return audio
+
+    def _store(self, key: str, audio: bytes) -> None:
+        path = self.directory / f"{key}.mp3"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(audio)
+        os.replace(tmp, path)
+        evicted = []
+        with self._lock:
+            self._disk_bytes += len(audio) - self._disk.pop(key, 0)
+            self._disk[key] = len(audio)
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.evictions += 1
+                evicted.append(old)
+        for old in evicted:
+            try:
+                (self.directory / f"{old}.mp3").unlink()
+            except OSError:
+                pass
+        self._remember(key, audio)
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, old = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old)
+
+
+def protocol_step_texts(protocols: Dict[str, Dict]) -> Iterator[str]:
+    """Todos los textos de pasos de los protocolos cargados por BotEngine."""
+    for protocol in protocols.values():
+        for step in protocol.get("steps", []):
+            yield step
+
+
+def main(argv=None) -> None:
+    from emergency_bot import BotEngine
+
+    parser = argparse.ArgumentParser(description="Caché TTS de ConRumbo")
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm = sub.add_parser("prewarm", help="Sintetiza todos los pasos de todos los protocolos")
+    warm.add_argument("--lang", action="append", default=None)
+    warm.add_argument("--synth", default=os.getenv("CONRUMBO_TTS_SYNTH", "gtts"), choices=list(SYNTHESIZERS))
+    warm.add_argument("--dir", default=str(Path(__file__).resolve().parent / "tts_cache"))
+    args = parser.parse_args(argv)
+
+    bot = BotEngine(protocols_path=Path(__file__).resolve().parent / "protocols.json")
+    cache = TTSCache(args.dir, synthesizer=SYNTHESIZERS[args.synth])
+    langs = args.lang or ["es"]
+    created = cache.prewarm((text, lang) for lang in langs for text in protocol_step_texts(bot.protocols))
+    print(f"{created} audios nuevos en {args.dir} ({cache.stats()['disk_entries']} en total)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Micro-benchmark: indice compilado de nlp_processor frente al bucle anidado original,
+y comparativa A/B de los scorers fuzzy (difflib vs trigram/NumPy).
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_classifier.py [--phrases 2000] [--repeat 2000]
+"""
+from __future__ import annotations
+
+import argparse
+import difflib
+import random
+import sys
+import timeit
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import nlp_processor  # noqa: E402
+from nlp_processor import FALLBACK_INTENT, INTENT_SYNONYMS, SCORERS, IntentClassifier, normalize  # noqa: E402
+
+SAMPLES = [
+    "No respira!",
+    "mi padre se atraganta con la comida",
+    "sangra mucho de la pierna",
+    "se desmayó en la calle",
+    "tiene convulsiones",
+    "se quemó con aceite",
+    "no resira bien",          # fuzzy
+    "esta desmayao",           # fuzzy
+    "hay mucha sangr",         # fuzzy
+    "xyz",
+    "",
+]
+
+
+def legacy_classify(text: str, synonyms: Dict[str, List[str]]) -> Tuple[str, float]:
+    """Copia literal del classify_text anterior, como referencia."""
+    txt = normalize(text)
+    if not txt:
+        return (FALLBACK_INTENT, 0.3)
+    for intent, phrases in synonyms.items():
+        for p in phrases:
+            if p in txt:
+                return (intent, 0.95)
+    all_phrases = [(intent, p) for intent, lst in synonyms.items() for p in lst]
+    best_intent, best_score = FALLBACK_INTENT, 0.0
+    for intent, phrase in all_phrases:
+        score = difflib.SequenceMatcher(None, txt, phrase).ratio()
+        if score > best_score:
+            best_score, best_intent = score, intent
+    conf = 0.6 + (best_score * 0.4)
+    return (best_intent, min(0.98, conf))
+
+
+def synthetic_synonyms(total: int, seed: int = 7) -> Dict[str, List[str]]:
+    """Amplia INTENT_SYNONYMS con frases sinteticas hasta `total` frases."""
+    rng = random.Random(seed)
+    words = sorted({w for lst in INTENT_SYNONYMS.values() for p in lst for w in p.split()})
+    table = {intent: list(lst) for intent, lst in INTENT_SYNONYMS.items()}
+    intents = list(table)
+    count = sum(len(v) for v in table.values())
+    while count < total:
+        phrase = " ".join(rng.choice(words) for _ in range(rng.randint(2, 4))) + f" q{count}"
+        table[rng.choice(intents)].append(phrase)
+        count += 1
+    return table
+
+
+def run(phrases: int, repeat: int) -> None:
+    for label, synonyms in (("actual", INTENT_SYNONYMS), (f"{phrases} frases", synthetic_synonyms(phrases))):
+        classifier = IntentClassifier(synonyms)
+        for text in SAMPLES:
+            expected = legacy_classify(text, synonyms)
+            got = classifier.classify(text)
+            if got != expected:
+                raise SystemExit(f"Diferencia en {text!r}: {got} != {expected}")
+
+        n = repeat if synonyms is INTENT_SYNONYMS else max(1, repeat // 20)
+        legacy = timeit.timeit(lambda: [legacy_classify(t, synonyms) for t in SAMPLES], number=n)
+        compiled = timeit.timeit(lambda: [classifier.classify(t) for t in SAMPLES], number=n)
+        per_call = len(SAMPLES) * n
+        print(
+            f"[{label}] legacy {legacy / per_call * 1e6:8.1f} us/call | "
+            f"compilado {compiled / per_call * 1e6:8.1f} us/call | x{legacy / compiled:.1f}"
+        )
+
+    assert nlp_processor.classify_text("no respira") == ("parada_respiratoria", 0.95)
+
+
+def noisy_samples(count: int, seed: int = 11) -> List[Tuple[str, str]]:
+    """Frases de INTENT_SYNONYMS con erratas tipo transcripcion: (texto, intent esperado)."""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijlmnopqrstuvyzáéíóú "
+    pool = [(intent, p) for intent, lst in INTENT_SYNONYMS.items() for p in lst]
+    samples = []
+    for _ in range(count):
+        intent, phrase = rng.choice(pool)
+        chars = list(phrase)
+        for _ in range(rng.randint(1, 3)):
+            i = rng.randrange(len(chars))
+            op = rng.random()
+            if op < 0.4:
+                chars[i] = rng.choice(alphabet)
+            elif op < 0.7:
+                del chars[i]
+            else:
+                chars.insert(i, rng.choice(alphabet))
+        samples.append(("".join(chars), intent))
+    return samples
+
+
+def compare_scorers(phrases: int, repeat: int) -> None:
+    """A/B de scorers: precision sobre frases con ruido y latencia del camino fuzzy."""
+    samples = noisy_samples(300)
+    for label, synonyms in (("actual", INTENT_SYNONYMS), (f"{phrases} frases", synthetic_synonyms(phrases))):
+        for name in SCORERS:
+            try:
+                classifier = IntentClassifier(synonyms, scorer=name)
+            except RuntimeError as exc:
+                print(f"[{label}] scorer {name}: no disponible ({exc})")
+                continue
+            hits = sum(classifier.classify(text)[0] == intent for text, intent in samples)
+            fuzzy = [normalize(t) for t, _ in samples]
+            n = max(1, repeat // 100)
+            elapsed = timeit.timeit(lambda: [classifier.scorer.best(t) for t in fuzzy], number=n)
+            print(
+                f"[{label}] scorer {name:8s} precision {hits / len(samples):6.1%} | "
+                f"fuzzy {elapsed / (len(fuzzy) * n) * 1e6:8.1f} us/call"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--phrases", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.phrases, args.repeat)
+    compare_scorers(args.phrases, args.repeat)
@@ -0,0 +1,142 @@
+"""Benchmark de /api/guide: GuideEngine frente a la logica copiada en los handlers anteriores.
+
+Mide por peticion la latencia (clasificar → protocolo → paso → sesion → JSON
+de respuesta, sin Flask; mejor de 3 pasadas) y la memoria asignada (pico de
+tracemalloc), con sesiones que ya tienen el historial lleno, que es el caso
+habitual. La clasificacion se resuelve de antemano para ambos porque no ha
+cambiado y su coste taparia la diferencia.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_guide.py [--sessions 200] [--repeat 20000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from content_store import ContentStore  # noqa: E402
+from emergency_bot import BotEngine  # noqa: E402
+from guide_engine import GuideEngine, _no_stage as _stage  # noqa: E402
+from nlp_processor import classify_text as _classify_text  # noqa: E402
+from session_store import SessionStore  # noqa: E402
+
+MAX_HISTORY_ITEMS = 20
+QUERIES = ["no respira", "se ahoga", "sangra mucho", "se quemó", "tiene convulsiones", "está inconsciente"]
+_CLASSIFIED = {query: _classify_text(query) for query in QUERIES}
+classify_text = _CLASSIFIED.__getitem__
+
+
+def legacy_guide(bot: BotEngine, sessions: SessionStore, session_id: str, query: str):
+    """Copia de la parte de estado de guide()/assistant() anteriores (con sus etapas), como referencia."""
+    with _stage("classify"):
+        intent, conf = classify_text(query)
+    with _stage("protocol_lookup"):
+        protocol_id = bot.intent_to_protocol(intent)
+        protocol = bot.get_protocol(protocol_id)
+    with _stage("session_update"), sessions.lock(session_id):
+        previous = sessions.get(session_id, {})
+        history = list(previous.get("history", []))
+        history.append({"user_text": query, "intent": intent})
+        if len(history) > MAX_HISTORY_ITEMS:
+            history = history[-MAX_HISTORY_ITEMS:]
+        previous_protocol = previous.get("protocol_id")
+        previous_index = int(previous.get("step_index", -1))
+        step_index = 0 if previous_protocol != protocol_id else previous_index + 1
+        steps = protocol.get("steps", [])
+        total_steps = len(steps)
+        if step_index >= total_steps:
+            step_text = "Has completado las instrucciones."
+            step_number = total_steps
+            step_index = total_steps - 1
+            has_next = False
+        else:
+            step_text = steps[step_index]
+            step_number = step_index + 1
+            has_next = step_index < (total_steps - 1)
+        sessions[session_id] = {
+            "protocol_id": protocol_id,
+            "step_index": step_index,
+            "history": history,
+            "total_steps": total_steps,
+        }
+    return json.dumps({
+        "step": step_number,
+        "text": step_text,
+        "say": step_text,
+        "next": has_next,
+        "title": protocol.get("title", "Protocolo"),
+        "session_id": session_id,
+        "protocol_id": protocol_id,
+        "confidence": round(conf, 3),
+        "total_steps": total_steps,
+    }, separators=(",", ":"), sort_keys=True)
+
+
+def engine_guide(engine: GuideEngine, session_id: str, query: str) -> str:
+    """Como el adaptador de /api/guide: trozo precalculado + campos de la sesión."""
+    turn = engine.guide(session_id, query)
+    return (
+        "{" + turn.payload.fragments["guide"]
+        + ',"confidence":' + json.dumps(round(turn.confidence, 3))
+        + ',"session_id":' + json.dumps(session_id) + "}"
+    )
+
+
+def workload(sessions: int, repeat: int):
+    rng = random.Random(7)
+    return [(f"s{rng.randrange(sessions)}", rng.choice(QUERIES)) for _ in range(repeat)]
+
+
+def measure(name: str, fn, calls) -> None:
+    # Calentar: historial lleno en todas las sesiones y caché del clasificador
+    for session_id, query in calls[: len(calls) // 4]:
+        fn(session_id, query)
+
+    elapsed = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for session_id, query in calls:
+            fn(session_id, query)
+        elapsed = min(elapsed, time.perf_counter() - t0)
+
+    sample = calls[:2000]
+    tracemalloc.start()
+    peak_total = 0
+    for session_id, query in sample:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn(session_id, query)
+        peak_total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    print(
+        f"{name:8s} {elapsed / len(calls) * 1e6:8.2f} us/peticion | "
+        f"{peak_total / len(sample):8.0f} B asignados (pico) por peticion"
+    )
+
+
+def run(sessions: int, repeat: int) -> None:
+    protocols_path = Path(__file__).resolve().parent.parent / "backend" / "protocols.json"
+    bot = BotEngine(protocols_path=protocols_path)
+    calls = workload(sessions, repeat)
+
+    legacy_store = SessionStore(max_items=sessions * 2, ttl=None)
+    measure("legacy", lambda sid, q: legacy_guide(bot, legacy_store, sid, q), calls)
+
+    engine = GuideEngine(ContentStore(protocols_path), SessionStore(max_items=sessions * 2, ttl=None), classify_text,
+                         max_history=MAX_HISTORY_ITEMS)
+    measure("engine", lambda sid, q: engine_guide(engine, sid, q), calls)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.sessions, args.repeat)
@@ -0,0 +1,75 @@
+"""Benchmark de serializacion de respuestas: stdlib (jsonify) frente a orjson/msgspec, y modo compacto.
+
+Captura una respuesta real de cada endpoint (sesion con el historial lleno),
+y mide por codificador el tiempo de serializacion y los bytes en el cable
+(sin comprimir y con gzip). `understand`/`next_step` se miden con el contexto
+completo y en modo compacto (sin historial).
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_json.py [--repeat 20000]
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("CONRUMBO_METRICS_PATH", os.path.join(tempfile.mkdtemp(), "metrics.csv"))
+os.environ.setdefault("CONRUMBO_CONTENT_WATCH", "0")
+
+import app  # noqa: E402
+from json_provider import select_encoder  # noqa: E402
+
+
+def capture_payloads() -> dict:
+    client = app.app.test_client()
+    for i in range(app.MAX_HISTORY_ITEMS + 5):
+        client.post("/api/understand", json={"session_id": "bench", "text": f"no respira bien {i}"})
+    payloads = {
+        "guide": client.post("/api/guide", json={"session_id": "bench", "query": "no respira"}).get_json(),
+        "understand": client.post("/api/understand", json={"session_id": "bench", "text": "no respira"}).get_json(),
+        "next_step": client.post("/api/next_step", json={"session_id": "bench"}).get_json(),
+        "understand_batch": client.post(
+            "/api/understand_batch", json={"texts": ["no respira", "sangra mucho", "se quemó"] * 100}
+        ).get_json(),
+    }
+    for name in ("understand", "next_step"):
+        compact = dict(payloads[name])
+        compact["context"] = {k: v for k, v in compact["context"].items() if k != "history"}
+        payloads[f"{name} (compacto)"] = compact
+    return payloads
+
+
+def run(repeat: int) -> None:
+    provider = app.app.json
+    # Lo que hacía jsonify con el proveedor por defecto de Flask
+    encoders = {"stdlib": lambda obj: json.dumps(obj, separators=(",", ":"), sort_keys=True).encode("utf-8")}
+    for name in ("orjson", "msgspec"):
+        backend, encode = select_encoder(name, provider.default)
+        if backend == name:
+            encoders[name] = encode
+        else:
+            print(f"{name} no instalado: se omite")
+
+    for endpoint, payload in capture_payloads().items():
+        print(endpoint)
+        for name, encode in encoders.items():
+            body = encode(payload)
+            seconds = min(timeit.repeat(lambda: encode(payload), number=repeat, repeat=3)) / repeat
+            print(
+                f"  {name:8s} {seconds * 1e6:8.2f} us | {len(body):7d} B | "
+                f"{len(gzip.compress(body)):6d} B gzip"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.repeat)
@@ -0,0 +1,59 @@
+"""Micro-benchmark de Metrics.log: escritura sincrona original frente al escritor en segundo plano.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_metrics.py [--events 20000]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from metrics import Metrics  # noqa: E402
+
+
+def legacy_log(csv_path, event, session_id="anon", user_text=None, intent=None,
+               confidence=None, protocol_id=None, step_index=None, latency_ms=None):
+    """Copia del Metrics.log anterior: abre, escribe una fila y cierra."""
+    with open(csv_path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            event, session_id, user_text, intent,
+            confidence, protocol_id, step_index, latency_ms,
+        ])
+
+
+def run(events: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "legacy.csv"
+        t0 = time.perf_counter()
+        for i in range(events):
+            legacy_log(legacy_path, "guide", "bench", "no respira", "parada_respiratoria", 0.95, "pa", i, 0)
+        legacy = time.perf_counter() - t0
+
+        metrics = Metrics(csv_path=Path(tmp) / "buffered.csv", on_full="block")
+        t0 = time.perf_counter()
+        for i in range(events):
+            metrics.log("guide", "bench", "no respira", "parada_respiratoria", 0.95, "pa", i, 0)
+        enqueue = time.perf_counter() - t0
+        metrics.flush(timeout=60)
+        total = time.perf_counter() - t0
+        metrics.close()
+
+        print(f"legacy   {legacy / events * 1e6:8.2f} us/log")
+        print(f"buffered {enqueue / events * 1e6:8.2f} us/log en el hilo de la peticion "
+              f"({total / events * 1e6:.2f} us/log hasta disco)")
+        print(f"filas escritas: {metrics.stats()['written']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    run(parser.parse_args().events)
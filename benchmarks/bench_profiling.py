@@ -0,0 +1,77 @@
+"""Benchmark del perfilado por petición: coste apagado, muestreado y perfilando todo.
+
+Mide /api/guide con el test client (mejor de 3 pasadas) con el perfilador
+apagado, con `--rate` de muestreo y con todas las peticiones perfiladas, y
+aparte el coste de las comprobaciones que añaden los hooks cuando está
+apagado (lo único que se paga en producción sin activarlo).
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_profiling.py [--requests 2000] [--rate 0.01]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("CONRUMBO_METRICS_PATH", os.path.join(tempfile.mkdtemp(), "metrics.csv"))
+os.environ.setdefault("CONRUMBO_CONTENT_WATCH", "0")
+os.environ.setdefault("CONRUMBO_STT_BACKEND", "stub")
+os.environ.pop("CONRUMBO_PROFILE_RATE", None)
+
+import app  # noqa: E402
+
+
+def per_request_us(client, requests: int) -> float:
+    def call():
+        client.post("/api/guide", json={"session_id": "bench", "query": "no respira"})
+
+    call()
+    return min(timeit.repeat(call, number=requests, repeat=3)) / requests * 1e6
+
+
+def guard_ns() -> float:
+    """Lo que hacen before_request/teardown_request por el perfilador cuando está apagado."""
+    with app.app.test_request_context("/api/guide", method="POST"):
+        def hooks():
+            if app.profiler.armed:
+                pass
+            app._stop_profile()
+
+        number = 200000
+        return min(timeit.repeat(hooks, number=number, repeat=5)) / number * 1e9
+
+
+def run(requests: int, rate: float) -> None:
+    client = app.app.test_client()
+    profiler = app.profiler
+
+    profiler.configure(rate=0.0, allow_header=False)
+    off = per_request_us(client, requests)
+    print(f"apagado          {off:9.1f} us/petición")
+    guard = guard_ns()
+    print(f"  hooks apagados {guard:9.1f} ns/petición ({guard / 1000 / off:.3%} de la petición)")
+
+    profiler.configure(rate=rate)
+    sampled = per_request_us(client, requests)
+    print(f"muestreo {rate:<7} {sampled:9.1f} us/petición ({sampled / off - 1:+.1%})")
+
+    profiler.configure(rate=1.0)
+    full = per_request_us(client, max(1, requests // 10))
+    print(f"todas            {full:9.1f} us/petición ({full / off - 1:+.1%})")
+
+    profiler.configure(rate=0.0)
+    print(f"apagado (otra)   {per_request_us(client, requests):9.1f} us/petición")
+    print(f"\n{profiler.stats()['stacks']} pilas distintas acumuladas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.requests, args.rate)
@@ -0,0 +1,78 @@
+"""Benchmark de backends de sesiones: peticiones /api/guide por segundo con 1, 4 y 16 workers.
+
+Cada worker es un proceso independiente (como un worker de gunicorn) que
+importa app.py y lanza peticiones /api/guide con el cliente de pruebas de
+Flask sobre un conjunto compartido de session_id. Con el backend "memory"
+cada proceso ve solo su propio estado; con "sqlite" todos comparten sesiones.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_sessions.py [--workers 1 4 16] [--seconds 3] [--backends memory sqlite]
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+QUERIES = ["no respira", "sangra mucho", "se atraganta", "se desmayó", "convulsiones", "se quemó"]
+
+
+def _worker(backend: str, db_path: str, metrics_path: str, seconds: float, sessions: int,
+            start: "mp.synchronize.Event", results: "mp.Queue", seed: int) -> None:
+    os.environ["CONRUMBO_SESSION_BACKEND"] = backend
+    os.environ["CONRUMBO_SESSION_DB"] = db_path
+    os.environ["CONRUMBO_METRICS_PATH"] = metrics_path
+    sys.path.insert(0, str(BACKEND_DIR))
+    import app  # noqa: E402
+
+    client = app.app.test_client()
+    start.wait()
+    done, i = 0, seed
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sid = f"s{i % sessions}"
+        client.post("/api/guide", json={"query": QUERIES[(i // sessions) % len(QUERIES)], "session_id": sid})
+        done += 1
+        i += 7
+    results.put(done)
+
+
+def run(workers: int, backend: str, seconds: float, sessions: int) -> float:
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        start, results = ctx.Event(), ctx.Queue()
+        procs = [
+            ctx.Process(
+                target=_worker,
+                args=(backend, os.path.join(tmp, "sessions.sqlite3"), os.path.join(tmp, f"m{n}.csv"),
+                      seconds, sessions, start, results, n),
+            )
+            for n in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        time.sleep(2.0 + 0.1 * workers)  # importación de app en cada proceso
+        start.set()
+        total = sum(results.get() for _ in procs)
+        for proc in procs:
+            proc.join()
+    return total / seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"])
+    args = parser.parse_args()
+    print(f"CPUs: {os.cpu_count()}")
+    for backend in args.backends:
+        for workers in args.workers:
+            rps = run(workers, backend, args.seconds, args.sessions)
+            print(f"{backend:7s} workers={workers:3d} {rps:10.0f} guide req/s")
@@ -0,0 +1,230 @@
+"""Benchmark de arranque de un worker: importaciones perezosas frente a ansiosas.
+
+Para cada modo lanza procesos nuevos (mediana de `--runs`) y mide:
+- `python -X importtime -c "import app"`: total y los paquetes con más
+  tiempo propio (sumado por paquete raíz: flask, numpy, requests...);
+- tiempo hasta la primera respuesta de /api/guide desde que se lanza el
+  intérprete, y lo que tarda después la primera /api/stt (con el backend
+  stub: lo que se mide es la importación perezosa, no el reconocimiento);
+- RSS de un proceso que arranca solo, y RSS y memoria privada (USS) de un
+  worker hecho por fork de un máster precargado, como con gunicorn.conf.py.
+  La USS es lo que cuesta de verdad cada worker extra.
+
+Modos: lazy (CONRUMBO_LAZY_IMPORTS=1, por defecto sin preload), eager
+(CONRUMBO_LAZY_IMPORTS=0, lo de antes y el defecto con preload), text
+(CONRUMBO_ROLE=text) y audio (CONRUMBO_ROLE=audio).
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_startup.py [--runs 5] [--top 8] [--modes lazy eager text]
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+MODES = {
+    "lazy": {"CONRUMBO_LAZY_IMPORTS": "1"},
+    "eager": {"CONRUMBO_LAZY_IMPORTS": "0"},
+    "text": {"CONRUMBO_ROLE": "text"},
+    "audio": {"CONRUMBO_ROLE": "audio"},
+}
+
+
+def _proc_kb(path: str, fields: List[str]) -> Optional[int]:
+    """Suma de campos en kB de /proc/self/status o smaps_rollup (None fuera de Linux)."""
+    try:
+        with open(path, encoding="ascii") as f:
+            values = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return sum(int(values[field].split()[0]) for field in fields if field in values)
+
+
+def _wav() -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"\x00\x10" * 16000)
+    return buffer.getvalue()
+
+
+def _first_requests(app) -> Dict[str, float]:
+    client = app.app.test_client()
+    t0 = time.perf_counter()
+    client.post("/api/guide", json={"session_id": "bench", "query": "no respira"})
+    guide_ms = (time.perf_counter() - t0) * 1000
+    first_response = time.monotonic()
+    t0 = time.perf_counter()
+    client.post("/api/stt", data={"audio": (io.BytesIO(_wav()), "clip.wav")})
+    return {"first_guide_ms": guide_ms, "first_stt_ms": (time.perf_counter() - t0) * 1000,
+            "first_response_at": first_response}
+
+
+def child(kind: str, launched_at: float) -> None:
+    """Se ejecuta en el proceso medido; imprime una línea JSON."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    t0 = time.perf_counter()
+    import app
+
+    result = {"import_ms": (time.perf_counter() - t0) * 1000}
+    if kind == "cold":
+        timings = _first_requests(app)
+        result["ttfr_ms"] = (timings.pop("first_response_at") - launched_at) * 1000
+        result.update(timings)
+        result["rss_kb"] = _proc_kb("/proc/self/status", ["VmRSS"])
+        print(json.dumps(result))
+        return
+
+    # Máster precargado (CONRUMBO_PRELOAD=1): fork y medir el worker
+    import gc
+
+    gc.freeze()
+    read_fd, write_fd = os.pipe()
+    forked_at = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        app.start_worker_threads()
+        timings = _first_requests(app)
+        worker = {
+            "fork_ttfr_ms": (timings["first_response_at"] - forked_at) * 1000,
+            "worker_rss_kb": _proc_kb("/proc/self/smaps_rollup", ["Rss"]),
+            "worker_uss_kb": _proc_kb("/proc/self/smaps_rollup", ["Private_Clean", "Private_Dirty"]),
+        }
+        os.write(write_fd, json.dumps(worker).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as pipe:
+        result.update(json.loads(pipe.read() or b"{}"))
+    os.waitpid(pid, 0)
+    result["master_rss_kb"] = _proc_kb("/proc/self/status", ["VmRSS"])
+    print(json.dumps(result))
+
+
+def _env(mode: str, workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    for key in ("CONRUMBO_LAZY_IMPORTS", "CONRUMBO_ROLE", "CONRUMBO_PRELOAD"):
+        env.pop(key, None)
+    env.update({
+        "CONRUMBO_METRICS_PATH": os.path.join(workdir, "metrics.csv"),
+        "CONRUMBO_TTS_CACHE_DIR": os.path.join(workdir, "tts"),
+        "CONRUMBO_CONTENT_WATCH": "0",
+        "CONRUMBO_STT_BACKEND": "stub",
+        "CONRUMBO_TTS_SYNTH": "stub",
+        "CONRUMBO_BUNDLE_AUDIO": "0",
+    })
+    env.update(MODES[mode])
+    return env
+
+
+def _run_child(kind: str, env: Dict[str, str]) -> Dict[str, float]:
+    if kind == "fork":
+        env = dict(env, CONRUMBO_PRELOAD="1")
+    launched_at = time.monotonic()
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", kind, "--launched-at", repr(launched_at)],
+        env=env, stdout=subprocess.PIPE, check=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def importtime(env: Dict[str, str]) -> Dict[str, float]:
+    """Microsegundos de tiempo propio por paquete raíz, más el total acumulado de `app`."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, check=True, text=True,
+    ).stderr
+    packages: Dict[str, float] = defaultdict(float)
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(own)
+        if name == "app":
+            packages["<total>"] = int(cumulative)
+    return packages
+
+
+def measure(mode: str, runs: int) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory() as workdir:
+        env = _env(mode, workdir)
+        imports = [importtime(env) for _ in range(runs)]
+        cold = [_run_child("cold", env) for _ in range(runs)]
+        fork = [_run_child("fork", env) for _ in range(runs)]
+    names = {name for sample in imports for name in sample}
+    return {
+        "imports": {name: statistics.median(sample.get(name, 0) for sample in imports) for name in names},
+        "cold": {key: statistics.median(sample[key] for sample in cold) for key in cold[0]},
+        "fork": {key: statistics.median(sample[key] for sample in fork) for key in fork[0]},
+    }
+
+
+def _mb(kb: Optional[float]) -> str:
+    return "   n/a" if kb is None else f"{kb / 1024:6.1f}"
+
+
+def run(modes: List[str], runs: int, top: int) -> None:
+    results = {mode: measure(mode, runs) for mode in modes}
+
+    print(f"-X importtime (ms de tiempo propio por paquete, mediana de {runs})")
+    ranked = sorted(
+        {name for r in results.values() for name in r["imports"] if name != "<total>"},
+        key=lambda name: -max(r["imports"].get(name, 0) for r in results.values()),
+    )[:top]
+    print(f"{'':24s}" + "".join(f"{mode:>10s}" for mode in modes))
+    for name in ["<total>"] + ranked:
+        cells = "".join(f"{results[mode]['imports'].get(name, 0) / 1000:10.1f}" for mode in modes)
+        print(f"{name:24s}{cells}")
+
+    print("\nproceso en frío (intérprete + import app + primera petición)")
+    rows = [
+        ("import app (ms)", "cold", "import_ms"),
+        ("primera respuesta (ms)", "cold", "ttfr_ms"),
+        ("  /api/guide (ms)", "cold", "first_guide_ms"),
+        ("  luego /api/stt (ms)", "cold", "first_stt_ms"),
+        ("RSS (MB)", "cold", "rss_kb"),
+    ]
+    rows_fork = [
+        ("fork → respuesta (ms)", "fork", "fork_ttfr_ms"),
+        ("RSS máster (MB)", "fork", "master_rss_kb"),
+        ("RSS worker (MB)", "fork", "worker_rss_kb"),
+        ("USS worker (MB)", "fork", "worker_uss_kb"),
+    ]
+    for title, group in ((None, rows), ("\nworker por fork de un máster precargado (gunicorn.conf.py)", rows_fork)):
+        if title:
+            print(title)
+        print(f"{'':24s}" + "".join(f"{mode:>10s}" for mode in modes))
+        for label, section, key in group:
+            cells = []
+            for mode in modes:
+                value = results[mode][section].get(key)
+                cells.append(f"{_mb(value):>10s}" if key.endswith("_kb") else f"{value:10.1f}")
+            print(f"{label:24s}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--modes", nargs="+", default=["lazy", "eager", "text"], choices=sorted(MODES))
+    parser.add_argument("--child", choices=["cold", "fork"], help=argparse.SUPPRESS)
+    parser.add_argument("--launched-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.launched_at)
+    else:
+        run(args.modes, args.runs, args.top)
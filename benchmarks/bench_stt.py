@@ -0,0 +1,136 @@
+"""Benchmark de la conversion de audio de /api/stt: ruta con ficheros temporales frente a pipes en memoria.
+
+Genera clips sinteticos (WAV 16 kHz mono y, si hay ffmpeg, WEBM/OGG) y mide
+la preparacion del audio hasta tener un AudioData listo para el reconocedor.
+Con --backends mide ademas el reconocimiento con cada backend STT
+(stub, whisper, google) sobre el mismo clip, con el modelo ya caliente.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/bench_stt.py [--seconds 3] [--repeat 50] [--backends stub,whisper]
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import math
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("CONRUMBO_METRICS_PATH", os.path.join(tempfile.mkdtemp(), "metrics.csv"))
+
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+import app  # noqa: E402
+from audio_pipeline import decode_upload  # noqa: E402
+from stt_backends import create_stt_backend  # noqa: E402
+
+
+def sine_wav(seconds: float, rate: int = 16000) -> bytes:
+    frames = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / rate)))
+        for i in range(int(seconds * rate))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def encode(wav_bytes: bytes, fmt: str) -> bytes:
+    codec = {"webm": "libopus", "ogg": "libvorbis"}[fmt]
+    proc = subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", "-c:a", codec, "-f", fmt, "pipe:1"],
+        input=wav_bytes, stdout=subprocess.PIPE, check=True,
+    )
+    return proc.stdout
+
+
+def legacy(data: bytes, filename: str):
+    """Ruta anterior: guardar upload → ffmpeg a WAV temporal → sr.AudioFile."""
+    upload = FileStorage(stream=io.BytesIO(data), filename=filename)
+    return app._decode_via_tempfile(upload)
+
+
+def piped(data: bytes, filename: str):
+    upload = FileStorage(stream=io.BytesIO(data), filename=filename)
+    t0 = time.perf_counter_ns()
+    raw = upload.read()
+    t1 = time.perf_counter_ns()
+    audio, route = decode_upload(raw)
+    t2 = time.perf_counter_ns()
+    return audio, route, (t1 - t0, t2 - t1)
+
+
+def run(seconds: float, repeat: int) -> None:
+    clips = {"clip.wav": sine_wav(seconds)}
+    if shutil.which("ffmpeg"):
+        for fmt in ("webm", "ogg"):
+            clips[f"clip.{fmt}"] = encode(clips["clip.wav"], fmt)
+    else:
+        print("ffmpeg no disponible: solo se mide WAV")
+
+    for name, data in clips.items():
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            legacy(data, name)
+        old = (time.perf_counter() - t0) / repeat
+
+        read_ns = decode_ns = 0
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            _, route, (r, d) = piped(data, name)
+            read_ns += r
+            decode_ns += d
+        new = (time.perf_counter() - t0) / repeat
+        print(
+            f"{name:10s} ({len(data) / 1024:6.1f} KiB) temp-file {old * 1e3:8.2f} ms | "
+            f"memoria[{route}] {new * 1e3:8.2f} ms "
+            f"(read {read_ns / repeat / 1e6:.3f} ms, decode {decode_ns / repeat / 1e6:.3f} ms) | x{old / new:.1f}"
+        )
+
+
+def run_backends(kinds, seconds: float, repeat: int) -> None:
+    audio, _ = decode_upload(sine_wav(seconds))
+    for kind in kinds:
+        backend = create_stt_backend(kind)
+        t0 = time.perf_counter()
+        try:
+            backend.warm()
+        except RuntimeError as exc:
+            print(f"{kind:8s} no disponible ({exc})")
+            continue
+        warm = time.perf_counter() - t0
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter_ns()
+            backend.transcribe(audio, "es-ES")
+            samples.append(time.perf_counter_ns() - t0)
+        samples.sort()
+        p50 = samples[len(samples) // 2] / 1e6
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] / 1e6
+        print(
+            f"{kind:8s} warm {warm * 1e3:8.1f} ms | p50 {p50:8.2f} ms | p95 {p95:8.2f} ms "
+            f"| fallos {backend.stats()['failures']}/{repeat}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--backends", default="", help="lista separada por comas: stub,whisper,google")
+    args = parser.parse_args()
+    run(args.seconds, args.repeat)
+    if args.backends:
+        run_backends([k for k in args.backends.split(",") if k], args.seconds, args.repeat)
@@ -0,0 +1,420 @@
+"""Suite reproducible de benchmarks del backend, con comparación contra una línea base.
+
+Dos partes:
+- micro: normalize, classify_text (acierto exacto y ruta fuzzy, con y sin la
+  caché LRU), BotEngine.next_step y ProtocolRecord.next_step (recorriendo un
+  protocolo entero), GuideEngine.guide
+  y Metrics.log (escritor en segundo plano, en un directorio temporal).
+- load: driver en proceso con el test client de Flask y varios hilos que
+  reproducen sesiones reales: /api/understand → /api/next_step hasta el
+  final, bucles de /api/guide y audio con STT/TTS stub (sin red). Da
+  throughput y p50/p99 por endpoint.
+
+Los resultados se guardan en JSON (por defecto benchmarks/results/latest.json)
+y se comparan con la línea base (benchmarks/baseline.json): una métrica que
+empeora más de --tolerance hace que el proceso salga con código 1. La base
+depende de la máquina, así que no se versiona: se fija en la propia con
+--save-baseline antes del cambio, o en CI con --baseline-from origin/main,
+que la mide en un worktree temporal del merge-base con esa rama. Sin base
+solo se informa de los resultados y se sale con 0. Las micro
+se comparan en tiempo relativo a un bucle de calibración, así que la base
+sirve mientras no cambie la máquina; las de carga, en p50 y throughput.
+
+Uso (desde la raiz del proyecto):
+    python benchmarks/suite.py                    # micro + load, compara con la base
+    python benchmarks/suite.py micro --quick      # solo micro, pasadas cortas
+    python benchmarks/suite.py --save-baseline    # fija la base con esta máquina
+    python benchmarks/suite.py --baseline-from origin/main   # CI: base del merge-base
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import wave
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+
+# Todo local y determinista: nada escribe en backend/ ni sale a la red
+_TMP = tempfile.mkdtemp(prefix="conrumbo-bench-")
+for _key, _value in {
+    "CONRUMBO_METRICS_PATH": os.path.join(_TMP, "metrics.csv"),
+    "CONRUMBO_TTS_CACHE_DIR": os.path.join(_TMP, "tts_cache"),
+    "CONRUMBO_TTS_SYNTH": "stub",
+    "CONRUMBO_STT_BACKEND": "stub",
+    "CONRUMBO_SESSION_BACKEND": "memory",
+    "CONRUMBO_CONTENT_WATCH": "0",
+    "CONRUMBO_STATIC_WATCH": "0",
+    "CONRUMBO_BUNDLE_AUDIO": "0",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+DEFAULT_OUT = ROOT / "benchmarks" / "results" / "latest.json"
+
+EXACT_QUERIES = ["no respira", "se atraganta con la comida", "sangra mucho de la pierna", "se quemó con aceite"]
+FUZZY_QUERIES = ["no resira bien", "esta desmayao", "hay mucha sangr", "le cuesta respirr"]
+
+
+# --- micro ---------------------------------------------------------------------------------
+
+def _calibration() -> int:
+    total = 0
+    for i in range(100):
+        total += i
+    return total
+
+
+def _per_op(fn: Callable[[], object], number: int, repeat: int = 9) -> Tuple[float, float]:
+    """
+    (ns por llamada, relativo) como mediana de `repeat` pasadas. Cada pasada
+    va seguida de un bucle de calibración fijo y `relativo` es el cociente
+    entre ambos: compensa las variaciones de velocidad de la máquina (CPU
+    compartida, escalado de frecuencia) y es lo que se compara con la base.
+    """
+    fn()
+    samples = []
+    for _ in range(repeat):
+        elapsed = timeit.timeit(fn, number=number) / number
+        calibration = timeit.timeit(_calibration, number=2000) / 2000
+        samples.append((elapsed * 1e9, elapsed / calibration))
+    ns = sorted(sample[0] for sample in samples)[repeat // 2]
+    relative = sorted(sample[1] for sample in samples)[repeat // 2]
+    return ns, relative
+
+
+def iter_cycle(values):
+    """Recorre `values` en bucle: cada llamada mide una entrada distinta."""
+    values = list(values)
+    i = 0
+    while True:
+        yield values[i % len(values)]
+        i += 1
+
+
+def run_micro(quick: bool) -> Dict[str, Dict[str, float]]:
+    import nlp_processor
+    from content_store import ContentStore
+    from emergency_bot import BotEngine
+    from guide_engine import GuideEngine
+    from metrics import Metrics
+    from session_store import SessionStore
+
+    scale = 10 if quick else 1
+    results: Dict[str, Tuple[float, float]] = {}
+    classifier = nlp_processor.build_classifier(nlp_processor.INTENT_SYNONYMS)
+
+    text = "¡Mi padre NO respira bien, está tirado en el suelo!"
+    results["normalize"] = _per_op(lambda: nlp_processor.normalize(text), 20000 // scale)
+
+    exact = iter_cycle(EXACT_QUERIES)
+    fuzzy = iter_cycle(FUZZY_QUERIES)
+    results["classify_exact_uncached"] = _per_op(lambda: classifier.classify(next(exact)), 20000 // scale)
+    results["classify_fuzzy_uncached"] = _per_op(lambda: classifier.classify(next(fuzzy)), 2000 // scale)
+    results["classify_text_cached"] = _per_op(lambda: nlp_processor.classify_text(next(exact)), 10000 // scale)
+
+    bot = BotEngine(ROOT / "backend" / "protocols.json")
+    protocol_id = next(iter(bot.protocols))
+    record = bot.get_record(protocol_id)
+    # Una operación = recorrer el protocolo entero (cada paso suelto dura menos que el ruido del reloj)
+    walk = range(-1, record.total_steps + 1)
+
+    def botengine_walk() -> None:
+        for index in walk:
+            bot.next_step(protocol_id, index)
+
+    def record_walk() -> None:
+        for index in walk:
+            record.next_step(index)
+
+    results["botengine_next_step_walk"] = _per_op(botengine_walk, 5000 // scale)
+    results["record_next_step_walk"] = _per_op(record_walk, 10000 // scale)
+
+    content = ContentStore(ROOT / "backend" / "protocols.json")
+    engine = GuideEngine(content, SessionStore(max_items=1000), nlp_processor.classify_text)
+    sessions = iter_cycle([f"s{i}" for i in range(200)])
+    results["guide_engine_guide"] = _per_op(lambda: engine.guide(next(sessions), "no respira"), 20000 // scale)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics = Metrics(os.path.join(tmp, "metrics.csv"), on_full="block")
+        results["metrics_log"] = _per_op(
+            lambda: metrics.log(event="guide", session_id="bench", user_text="no respira",
+                                intent="parada_respiratoria", confidence=0.95, protocol_id=protocol_id,
+                                step_index=1, latency_ms=0),
+            20000 // scale,
+        )
+        metrics.close()
+
+    return {
+        name: {"ns_per_op": round(ns, 1), "relative": round(relative, 4)}
+        for name, (ns, relative) in results.items()
+    }
+
+
+# --- load ----------------------------------------------------------------------------------
+
+def _wav(seconds: float = 0.5, rate: int = 16000) -> bytes:
+    frames = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / rate)))
+        for i in range(int(seconds * rate))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors = 0
+
+    def timed(self, name: str, call: Callable[[], object]):
+        t0 = time.perf_counter()
+        response = call()
+        elapsed = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+            if response.status_code >= 400:
+                self.errors += 1
+        return response
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)]
+
+
+def _flows(app_module, recorder: Recorder, rng: random.Random, wav: bytes, step_texts: List[str]):
+    """Cada flujo es una sesión completa de un usuario."""
+    client = app_module.app.test_client()
+
+    def understand_then_next(session_id: str) -> None:
+        query = rng.choice(EXACT_QUERIES + FUZZY_QUERIES)
+        recorder.timed("/api/understand", lambda: client.post(
+            "/api/understand", json={"session_id": session_id, "text": query}))
+        while True:
+            response = recorder.timed("/api/next_step", lambda: client.post(
+                "/api/next_step", json={"session_id": session_id}))
+            if response.get_json().get("done"):
+                break
+
+    def guide_loop(session_id: str) -> None:
+        query = rng.choice(EXACT_QUERIES)
+        for _ in range(rng.randint(4, 10)):
+            recorder.timed("/api/guide", lambda: client.post(
+                "/api/guide", json={"session_id": session_id, "query": query}))
+
+    def voice(session_id: str) -> None:
+        recorder.timed("/api/stt", lambda: client.post(
+            "/api/stt", data={"audio": (io.BytesIO(wav), "voz.wav")}, content_type="multipart/form-data"))
+        response = recorder.timed("/api/guide", lambda: client.post(
+            "/api/guide", json={"session_id": session_id, "query": rng.choice(EXACT_QUERIES)}))
+        text = response.get_json().get("say") or rng.choice(step_texts)
+        recorder.timed("/api/tts", lambda: client.get("/api/tts", query_string={"text": text, "lang": "es-ES"}))
+
+    return [understand_then_next, guide_loop, voice]
+
+
+def run_load(quick: bool, threads: int, sessions: int, seed: int) -> Dict[str, object]:
+    import app as app_module
+    from tts_cache import protocol_step_texts
+
+    sessions = max(threads, sessions // (10 if quick else 1))
+    wav = _wav()
+    step_texts = list(protocol_step_texts(app_module.content.current.bot.protocols))
+    recorder = Recorder()
+
+    def worker(index: int, count: int) -> None:
+        rng = random.Random(seed + index)
+        flows = _flows(app_module, recorder, rng, wav, step_texts)
+        for n in range(count):
+            rng.choice(flows)(f"load-{index}-{n}")
+
+    # Calentamiento: caché TTS, clasificador y rutas de Flask
+    worker(-1, 6)
+    recorder.samples.clear()
+    recorder.errors = 0
+
+    per_thread = [sessions // threads + (1 if i < sessions % threads else 0) for i in range(threads)]
+    pool = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_thread)]
+    t0 = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+    app_module.metrics.flush(timeout=5)
+
+    total = sum(len(v) for v in recorder.samples.values())
+    return {
+        "threads": threads,
+        "sessions": sessions,
+        "requests": total,
+        "errors": recorder.errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "endpoints": {
+            name: {
+                "count": len(values),
+                "p50_ms": round(_percentile(values, 0.50), 3),
+                "p99_ms": round(_percentile(values, 0.99), 3),
+            }
+            for name, values in sorted(recorder.samples.items())
+        },
+    }
+
+
+# --- resultados y comparación ----------------------------------------------------------------
+
+def _meta() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _metrics(results: Dict[str, object]) -> Dict[str, Tuple[float, bool]]:
+    """Métricas comparables: nombre → (valor, mayor_es_mejor)."""
+    flat: Dict[str, Tuple[float, bool]] = {}
+    for name, values in results.get("micro", {}).items():
+        flat[f"micro.{name}.relative"] = (values["relative"], False)
+    load = results.get("load")
+    if load:
+        flat["load.throughput_rps"] = (load["throughput_rps"], True)
+        for endpoint, values in load["endpoints"].items():
+            flat[f"load.{endpoint}.p50_ms"] = (values["p50_ms"], False)
+            flat[f"load.{endpoint}.p99_ms"] = (values["p99_ms"], False)
+    return flat
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], tolerance: float,
+            tail_tolerance: Optional[float] = None) -> List[str]:
+    """
+    Imprime la tabla y devuelve las métricas que empeoran más de `tolerance`.
+    Los p99 de la carga (con varios hilos y el GIL, mucho más ruidosos que
+    las medianas) solo cuentan si se pasa `tail_tolerance`.
+    """
+    before = _metrics(baseline)
+    regressions = []
+    print(f"\n{'métrica':45s} {'base':>12s} {'actual':>12s} {'cambio':>8s}")
+    for name, (value, higher_is_better) in _metrics(current).items():
+        if name not in before or not before[name][0]:
+            continue
+        base = before[name][0]
+        change = value / base - 1
+        worse = -change if higher_is_better else change
+        flag = ""
+        limit = tail_tolerance if name.endswith(".p99_ms") else tolerance
+        if limit is not None and worse > limit:
+            regressions.append(name)
+            flag = "  REGRESIÓN"
+        print(f"{name:45s} {base:12.3f} {value:12.3f} {change:+7.1%}{flag}")
+    return regressions
+
+
+def baseline_from(ref: str, baseline: Path, argv: List[str]) -> None:
+    """Mide `argv` en un worktree del merge-base de HEAD con `ref` y lo guarda en `baseline`."""
+    base = subprocess.run(["git", "merge-base", "HEAD", ref], cwd=ROOT, check=True,
+                          capture_output=True, text=True).stdout.strip()
+    with tempfile.TemporaryDirectory(prefix="conrumbo-base-") as tmp:
+        worktree = Path(tmp) / "tree"
+        subprocess.run(["git", "worktree", "add", "--detach", str(worktree), base], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL)
+        try:
+            print(f"midiendo la línea base en {base[:10]} (merge-base con {ref})")
+            subprocess.run([sys.executable, str(worktree / "benchmarks" / "suite.py"), *argv,
+                            "--out", str(Path(tmp) / "base.json"),
+                            "--baseline", str(baseline.resolve()), "--save-baseline"],
+                           cwd=worktree, check=True, stdout=subprocess.DEVNULL)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=ROOT, check=False)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("part", nargs="?", choices=["all", "micro", "load"], default="all")
+    parser.add_argument("--quick", action="store_true", help="pasadas 10 veces más cortas")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="empeoramiento relativo permitido antes de fallar (por defecto 0.3)")
+    parser.add_argument("--tail-tolerance", type=float, default=None,
+                        help="lo mismo para los p99 de la carga (por defecto solo se informan)")
+    parser.add_argument("--save-baseline", action="store_true", help="guarda el resultado como nueva base")
+    parser.add_argument("--baseline-from", metavar="REF",
+                        help="si no hay base, la mide antes en el merge-base de HEAD con REF (para CI)")
+    args = parser.parse_args(argv)
+
+    if args.baseline_from and not args.save_baseline and not args.baseline.exists():
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        same = [args.part, "--threads", str(args.threads), "--sessions", str(args.sessions), "--seed", str(args.seed)]
+        baseline_from(args.baseline_from, args.baseline, same + (["--quick"] if args.quick else []))
+
+    results: Dict[str, object] = {"meta": _meta()}
+    if args.part in ("all", "micro"):
+        results["micro"] = run_micro(args.quick)
+        for name, values in results["micro"].items():
+            print(f"{name:28s} {values['ns_per_op'] / 1000:10.2f} us/op")
+    if args.part in ("all", "load"):
+        load = run_load(args.quick, args.threads, args.sessions, args.seed)
+        results["load"] = load
+        print(f"\nload: {load['requests']} peticiones en {load['seconds']} s "
+              f"({load['throughput_rps']} req/s, {load['threads']} hilos, {load['errors']} errores)")
+        for endpoint, values in load["endpoints"].items():
+            print(f"  {endpoint:18s} n={values['count']:6d}  p50 {values['p50_ms']:8.3f} ms  "
+                  f"p99 {values['p99_ms']:8.3f} ms")
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"\nresultados en {args.out}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"línea base guardada en {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"\nsin línea base en {args.baseline}: no se compara (--save-baseline antes del cambio "
+              "o --baseline-from <rama> en CI)")
+        return 0
+    regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")),
+                          args.tolerance, args.tail_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\nsin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2213,8 +2213,27 @@ window.addEventListener('DOMContentLoaded', () => {
   el = byId('btnLlamada112'); if (el) el.addEventListener('click', function(){ llamar(EMERGENCY_NUMBER); });
   el = byId('btnLlamadaTest'); if (el) el.addEventListener('click', function(){ llamar(TEST_NUMBER); });
   el = byId('btnIniciarVoz'); if (el) el.addEventListener('click', iniciarVoz);
+  registrarServiceWorker();
 });
 
+// El service worker guarda el paquete offline (/api/bundle) para guiar sin red
+async function registrarServiceWorker() {
+  if (typeof navigator === 'undefined' || !('serviceWorker' in navigator)) {
+    return;
+  }
+  try {
+    await navigator.serviceWorker.register('./sw.js');
+    const registration = await navigator.serviceWorker.ready;
+    const worker = registration.active;
+    if (worker) {
+      const lang = encodeURIComponent(getCurrentLocale());
+      worker.postMessage({ type: 'conrumbo:bundle', url: `${API_BASE}/bundle?lang=${lang}` });
+    }
+  } catch (error) {
+    log('No se pudo registrar el service worker', error);
+  }
+}
+
 function byId(id) {
   return typeof document !== 'undefined' ? document.getElementById(id) : null;
 }
@@ -2326,7 +2345,11 @@ async function llamar(numero) {
       throw new Error(`HTTP ${response.status}`);
     }
     toast('Llamada enviada');
-    return await response.json();
+    const job = await response.json();
+    if (job && job.status_url) {
+      seguirLlamada(`${backend}${job.status_url}`);
+    }
+    return job;
   } catch (error) {
     log('Error al llamar', error);
     toast('Error al llamar');
@@ -2334,6 +2357,34 @@ async function llamar(numero) {
   }
 }
 
+// El backend responde 202 al encolar; aquí solo se avisa si la marcación termina fallando
+async function seguirLlamada(statusUrl, intentos = 30) {
+  for (let i = 0; i < intentos; i += 1) {
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+    try {
+      const response = await fetch(statusUrl);
+      if (!response.ok) {
+        log('Error al llamar', `HTTP ${response.status}`);
+        toast('Error al llamar');
+        return;
+      }
+      const job = await response.json();
+      if (job.status === 'completed') {
+        log('Llamada conectada', job.job_id, job.sid || '');
+        return;
+      }
+      if (job.status === 'failed') {
+        log('Error al llamar', job.error);
+        toast('Error al llamar');
+        return;
+      }
+    } catch (error) {
+      log('No se pudo consultar el estado de la llamada', error);
+      return;
+    }
+  }
+}
+
 function mostrarPanel(nombre) {
   const target = (nombre || '').toLowerCase();
   log('Mostrar panel solicitado', target);
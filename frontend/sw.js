@@ -6,15 +6,30 @@ const ASSETS = [
   "./script.js",
   "./manifest.webmanifest"
 ];
+// El paquete offline (/api/bundle) vive en su propia caché: no depende de la versión del shell
+const BUNDLE_CACHE = "conrumbo-bundle";
+const BUNDLE_KEY = "./offline-bundle.json";
+
+let bundle = null;
+let phrases = null;
+let audioByText = null;
+const offlineSessions = new Map();
 
 self.addEventListener("install", (e)=>{
   e.waitUntil(caches.open(CACHE).then(c=>c.addAll(ASSETS)));
 });
 self.addEventListener("activate", (e)=>{
   e.waitUntil(
-    caches.keys().then(keys=>Promise.all(keys.filter(k=>k!==CACHE).map(k=>caches.delete(k))))
+    caches.keys().then(keys=>Promise.all(keys.filter(k=>k!==CACHE && k!==BUNDLE_CACHE).map(k=>caches.delete(k))))
   );
 });
+// La página manda la URL del backend; se descarga una vez y luego solo se revalida (304)
+self.addEventListener("message", (e)=>{
+  const data = e.data || {};
+  if (data.type === "conrumbo:bundle" && data.url) {
+    e.waitUntil(refreshBundle(data.url));
+  }
+});
 self.addEventListener("fetch", (e)=>{
   const url = new URL(e.request.url);
   // Cache-first para estáticos
@@ -22,6 +37,23 @@ self.addEventListener("fetch", (e)=>{
     e.respondWith(caches.match(e.request).then(r=> r || fetch(e.request)));
     return;
   }
+  // Audio de los pasos: directamente del paquete, sin ir a la red
+  if (url.pathname.endsWith("/api/tts")) {
+    e.respondWith(
+      stepAudio(url.searchParams.get("text"), url.searchParams.get("lang")).then(r=> r || fetch(e.request))
+    );
+    return;
+  }
+  // Guía: red primero y, sin conexión, resolver el paso con el paquete
+  if (e.request.method === "POST" && /\/api\/(guide|assistant)$/.test(url.pathname)) {
+    const body = e.request.clone().json().catch(()=>({}));
+    e.respondWith(
+      fetch(e.request)
+        .then((r)=>{ rememberStep(r.clone()); return r; })
+        .catch(()=> body.then(data=>offlineGuide(url.pathname.endsWith("/assistant"), data)))
+    );
+    return;
+  }
   // Network-first para API
   if (url.pathname.startsWith("/api/")) {
     e.respondWith(
@@ -30,3 +62,116 @@ self.addEventListener("fetch", (e)=>{
     return;
   }
 });
+
+async function refreshBundle(url) {
+  try {
+    const response = await fetch(url, { cache: "no-cache" });
+    if (!response.ok) return;
+    const cache = await caches.open(BUNDLE_CACHE);
+    await cache.put(BUNDLE_KEY, response.clone());
+    useBundle(await response.json());
+  } catch (error) {
+    // Sin red: se sigue con el paquete guardado
+  }
+}
+
+async function loadBundle() {
+  if (bundle) return bundle;
+  const cached = await caches.open(BUNDLE_CACHE).then(c=>c.match(BUNDLE_KEY));
+  if (cached) useBundle(await cached.json());
+  return bundle;
+}
+
+function useBundle(data) {
+  bundle = data;
+  phrases = [];
+  Object.keys(data.synonyms || {}).forEach((intent)=>{
+    (data.synonyms[intent] || []).forEach((phrase)=> phrases.push([normalize(phrase), intent]));
+  });
+  audioByText = new Map();
+  Object.keys(data.protocols || {}).forEach((pid)=>{
+    const keys = (data.step_audio || {})[pid] || [];
+    data.protocols[pid].steps.forEach((step, i)=>{
+      if (keys[i] && data.audio[keys[i]]) audioByText.set(step, data.audio[keys[i]]);
+    });
+  });
+}
+
+// Igual que nlp_processor.normalize
+function normalize(text) {
+  return String(text || "").toLowerCase().trim()
+    .replace(/[^\wáéíóúüñ\s]/g, " ")
+    .replace(/\s+/g, " ");
+}
+
+// Solo coincidencia exacta/contenida (sin el fuzzy del servidor); si no, protocolo por defecto
+function classify(text) {
+  const txt = normalize(text);
+  for (const [phrase, intent] of phrases) {
+    if (phrase && txt.includes(phrase)) return [intent, 0.95];
+  }
+  return [null, 0.3];
+}
+
+async function offlineGuide(assistant, data) {
+  const current = await loadBundle();
+  const query = String((assistant ? (data.text || data.query) : data.query) || "").trim();
+  if (!current || !query) {
+    return new Response(JSON.stringify({ok:false, offline:true}), {headers:{'Content-Type':'application/json'}});
+  }
+  const sessionId = data.session_id || "offline";
+  const [intent, confidence] = classify(query);
+  const protocolId = (intent && current.intent_protocol_map[intent]) || current.fallback_protocol;
+  const protocol = current.protocols[protocolId] || current.protocols[current.fallback_protocol];
+  const steps = protocol.steps;
+  const session = offlineSessions.get(sessionId);
+  let index = session && session.protocol_id === protocolId ? session.step_index + 1 : 0;
+  let text;
+  if (!steps.length) {
+    index = 0;
+    text = current.texts.no_steps;
+  } else if (index >= steps.length) {
+    index = steps.length - 1;
+    text = current.texts.guide_done;
+  } else {
+    text = steps[index];
+  }
+  offlineSessions.set(sessionId, { protocol_id: protocolId, step_index: index });
+  const hasNext = text === steps[index] && index < steps.length - 1;
+  const payload = {
+    next: hasNext,
+    protocol_id: protocolId,
+    say: text,
+    step: steps.length ? index + 1 : 0,
+    title: protocol.title,
+    total_steps: steps.length,
+    confidence,
+    session_id: sessionId,
+    offline: true,
+  };
+  payload[assistant ? "step_text" : "text"] = text;
+  return new Response(JSON.stringify(payload), {headers:{'Content-Type':'application/json'}});
+}
+
+// Si se corta la red a mitad de protocolo, se sigue desde el último paso que dio el servidor
+async function rememberStep(response) {
+  try {
+    const data = await response.json();
+    if (data.session_id && data.protocol_id && typeof data.step === "number" && data.step > 0) {
+      offlineSessions.set(data.session_id, { protocol_id: data.protocol_id, step_index: data.step - 1 });
+    }
+  } catch (error) {
+    // Respuesta sin JSON: nada que recordar
+  }
+}
+
+async function stepAudio(text, lang) {
+  const current = await loadBundle();
+  if (!current || String(lang || current.lang).split("-")[0].toLowerCase() !== current.lang) return null;
+  const encoded = audioByText.get(text);
+  if (!encoded) return null;
+  const raw = atob(encoded);
+  const bytes = new Uint8Array(raw.length);
+  for (let i = 0; i < raw.length; i += 1) bytes[i] = raw.charCodeAt(i);
+  return new Response(bytes, {headers:{'Content-Type':'audio/mpeg'}});
+}
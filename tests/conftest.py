@@ -0,0 +1,42 @@
+"""
+Configuración común de los tests: backend/ y benchmarks/ en sys.path y un
+entorno local sin red (STT/TTS stub, métricas y estado en un directorio
+temporal) antes de que ningún test importe app.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+_TMP = tempfile.mkdtemp(prefix="conrumbo-tests-")
+for _key, _value in {
+    "CONRUMBO_METRICS_PATH": os.path.join(_TMP, "metrics.csv"),
+    "CONRUMBO_TTS_CACHE_DIR": os.path.join(_TMP, "tts_cache"),
+    "CONRUMBO_CALL_STATE_DIR": os.path.join(_TMP, "call_jobs"),
+    "CONRUMBO_TTS_SYNTH": "stub",
+    "CONRUMBO_STT_BACKEND": "stub",
+    "CONRUMBO_SESSION_BACKEND": "memory",
+    "CONRUMBO_CONTENT_WATCH": "0",
+    "CONRUMBO_STATIC_WATCH": "0",
+    "CONRUMBO_BUNDLE_AUDIO": "0",
+}.items():
+    os.environ[_key] = _value
+os.environ.pop("CONRUMBO_ADMIN_TOKEN", None)
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,48 @@
+import pytest
+
+ADMIN_PATHS = [("post", "/api/admin/reload"), ("get", "/api/admin/profile")]
+
+
+@pytest.fixture
+def admin_token(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "s3cret")
+    return "s3cret"
+
+
+@pytest.mark.parametrize("method,path", ADMIN_PATHS)
+def test_admin_disabled_without_configured_token(client, app_module, monkeypatch, method, path):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    response = getattr(client, method)(path, headers={"X-Admin-Token": "anything"})
+
+    assert response.status_code == 403
+    assert response.get_json() == {"error": "admin_disabled"}
+
+
+@pytest.mark.parametrize("method,path", ADMIN_PATHS)
+def test_admin_disabled_even_from_localhost(client, app_module, monkeypatch, method, path):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+    response = getattr(client, method)(path, environ_base={"REMOTE_ADDR": "127.0.0.1"})
+
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("method,path", ADMIN_PATHS)
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}, {"Authorization": "Bearer wrong"}])
+def test_admin_rejects_missing_or_wrong_token(client, admin_token, method, path, headers):
+    response = getattr(client, method)(path, headers=headers)
+
+    assert response.status_code == 403
+    assert response.get_json() == {"error": "forbidden"}
+
+
+@pytest.mark.parametrize("headers", [
+    lambda token: {"X-Admin-Token": token},
+    lambda token: {"Authorization": f"Bearer {token}"},
+])
+def test_admin_accepts_valid_token(client, admin_token, headers):
+    response = client.post("/api/admin/reload", headers=headers(admin_token))
+    assert response.status_code == 200
+    assert response.get_json()["ok"] is True
+
+    response = client.get("/api/admin/profile?format=json", headers=headers(admin_token))
+    assert response.status_code == 200
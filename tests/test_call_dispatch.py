@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from call_dispatch import COMPLETED, FAILED, RETRYING, CallDispatcher, CallError, CallProvider, CallQueueFull
+
+
+class ScriptedProvider(CallProvider):
+    """Falla con los errores de `failures` (en orden) y después conecta."""
+
+    name = "scripted"
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def place(self, to):
+        with self._lock:
+            self.calls.append(time.monotonic())
+            if self.failures:
+                raise self.failures.pop(0)
+        return "sid-1"
+
+
+def _wait_for(dispatcher, job_id, statuses=(COMPLETED, FAILED), timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = dispatcher.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.005)
+    raise AssertionError(f"job {job_id} sigue en {dispatcher.get(job_id)['status']}")
+
+
+def test_completes_on_first_attempt():
+    dispatcher = CallDispatcher(ScriptedProvider())
+    job = dispatcher.submit("112")
+    done = _wait_for(dispatcher, job.id)
+
+    assert done["status"] == COMPLETED
+    assert done["attempts"] == 1
+    assert done["sid"] == "sid-1"
+    assert dispatcher.stats()["completed"] == 1
+
+
+def test_retries_with_exponential_backoff_then_completes():
+    provider = ScriptedProvider([CallError("busy"), CallError("busy")])
+    dispatcher = CallDispatcher(provider, max_attempts=4, backoff=0.05)
+    job = dispatcher.submit("112")
+
+    retrying = _wait_for(dispatcher, job.id, statuses=(RETRYING,))
+    assert retrying["error"] == "busy"
+    assert retrying["next_attempt_at"] is not None
+
+    done = _wait_for(dispatcher, job.id)
+    assert done["status"] == COMPLETED
+    assert done["attempts"] == 3
+    assert done["error"] is None
+    assert dispatcher.stats()["retries"] == 2
+    # Jitter entre el 50% y el 100% de 0.05 s y luego de 0.1 s
+    first_gap, second_gap = provider.calls[1] - provider.calls[0], provider.calls[2] - provider.calls[1]
+    assert first_gap >= 0.025
+    assert second_gap >= 0.05
+
+
+def test_fails_after_max_attempts():
+    provider = ScriptedProvider([CallError("down")] * 10)
+    dispatcher = CallDispatcher(provider, max_attempts=3, backoff=0.001)
+    done = _wait_for(dispatcher, dispatcher.submit("112").id)
+
+    assert done["status"] == FAILED
+    assert done["attempts"] == 3
+    assert done["error"] == "down"
+    assert dispatcher.stats()["failed"] == 1
+
+
+def test_non_retryable_error_fails_immediately():
+    provider = ScriptedProvider([CallError("invalid_number", retryable=False)])
+    dispatcher = CallDispatcher(provider, max_attempts=4, backoff=0.001)
+    done = _wait_for(dispatcher, dispatcher.submit("112").id)
+
+    assert done["status"] == FAILED
+    assert done["attempts"] == 1
+    assert dispatcher.stats()["retries"] == 0
+
+
+def test_rejects_empty_number_and_full_queue():
+    dispatcher = CallDispatcher(ScriptedProvider(), max_pending=0)
+    with pytest.raises(ValueError):
+        dispatcher.submit("  ")
+    with pytest.raises(CallQueueFull):
+        dispatcher.submit("112")
+    assert dispatcher.stats()["rejected"] == 1
+
+
+def test_status_is_visible_from_another_process_state(tmp_path):
+    provider = ScriptedProvider([CallError("down")] * 10)
+    owner = CallDispatcher(provider, max_attempts=2, backoff=0.001, state_dir=tmp_path)
+    other = CallDispatcher(ScriptedProvider(), state_dir=tmp_path)
+    job = owner.submit("112")
+    _wait_for(owner, job.id)
+
+    assert other.get(job.id)["status"] == FAILED
+    assert other.get("../../etc/passwd") is None
@@ -0,0 +1,88 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from content_store import VERSION_KEY, ContentStore
+from guide_engine import GuideEngine
+from session_store import SessionStore
+
+PROTOCOLS = Path(__file__).resolve().parent.parent / "backend" / "protocols.json"
+PROTOCOL_ID = "pa_no_respira_v1"
+
+
+@pytest.fixture
+def protocols_path(tmp_path):
+    path = tmp_path / "protocols.json"
+    shutil.copy(PROTOCOLS, path)
+    return path
+
+
+@pytest.fixture
+def engine(protocols_path):
+    content = ContentStore(protocols_path)
+    return GuideEngine(content, SessionStore(ttl=None), classify=lambda text: ("parada_respiratoria", 0.95))
+
+
+def _rewrite_steps(path: Path, steps):
+    protocols = json.loads(path.read_text(encoding="utf-8"))
+    protocols[PROTOCOL_ID]["steps"] = steps
+    path.write_text(json.dumps(protocols, ensure_ascii=False), encoding="utf-8")
+
+
+def test_guide_advances_one_step_per_turn(engine):
+    total = engine.content.current.bot.get_record(PROTOCOL_ID).total_steps
+    indexes = [engine.guide("s", "no respira").step_index for _ in range(total + 2)]
+
+    assert indexes == list(range(total)) + [total - 1, total - 1]
+    assert engine.guide("s", "no respira").payload.has_next is False
+
+
+def test_next_step_continues_after_understand(engine):
+    turn = engine.understand("s", "no respira")
+    assert turn.step_index == -1
+    assert turn.context["step_index"] == -1
+
+    record = engine.content.current.bot.get_record(PROTOCOL_ID)
+    for expected in range(record.total_steps):
+        turn = engine.next_step("s")
+        assert turn.step_index == expected
+        assert turn.payload.text == record.steps[expected]
+    assert engine.next_step("s").step_index == record.total_steps
+
+
+def test_version_pin_survives_reload(engine, protocols_path):
+    old_steps = list(engine.content.current.bot.get_record(PROTOCOL_ID).steps)
+    assert engine.guide("s", "no respira").payload.text == old_steps[0]
+
+    _rewrite_steps(protocols_path, ["Paso nuevo A", "Paso nuevo B"])
+    _, changed = engine.content.reload(force=True)
+    assert changed
+
+    # La sesión empezada sigue con los pasos de su versión
+    assert engine.guide("s", "no respira").payload.text == old_steps[1]
+    assert engine.next_step("s").payload.text == old_steps[2]
+    # Una sesión nueva ya ve el contenido recargado
+    assert engine.guide("otra", "no respira").payload.text == "Paso nuevo A"
+
+
+def test_version_pin_is_not_exposed_or_accepted_from_clients(engine, protocols_path):
+    turn = engine.guide("s", "no respira")
+    assert VERSION_KEY not in turn.context
+    pinned = engine.sessions.get("s")[VERSION_KEY]
+
+    _rewrite_steps(protocols_path, ["Paso nuevo A", "Paso nuevo B"])
+    engine.content.reload(force=True)
+    client_context = dict(turn.context, **{VERSION_KEY: engine.content.current.digest})
+    turn = engine.next_step("s", context=client_context)
+
+    assert VERSION_KEY not in turn.context
+    assert engine.sessions.get("s")[VERSION_KEY] == pinned
+    assert turn.payload.text != "Paso nuevo B"
+
+
+def test_negative_guide_index_starts_at_first_step(engine):
+    record = engine.content.current.bot.get_record(PROTOCOL_ID)
+    assert record.guide_step(-1).step_index == 0
+    assert record.guide_step(-1).text == record.steps[0]
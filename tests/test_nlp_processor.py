@@ -0,0 +1,37 @@
+import pytest
+
+import nlp_processor
+from bench_classifier import SAMPLES, legacy_classify, noisy_samples, synthetic_synonyms
+from nlp_processor import INTENT_SYNONYMS, IntentClassifier
+
+EXTRA = [
+    "NO RESPIRA",
+    "  se   ha   desmayado  ",
+    "¿está inconsciente?",
+    "le sale sangre de la cabeza y no respira",
+    "quemadura",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES + EXTRA)
+def test_classify_text_matches_legacy_loop(text):
+    assert nlp_processor.classify_text(text) == legacy_classify(text, INTENT_SYNONYMS)
+    # Segunda vez desde la caché LRU: mismo resultado
+    assert nlp_processor.classify_text(text) == legacy_classify(text, INTENT_SYNONYMS)
+
+
+def test_noisy_texts_match_legacy_loop():
+    for text, _ in noisy_samples(200):
+        assert nlp_processor.classify_text(text) == legacy_classify(text, INTENT_SYNONYMS), text
+
+
+def test_compiled_index_matches_legacy_with_many_phrases():
+    synonyms = synthetic_synonyms(500)
+    classifier = IntentClassifier(synonyms)
+    for text in SAMPLES + EXTRA + [text for text, _ in noisy_samples(50)]:
+        assert classifier.classify(text) == legacy_classify(text, synonyms), text
+
+
+def test_classify_many_matches_classify_text():
+    texts = SAMPLES + EXTRA
+    assert nlp_processor.classify_many(texts) == [nlp_processor.classify_text(t) for t in texts]
@@ -0,0 +1,96 @@
+import pytest
+
+import session_store
+from session_store import SessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store, "monotonic", lambda: now[0])
+    return now
+
+
+def test_max_items_evicts_least_recently_used():
+    store = SessionStore(max_items=3, ttl=None)
+    for session_id in ("a", "b", "c"):
+        store[session_id] = {"id": session_id}
+    store.get("a")  # "b" pasa a ser la menos usada
+    store["d"] = {"id": "d"}
+
+    assert len(store) == 3
+    assert "b" not in store
+    assert [s for s in ("a", "c", "d") if s in store] == ["a", "c", "d"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_overwrite_does_not_evict():
+    store = SessionStore(max_items=2, ttl=None)
+    store["a"] = {"n": 1}
+    store["b"] = {"n": 1}
+    store["a"] = {"n": 2}
+
+    assert len(store) == 2
+    assert store["a"] == {"n": 2}
+    assert store.evictions == 0
+
+
+def test_ttl_expires_on_read(clock):
+    store = SessionStore(max_items=10, ttl=60)
+    store["a"] = {"n": 1}
+    clock[0] += 59
+    assert store.get("a") == {"n": 1}  # leer renueva el último acceso
+    clock[0] += 59
+    assert store.get("a") == {"n": 1}
+    clock[0] += 61
+    assert store.get("a") is None
+    assert store.stats()["expirations"] == 1
+
+
+def test_sweep_removes_only_expired(clock):
+    store = SessionStore(max_items=10, ttl=60)
+    store["old"] = {}
+    clock[0] += 30
+    store["new"] = {}
+    clock[0] += 40
+
+    assert store.sweep() == 1
+    assert "old" not in store
+    assert "new" in store
+
+
+def test_max_bytes_evicts_oldest_but_keeps_newest():
+    store = SessionStore(max_items=100, ttl=None, max_bytes=1000)
+    for i in range(10):
+        store[str(i)] = {"history": ["x" * 100]}
+
+    assert store.stats()["bytes"] <= 1000
+    assert 1 < len(store) < 10
+    assert "9" in store
+    assert "0" not in store
+
+
+def test_max_bytes_keeps_a_single_oversized_session():
+    store = SessionStore(max_items=100, ttl=None, max_bytes=10)
+    store["a"] = {"history": ["x" * 100]}
+    store["b"] = {"history": ["x" * 100]}
+
+    assert list(s for s in ("a", "b") if s in store) == ["b"]
+
+
+def test_sqlite_backend_round_trip(tmp_path):
+    store = session_store.SQLiteSessionBackend(tmp_path / "s.sqlite3", max_items=2, ttl=None)
+    for session_id in ("a", "b", "c"):
+        store[session_id] = {"id": session_id}
+
+    assert store.get("c") == {"id": "c"}
+    assert store.sweep() == 1
+    assert len(store) == 2
+
+
+def test_sqlite_backend_reports_serialization_errors(tmp_path):
+    store = session_store.SQLiteSessionBackend(tmp_path / "s.sqlite3")
+    with pytest.raises(TypeError):
+        store["a"] = {"bad": object()}
+    store["a"] = {"ok": True}
+    assert store.get("a") == {"ok": True}